@@ -5,7 +5,7 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-from database import get_db
+from database import get_db, get_pool
 from config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -37,10 +37,7 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db=Depends(get_db),
-) -> dict:
+async def _load_user(db, token: str) -> dict:
     payload = decode_token(token)
     user_id = payload.get("sub")
     if not user_id:
@@ -54,3 +51,22 @@ async def get_current_user(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
     return dict(row)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db=Depends(get_db),
+) -> dict:
+    """For endpoints that take db=Depends(get_db): FastAPI's dependency cache gives auth the request's
+    own connection, so a request never holds one connection while waiting for a second."""
+    return await _load_user(db, token)
+
+
+async def get_current_user_pooled(
+    token: str = Depends(oauth2_scheme),
+    pool=Depends(get_pool),
+) -> dict:
+    """For endpoints that take pool=Depends(get_pool) and hold no connection of their own: the user
+    lookup takes a short-lived acquire instead of pinning one for the whole request."""
+    async with pool.acquire() as db:
+        return await _load_user(db, token)
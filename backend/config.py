@@ -19,6 +19,77 @@ class Settings(BaseSettings):
     max_questions_per_session: int = 10
     context_material_token_budget: int = 8000
     max_answer_tokens: int = 800
+    # Semantic answer cache: reuse an answer for near-duplicate questions in a session
+    answer_cache_similarity_threshold: float = 0.95
+    answer_cache_max_entries_per_session: int = 200
+    # In-memory exact chunk retrieval per session; larger sessions query pgvector
+    vector_index_enabled: bool = True
+    vector_index_memory_mb: int = 256
+    vector_index_max_chunks: int = 20000
+    # Postgres chunk search: per-course HNSW index above this many chunks; exact scan for candidate
+    # sets up to vector_exact_scan_max_chunks; ef_search = margin × k × course/candidates, at least min
+    vector_course_index_min_chunks: int = 10000
+    vector_exact_scan_max_chunks: int = 5000
+    vector_ef_search_margin: float = 2.0
+    vector_ef_search_min: int = 40
+    # Two-stage exact plan: Hamming scan over binary-quantized embeddings keeps this many candidates,
+    # which are reranked by exact cosine (needs migration 020)
+    vector_quantized_first_stage: bool = False
+    vector_rerank_candidates: int = 400
+    # Embedding profile for the per-course HNSW indexes: leading dimensions indexed and their precision
+    # ("vector" float32 or "halfvec" float16). document_chunks keeps the full 1536 float32 vector.
+    embedding_dimensions: int = 1536
+    embedding_storage: str = "vector"
+    # In-process tier of the embedding cache (Postgres tier is unbounded)
+    embedding_cache_memory_mb: int = 64
+    # Batch embedding: inputs per request, concurrent requests, tokens-per-minute budget
+    embedding_batch_size: int = 128
+    embedding_batch_concurrency: int = 4
+    embedding_tokens_per_minute: int = 1_000_000
+    # Background ingestion workers (per process)
+    ingestion_workers: int = 2
+    ingestion_max_attempts: int = 3
+    ingestion_retry_backoff_sec: float = 30.0
+    ingestion_lock_timeout_sec: float = 900.0
+    ingestion_poll_interval_sec: float = 2.0
+    # Session report: cosine similarity for "repeating" questions, and how many groups to show
+    repeating_question_similarity: float = 0.85
+    max_repeating_groups: int = 10
+    # Session report cache: "postgres" (in-process LRU + shared table) or "memory" (LRU only).
+    # A report is rebuilt after the TTL or once this many new questions have been asked.
+    report_cache_backend: str = "postgres"
+    report_cache_memory_mb: int = 32
+    report_cache_ttl_sec: float = 600.0
+    report_cache_question_threshold: int = 10
+    # Longest a report build may hold its cross-worker lease before another worker takes over
+    report_build_lease_sec: float = 300.0
+    # Incremental report refresh: recluster once a topic centroid moves this far (cosine distance)
+    # or the session has grown by this fraction since the last full clustering
+    report_topic_drift_threshold: float = 0.05
+    report_recluster_growth: float = 1.0
+    # Session report summaries: questions per map call, concurrent gpt-4o-mini calls per report
+    summary_batch_size: int = 50
+    summary_concurrency: int = 4
+    # Background question classification (micro-batched gpt-4o-mini calls)
+    classification_workers: int = 1
+    classification_batch_size: int = 20
+    classification_batch_wait_sec: float = 1.0
+    classification_max_attempts: int = 3
+    classification_retry_backoff_sec: float = 30.0
+    classification_lock_timeout_sec: float = 300.0
+    classification_poll_interval_sec: float = 10.0
+    # Local embedding classifier; below this softmax confidence the LLM decides
+    category_classifier_dir: str = "classifier_models"
+    category_classifier_min_confidence: float = 0.8
+    # PDF/DOCX extraction process pool (per API process)
+    extraction_processes: int = 2
+    extraction_pages_per_task: int = 20
+    extraction_timeout_sec: float = 120.0
+    # Shared AsyncOpenAI connection pool
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 30.0
+    openai_timeout: float = 60.0
 
     model_config = SettingsConfigDict(env_file=_env_path, env_file_encoding="utf-8", extra="ignore")
 
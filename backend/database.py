@@ -21,3 +21,8 @@ async def get_db(request: Request) -> asyncpg.Connection:
     """FastAPI dependency: yields one connection from the pool per request."""
     async with request.app.state.pool.acquire() as conn:
         yield conn
+
+
+def get_pool(request: Request) -> asyncpg.Pool:
+    """FastAPI dependency: the shared pool, for handlers that acquire connections themselves."""
+    return request.app.state.pool
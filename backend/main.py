@@ -3,12 +3,23 @@ import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 
+from auth import get_current_user_pooled
 from config import settings
 from database import create_pool
+from services import (
+    chunk_search,
+    classification_queue,
+    embedding_cache,
+    file_extractor,
+    ingestion_queue,
+    openai_client,
+    report_cache,
+    vector_index,
+)
 from routers.auth_router import router as auth_router
 from routers.student_router import router as student_router
 from routers.professor_router import router as professor_router
@@ -17,8 +28,21 @@ from routers.professor_router import router as professor_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.pool = await create_pool(settings.database_url)
+    app.state.ingestion_workers = ingestion_queue.start_workers(app.state.pool, settings.ingestion_workers)
+    app.state.classification_workers = classification_queue.start_workers(
+        app.state.pool, settings.classification_workers
+    )
+    app.state.report_cache_listener = report_cache.start_listener()
+    app.state.reindex = chunk_search.start_reindex(app.state.pool)
     yield
+    app.state.reindex.cancel()
+    await asyncio.gather(app.state.reindex, return_exceptions=True)
+    await report_cache.stop_listener(app.state.report_cache_listener)
+    await classification_queue.stop_workers(app.state.classification_workers)
+    await ingestion_queue.stop_workers(app.state.ingestion_workers)
+    file_extractor.shutdown()
     await app.state.pool.close()
+    await openai_client.close_async_client()
 
 
 app = FastAPI(title="LearnPool API", lifespan=lifespan)
@@ -73,3 +97,15 @@ async def serve_upload(file_path: str):
 @app.get("/")
 async def health():
     return {"status": "ok", "service": "learnpool-api"}
+
+
+@app.get("/health/caches")
+async def cache_health(current_user: dict = Depends(get_current_user_pooled)):
+    """Per-worker cache hit/miss counters (professors only: they reveal usage across courses)."""
+    if current_user["role"] != "professor":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Professors only")
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "report_cache": report_cache.stats(),
+        "vector_index": vector_index.stats(),
+    }
@@ -61,6 +61,17 @@ class DocumentOut(BaseModel):
     url: str
     page_count: int | None
     content: str | None = None  # For inline text documents
+    processing_status: str | None = None  # uploaded | processing | ready | failed
+
+
+class DocumentStatusOut(BaseModel):
+    """Ingestion progress for one document (poll after upload until ready or failed)."""
+    id: str
+    processing_status: str
+    attempts: int
+    error_message: str | None = None
+    page_count: int | None = None
+    processed_at: datetime | None = None
 
 
 class TokenResponse(BaseModel):
@@ -122,6 +133,7 @@ class AnswerOut(BaseModel):
     model_used: str
     generation_latency_ms: int | None
     citations: list[CitationOut]
+    cache_hit: bool = False  # answer reused from a near-duplicate question in the same session
 
 
 class QuestionOut(BaseModel):
@@ -198,6 +210,9 @@ class SessionReportResponse(BaseModel):
     session_summary: str | None = None      # AI-generated overview
     repeating_questions: list[RepeatingQuestionGroup] = []
     hot_topics: list[str] = []              # topic names with most questions
+    generated_at: datetime | None = None     # when the served report was built
+    age_seconds: int = 0
+    is_stale: bool = False                   # served from cache while a newer report is being built
 
 
 class SubmitFeedbackRequest(BaseModel):
@@ -1,14 +1,15 @@
 """Professor API — courses owned by the professor, session management, reports, documents."""
 
+import asyncio
 import json
 import secrets
-import tempfile
+import uuid
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
 
-from auth import get_current_user
-from database import get_db
+from auth import get_current_user, get_current_user_pooled
+from database import get_db, get_pool
 from models import (
     AddDocumentRequest,
     CitationPageOut,
@@ -21,6 +22,7 @@ from models import (
     CreateSessionRequest,
     DocumentCitationOut,
     DocumentOut,
+    DocumentStatusOut,
     ProfessorReviewRequest,
     RecurringTopicItem,
     RichThreadOut,
@@ -37,8 +39,9 @@ from models import (
     ThreadFeedbackOut,
     UpdateSessionStatusRequest,
 )
-from services.document_service import process_text_document
-from services.file_extractor import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, extract_text_from_file
+from services import answer_cache, ingestion_queue
+from services.file_extractor import ALLOWED_EXTENSIONS, MAX_FILE_SIZE
+from services.storage_service import upload_file
 from services.report_service import build_session_report, invalidate_report_cache_for_session
 
 router = APIRouter(prefix="/api/professor", tags=["professor"])
@@ -50,6 +53,11 @@ def _require_professor(current_user: dict = Depends(get_current_user)) -> dict:
     return current_user
 
 
+def _require_professor_pooled(current_user: dict = Depends(get_current_user_pooled)) -> dict:
+    """_require_professor for endpoints that use the pool rather than get_db."""
+    return _require_professor(current_user)
+
+
 # ---------------------------------------------------------------------------
 # GET /api/professor/courses
 # ---------------------------------------------------------------------------
@@ -457,6 +465,7 @@ async def update_session(
                 session_id,
                 doc_id,
             )
+    answer_cache.invalidate_session(session_id)
 
     row = await db.fetchrow(
         "SELECT id, title, status, started_at FROM sessions WHERE id = $1",
@@ -508,11 +517,11 @@ async def delete_session(
 @router.get("/sessions/{session_id}/report", response_model=SessionReportResponse)
 async def get_professor_session_report(
     session_id: str,
-    db=Depends(get_db),
-    current_user: dict = Depends(_require_professor),
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_professor_pooled),
 ):
     """Get anonymised Q&A report for a session. Professor must own the course."""
-    owned = await db.fetchval(
+    owned = await pool.fetchval(
         """
         SELECT 1 FROM sessions s
         JOIN courses c ON c.id = s.course_id AND c.professor_id = $1
@@ -524,7 +533,7 @@ async def get_professor_session_report(
     if not owned:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not your session")
 
-    return await build_session_report(db, session_id, published_only=False, include_review_data=True)
+    return await build_session_report(pool, session_id, published_only=False, include_review_data=True)
 
 
 # ---------------------------------------------------------------------------
@@ -600,7 +609,7 @@ async def submit_professor_feedback(
         body.feedback,
     )
 
-    invalidate_report_cache_for_session(str(owned))
+    await invalidate_report_cache_for_session(db, str(owned))
 
     counts = await db.fetchrow(
         """
@@ -635,24 +644,14 @@ async def get_course_documents(
 
     rows = await db.fetch(
         """
-        SELECT id, filename, storage_path, page_count, content
+        SELECT id, filename, storage_path, page_count, content, processing_status
         FROM documents
         WHERE course_id = $1
         ORDER BY created_at DESC
         """,
         course_id,
     )
-    return [
-        DocumentOut(
-            id=str(r["id"]),
-            filename=r["filename"],
-            storage_path=r["storage_path"],
-            url="" if r["storage_path"] == "inline" else f"/uploads/{r['storage_path']}",
-            page_count=r["page_count"],
-            content=r.get("content"),
-        )
-        for r in rows
-    ]
+    return [_document_out(r) for r in rows]
 
 
 # ---------------------------------------------------------------------------
@@ -667,8 +666,9 @@ async def add_document(
     current_user: dict = Depends(_require_professor),
 ):
     """
-    Add lecture material as text. Creates document, chunks it, embeds, and links to sessions.
-    Shared with students immediately once processing completes.
+    Add lecture material as text. Creates the document and links it to sessions; chunking and
+    embedding run in the background ingestion queue. Shared with students once processing_status
+    is 'ready' (poll GET /documents/{id}/status).
     """
     owned = await db.fetchval(
         "SELECT 1 FROM courses WHERE id = $1 AND professor_id = $2",
@@ -695,49 +695,24 @@ async def add_document(
                 detail=f"Session {sid} is not in your course",
             )
 
-    # Create document (inline text)
-    row = await db.fetchrow(
-        """
-        INSERT INTO documents (course_id, uploaded_by, filename, storage_path, processing_status, content)
-        VALUES ($1, $2, $3, 'inline', 'uploaded', $4)
-        RETURNING id, filename, storage_path, page_count, content
-        """,
-        course_id,
-        current_user["id"],
-        body.title,
-        body.content,
-    )
-    doc_id = str(row["id"])
-
-    # Process: chunk + embed
-    await process_text_document(db, doc_id, body.content)
-
-    # Link to sessions
-    for sid in body.session_ids:
-        await db.execute(
+    # Create document (inline text); an ingestion worker chunks and embeds it
+    async with db.transaction():
+        row = await db.fetchrow(
             """
-            INSERT INTO session_documents (session_id, document_id, is_active)
-            VALUES ($1, $2, true)
-            ON CONFLICT (session_id, document_id) DO UPDATE SET is_active = true
+            INSERT INTO documents (course_id, uploaded_by, filename, storage_path, processing_status, content)
+            VALUES ($1, $2, $3, 'inline', 'uploaded', $4)
+            RETURNING id, filename, storage_path, page_count, content, processing_status
             """,
-            sid,
-            doc_id,
+            course_id,
+            current_user["id"],
+            body.title,
+            body.content,
         )
+        doc_id = str(row["id"])
+        await _link_document_to_sessions(db, doc_id, body.session_ids)
 
-    # Fetch updated row (processing_status = ready now)
-    row = await db.fetchrow(
-        "SELECT id, filename, storage_path, page_count, content FROM documents WHERE id = $1",
-        doc_id,
-    )
-    url = "" if row["storage_path"] == "inline" else f"/uploads/{row['storage_path']}"
-    return DocumentOut(
-        id=str(row["id"]),
-        filename=row["filename"],
-        storage_path=row["storage_path"],
-        url=url,
-        page_count=row["page_count"],
-        content=row.get("content"),
-    )
+    ingestion_queue.notify()
+    return _document_out(row)
 
 
 # ---------------------------------------------------------------------------
@@ -754,7 +729,9 @@ async def upload_document(
     current_user: dict = Depends(_require_professor),
 ):
     """
-    Upload a file (PDF, TXT, DOCX). Extracts text, chunks, embeds, and links to lectures.
+    Upload a file (PDF, TXT, DOCX). Stores the raw file and links it to lectures, then returns
+    straight away with processing_status 'uploaded'; extraction, chunking and embedding run in the
+    background ingestion queue (poll GET /documents/{id}/status).
     """
     owned = await db.fetchval(
         "SELECT 1 FROM courses WHERE id = $1 AND professor_id = $2",
@@ -804,52 +781,68 @@ async def upload_document(
 
     doc_title = (title or file.filename or "Untitled").strip()[:200]
 
-    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-        tmp.write(content_bytes)
-        tmp_path = Path(tmp.name)
+    # Keep the raw upload for the ingestion worker. PDFs are also served from storage; TXT/DOCX
+    # become inline documents once their text is extracted.
+    source_path = f"{uuid.uuid4().hex}{ext}"
+    await asyncio.to_thread(upload_file, source_path, content_bytes)
+    storage_path = source_path if ext == ".pdf" else "inline"
 
-    try:
-        content = extract_text_from_file(tmp_path, file.filename or "")
-    except ValueError as e:
-        tmp_path.unlink(missing_ok=True)
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-
-    if len(content.strip()) < 10:
-        tmp_path.unlink(missing_ok=True)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Could not extract enough text from file. Try a different file or paste text instead.",
+    async with db.transaction():
+        row = await db.fetchrow(
+            """
+            INSERT INTO documents (course_id, uploaded_by, filename, storage_path, source_path, processing_status)
+            VALUES ($1, $2, $3, $4, $5, 'uploaded')
+            RETURNING id, filename, storage_path, page_count, content, processing_status
+            """,
+            course_id,
+            current_user["id"],
+            doc_title,
+            storage_path,
+            source_path,
         )
+        doc_id = str(row["id"])
+        await _link_document_to_sessions(db, doc_id, session_id_list)
 
-    # For PDFs: store in blob storage (or local disk in dev); use inline for TXT/DOCX
-    import asyncio
-    import uuid
-    from services.storage_service import upload_file, get_download_url
-    storage_path = "inline"
-    if ext == ".pdf":
-        stored_name = f"{uuid.uuid4().hex}{ext}"
-        await asyncio.to_thread(upload_file, stored_name, content_bytes)
-        storage_path = stored_name
+    ingestion_queue.notify()
+    return _document_out(row)
 
-    tmp_path.unlink(missing_ok=True)
 
+# ---------------------------------------------------------------------------
+# GET /api/professor/documents/{document_id}/status
+# ---------------------------------------------------------------------------
+
+@router.get("/documents/{document_id}/status", response_model=DocumentStatusOut)
+async def get_document_status(
+    document_id: str,
+    db=Depends(get_db),
+    current_user: dict = Depends(_require_professor),
+):
+    """Ingestion progress for an uploaded document: uploaded → processing → ready | failed."""
     row = await db.fetchrow(
         """
-        INSERT INTO documents (course_id, uploaded_by, filename, storage_path, processing_status, content)
-        VALUES ($1, $2, $3, $4, 'uploaded', $5)
-        RETURNING id, filename, storage_path, page_count, content
+        SELECT d.id, d.processing_status::text AS processing_status, d.attempts,
+               d.error_message, d.page_count, d.processed_at
+        FROM documents d
+        JOIN courses c ON c.id = d.course_id AND c.professor_id = $2
+        WHERE d.id = $1
         """,
-        course_id,
+        document_id,
         current_user["id"],
-        doc_title,
-        storage_path,
-        content,
     )
-    doc_id = str(row["id"])
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    return DocumentStatusOut(
+        id=str(row["id"]),
+        processing_status=row["processing_status"],
+        attempts=row["attempts"],
+        error_message=row["error_message"] if row["processing_status"] != "ready" else None,
+        page_count=row["page_count"],
+        processed_at=row["processed_at"],
+    )
 
-    await process_text_document(db, doc_id, content)
 
-    for sid in session_id_list:
+async def _link_document_to_sessions(db, doc_id: str, session_ids: list[str]) -> None:
+    for sid in session_ids:
         await db.execute(
             """
             INSERT INTO session_documents (session_id, document_id, is_active)
@@ -859,19 +852,18 @@ async def upload_document(
             sid,
             doc_id,
         )
+        answer_cache.invalidate_session(sid)
 
-    row = await db.fetchrow(
-        "SELECT id, filename, storage_path, page_count, content FROM documents WHERE id = $1",
-        doc_id,
-    )
-    url = "" if row["storage_path"] == "inline" else f"/uploads/{row['storage_path']}"
+
+def _document_out(row) -> DocumentOut:
     return DocumentOut(
         id=str(row["id"]),
         filename=row["filename"],
         storage_path=row["storage_path"],
-        url=url,
+        url="" if row["storage_path"] == "inline" else f"/uploads/{row['storage_path']}",
         page_count=row["page_count"],
         content=row.get("content"),
+        processing_status=str(row["processing_status"]),
     )
 
 
@@ -1,7 +1,10 @@
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 
-from auth import get_current_user
-from database import get_db
+from auth import get_current_user, get_current_user_pooled
+from database import get_db, get_pool
 
 from models import (
     AnswerFeedbackOut,
@@ -50,6 +53,11 @@ def _require_student(current_user: dict = Depends(get_current_user)) -> dict:
     return current_user
 
 
+def _require_student_pooled(current_user: dict = Depends(get_current_user_pooled)) -> dict:
+    """_require_student for endpoints that use the pool rather than get_db."""
+    return _require_student(current_user)
+
+
 # ---------------------------------------------------------------------------
 # GET /api/student/courses
 # ---------------------------------------------------------------------------
@@ -286,13 +294,8 @@ async def get_all_sessions(
 # POST /api/student/sessions/{session_id}/questions
 # ---------------------------------------------------------------------------
 
-@router.post("/sessions/{session_id}/questions", response_model=QuestionOut)
-async def post_question(
-    session_id: str,
-    body: PostQuestionRequest,
-    db=Depends(get_db),
-    current_user: dict = Depends(_require_student),
-):
+async def _check_can_ask(db, session_id: str, current_user: dict) -> None:
+    """Raise unless the student is enrolled, Q&A is open and they are under the question limit."""
     session_row = await db.fetchrow(
         """
         SELECT s.id, s.status
@@ -319,16 +322,63 @@ async def post_question(
             detail=f"You've reached the {settings.max_questions_per_session}-question limit for this session.",
         )
 
+
+@router.post("/sessions/{session_id}/questions", response_model=QuestionOut)
+async def post_question(
+    session_id: str,
+    body: PostQuestionRequest,
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_student_pooled),
+):
+    async with pool.acquire() as db:
+        await _check_can_ask(db, session_id, current_user)
+
     return await rag_service.handle_question(
         session_id=session_id,
         student_id=str(current_user["id"]),
         content=body.content,
-        db=db,
+        pool=pool,
         personality=body.personality,
         anonymous=body.anonymous,
     )
 
 
+# ---------------------------------------------------------------------------
+# POST /api/student/sessions/{session_id}/questions/stream  (Server-Sent Events)
+# ---------------------------------------------------------------------------
+
+@router.post("/sessions/{session_id}/questions/stream")
+async def post_question_stream(
+    session_id: str,
+    body: PostQuestionRequest,
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_student_pooled),
+):
+    """Same as POST /questions, but streams the answer as Server-Sent Events.
+
+    Events: question → citations → token (repeated) → done (full QuestionOut), or error.
+    """
+    async with pool.acquire() as db:
+        await _check_can_ask(db, session_id, current_user)
+
+    async def event_stream():
+        async for event, data in rag_service.stream_question(
+            session_id=session_id,
+            student_id=str(current_user["id"]),
+            content=body.content,
+            pool=pool,
+            personality=body.personality,
+            anonymous=body.anonymous,
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------------------------------------------------------------------------
 # GET /api/student/sessions/{session_id}/report  (anonymised class-wide Q&A)
 # ---------------------------------------------------------------------------
@@ -336,11 +386,11 @@ async def post_question(
 @router.get("/sessions/{session_id}/report", response_model=SessionReportResponse)
 async def get_session_report(
     session_id: str,
-    db=Depends(get_db),
-    current_user: dict = Depends(_require_student),
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_student_pooled),
 ):
     """Returns published Q&A for the session, anonymised and grouped by topic."""
-    enrolled = await db.fetchval(
+    enrolled = await pool.fetchval(
         """
         SELECT 1 FROM sessions s
         JOIN course_enrollments ce ON s.course_id = ce.course_id AND ce.student_id = $1
@@ -352,7 +402,7 @@ async def get_session_report(
     if not enrolled:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enrolled in this session's course")
 
-    return await build_session_report(db, session_id, published_only=False)
+    return await build_session_report(pool, session_id, published_only=False)
 
 
 # ---------------------------------------------------------------------------
@@ -440,7 +490,7 @@ async def submit_feedback(
         answer_id,
     )
     if session_id:
-        invalidate_report_cache_for_session(str(session_id))
+        await invalidate_report_cache_for_session(db, str(session_id))
 
     counts = await db.fetchrow(
         """
@@ -634,45 +684,46 @@ async def post_question_comment(
 async def fork_question(
     question_id: str,
     body: PostQuestionRequest,
-    db=Depends(get_db),
-    current_user: dict = Depends(_require_student),
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_student_pooled),
 ):
     """Fork a question — creates a new question with parent Q&A as context, increments parent fork_count."""
-    # Verify access to original question
-    parent = await db.fetchrow(
-        """
-        SELECT q.id, q.content, q.session_id, s.status,
-               a.content AS answer_content
-        FROM questions q
-        JOIN sessions s ON s.id = q.session_id
-        JOIN course_enrollments ce ON ce.course_id = s.course_id AND ce.student_id = $1
-        LEFT JOIN answers a ON a.question_id = q.id
-        WHERE q.id = $2
-        """,
-        current_user["id"],
-        question_id,
-    )
-    if not parent:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enrolled or question not found")
+    async with pool.acquire() as db:
+        # Verify access to original question
+        parent = await db.fetchrow(
+            """
+            SELECT q.id, q.content, q.session_id, s.status,
+                   a.content AS answer_content
+            FROM questions q
+            JOIN sessions s ON s.id = q.session_id
+            JOIN course_enrollments ce ON ce.course_id = s.course_id AND ce.student_id = $1
+            LEFT JOIN answers a ON a.question_id = q.id
+            WHERE q.id = $2
+            """,
+            current_user["id"],
+            question_id,
+        )
+        if not parent:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enrolled or question not found")
 
-    session_id = str(parent["session_id"])
+        session_id = str(parent["session_id"])
 
-    question_count = await db.fetchval(
-        "SELECT COUNT(*) FROM questions WHERE session_id = $1 AND student_id = $2",
-        session_id,
-        str(current_user["id"]),
-    )
-    if question_count >= settings.max_questions_per_session:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"You've reached the {settings.max_questions_per_session}-question limit for this session.",
+        question_count = await db.fetchval(
+            "SELECT COUNT(*) FROM questions WHERE session_id = $1 AND student_id = $2",
+            session_id,
+            str(current_user["id"]),
         )
+        if question_count >= settings.max_questions_per_session:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"You've reached the {settings.max_questions_per_session}-question limit for this session.",
+            )
 
-    # Increment parent fork_count
-    await db.execute(
-        "UPDATE questions SET fork_count = COALESCE(fork_count, 0) + 1 WHERE id = $1",
-        question_id,
-    )
+        # Increment parent fork_count
+        await db.execute(
+            "UPDATE questions SET fork_count = COALESCE(fork_count, 0) + 1 WHERE id = $1",
+            question_id,
+        )
 
     # Build fork: prepend parent context to question content, save forked_from
     parent_context = f"[Forked from: \"{parent['content'][:100]}\"]\n\n"
@@ -682,19 +733,20 @@ async def fork_question(
         session_id=session_id,
         student_id=str(current_user["id"]),
         content=fork_content,
-        db=db,
+        pool=pool,
         personality=body.personality,
         anonymous=body.anonymous,
     )
 
     # Set forked_from on the new question
-    await db.execute(
-        "UPDATE questions SET forked_from = $1 WHERE id = $2",
-        question_id,
-        result.question_id,
-    )
+    async with pool.acquire() as db:
+        await db.execute(
+            "UPDATE questions SET forked_from = $1 WHERE id = $2",
+            question_id,
+            result.question_id,
+        )
 
-    invalidate_report_cache_for_session(session_id)
+    await invalidate_report_cache_for_session(pool, session_id)
     return result
 
 
@@ -1012,85 +1064,86 @@ async def submit_thread_feedback(
 async def fork_thread(
     thread_id: str,
     body: ForkThreadRequest,
-    db=Depends(get_db),
-    current_user: dict = Depends(_require_student),
+    pool=Depends(get_pool),
+    current_user: dict = Depends(_require_student_pooled),
 ):
     """Fork a shared thread: runs RAG on a new question with original thread as context, creates a new shared thread."""
-    # Resolve thread → session
-    thread_row = await db.fetchrow(
-        "SELECT session_id, title, include_questions FROM threads WHERE id = $1 AND shared = true",
-        thread_id,
-    )
-    if not thread_row:
-        raise HTTPException(status_code=404, detail="Thread not found")
-    session_id = str(thread_row["session_id"])
+    async with pool.acquire() as db:
+        # Resolve thread → session
+        thread_row = await db.fetchrow(
+            "SELECT session_id, title, include_questions FROM threads WHERE id = $1 AND shared = true",
+            thread_id,
+        )
+        if not thread_row:
+            raise HTTPException(status_code=404, detail="Thread not found")
+        session_id = str(thread_row["session_id"])
 
-    enrolled = await db.fetchval(
-        """
-        SELECT 1 FROM sessions s
-        JOIN course_enrollments ce ON s.course_id = ce.course_id AND ce.student_id = $1
-        WHERE s.id = $2
-        """,
-        str(current_user["id"]), session_id,
-    )
-    if not enrolled:
-        raise HTTPException(status_code=403, detail="Not enrolled")
+        enrolled = await db.fetchval(
+            """
+            SELECT 1 FROM sessions s
+            JOIN course_enrollments ce ON s.course_id = ce.course_id AND ce.student_id = $1
+            WHERE s.id = $2
+            """,
+            str(current_user["id"]), session_id,
+        )
+        if not enrolled:
+            raise HTTPException(status_code=403, detail="Not enrolled")
 
-    # Check question limit
-    q_count = await db.fetchval(
-        "SELECT COUNT(*) FROM questions WHERE session_id = $1 AND student_id = $2",
-        session_id, str(current_user["id"]),
-    )
-    if int(q_count) >= settings.max_questions_per_session:
-        raise HTTPException(status_code=429, detail="Question limit reached")
+        # Check question limit
+        q_count = await db.fetchval(
+            "SELECT COUNT(*) FROM questions WHERE session_id = $1 AND student_id = $2",
+            session_id, str(current_user["id"]),
+        )
+        if int(q_count) >= settings.max_questions_per_session:
+            raise HTTPException(status_code=429, detail="Question limit reached")
 
-    # Build context from original thread exchanges
-    exchange_rows = await db.fetch(
-        """
-        SELECT q.content, a.content AS answer
-        FROM questions q LEFT JOIN answers a ON a.question_id = q.id
-        WHERE q.thread_id = $1 ORDER BY q.thread_sequence ASC
-        """,
-        thread_id,
-    )
+        # Build context from original thread exchanges
+        exchange_rows = await db.fetch(
+            """
+            SELECT q.content, a.content AS answer
+            FROM questions q LEFT JOIN answers a ON a.question_id = q.id
+            WHERE q.thread_id = $1 ORDER BY q.thread_sequence ASC
+            """,
+            thread_id,
+        )
     original_title = thread_row["title"] or (exchange_rows[0]["content"][:60] if exchange_rows else "thread")
     context_prefix = f'[Forked from: "{original_title}"]\n\n'
     fork_content = context_prefix + body.content
 
     # Run RAG pipeline
-    import asyncio
     question_out = await rag_service.handle_question(
         session_id=session_id,
         student_id=str(current_user["id"]),
         content=fork_content,
-        db=db,
+        pool=pool,
         personality=body.personality,
         anonymous=False,
     )
 
-    # Create new thread and link the question
-    new_thread_row = await db.fetchrow(
-        """
-        INSERT INTO threads (session_id, student_id, title, shared, shared_at, forked_from, include_questions)
-        VALUES ($1, $2, $3, true, now(), $4, true)
-        RETURNING id
-        """,
-        session_id, str(current_user["id"]),
-        body.title or body.content[:80],
-        thread_id,
-    )
-    new_thread_id = str(new_thread_row["id"])
+    async with pool.acquire() as db:
+        # Create new thread and link the question
+        new_thread_row = await db.fetchrow(
+            """
+            INSERT INTO threads (session_id, student_id, title, shared, shared_at, forked_from, include_questions)
+            VALUES ($1, $2, $3, true, now(), $4, true)
+            RETURNING id
+            """,
+            session_id, str(current_user["id"]),
+            body.title or body.content[:80],
+            thread_id,
+        )
+        new_thread_id = str(new_thread_row["id"])
 
-    await db.execute(
-        "UPDATE questions SET thread_id = $1, thread_sequence = 1 WHERE id = $2",
-        new_thread_id, question_out.question_id,
-    )
-    await db.execute(
-        "UPDATE threads SET fork_count = fork_count + 1 WHERE id = $1",
-        thread_id,
-    )
+        await db.execute(
+            "UPDATE questions SET thread_id = $1, thread_sequence = 1 WHERE id = $2",
+            new_thread_id, question_out.question_id,
+        )
+        await db.execute(
+            "UPDATE threads SET fork_count = fork_count + 1 WHERE id = $1",
+            thread_id,
+        )
 
-    threads = await _fetch_rich_threads(db, session_id, str(current_user["id"]), thread_id=new_thread_id)
+        threads = await _fetch_rich_threads(db, session_id, str(current_user["id"]), thread_id=new_thread_id)
     return threads[0]
 
 
@@ -0,0 +1,73 @@
+"""
+One-off script: fill questions.embedding for questions asked before embeddings were stored.
+
+Walks questions with a NULL embedding in id order, a batch at a time, through the shared embedding
+cache — questions asked through the app were embedded when answered, so most batches cost no API
+calls. Each batch commits on its own; interrupt at any point and re-run (or pass --after with the
+last id printed) to resume.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/backfill_question_embeddings.py [--batch-size 500] [--after <question uuid>]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services import embedding_cache
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--after", default="00000000-0000-0000-0000-000000000000", help="Resume after this question id")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+
+    remaining = await conn.fetchval("SELECT COUNT(*) FROM questions WHERE embedding IS NULL AND id > $1::uuid", args.after)
+    print(f"{remaining} question(s) without an embedding.")
+    last_id = args.after
+    done = 0
+
+    while True:
+        rows = await conn.fetch(
+            """
+            SELECT id, content FROM questions
+            WHERE embedding IS NULL AND id > $1::uuid
+            ORDER BY id
+            LIMIT $2
+            """,
+            last_id,
+            args.batch_size,
+        )
+        if not rows:
+            break
+
+        embeddings = await embedding_cache.get_embeddings([r["content"] for r in rows], conn)
+        await conn.executemany(
+            "UPDATE questions SET embedding = $2 WHERE id = $1 AND embedding IS NULL",
+            [(r["id"], embedding) for r, embedding in zip(rows, embeddings)],
+        )
+        done += len(rows)
+        last_id = str(rows[-1]["id"])
+        print(f"  {done}/{remaining} (last id {last_id})")
+
+    await conn.close()
+    print(f"\nDone. Cache: {embedding_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
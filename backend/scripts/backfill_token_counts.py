@@ -0,0 +1,66 @@
+"""
+One-off script: recompute document_chunks.token_count with the real tokenizer.
+
+Chunks ingested before the tokenizer-based chunker stored whitespace word counts, which the
+context packer now treats as exact. Walks the table in id order in batches and rewrites every
+count that differs; safe to re-run (a second run updates nothing) and resumable with --after.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/backfill_token_counts.py [--batch-size 2000] [--after <chunk uuid>]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import asyncpg
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services import tokenizer
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--after", default="00000000-0000-0000-0000-000000000000", help="Resume after this chunk id")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    last_id = args.after
+    scanned = updated = 0
+
+    while True:
+        rows = await conn.fetch(
+            "SELECT id, content, token_count FROM document_chunks WHERE id > $1::uuid ORDER BY id LIMIT $2",
+            last_id,
+            args.batch_size,
+        )
+        if not rows:
+            break
+
+        changes = []
+        for row in rows:
+            count = tokenizer.count_tokens(row["content"])
+            if count != row["token_count"]:
+                changes.append((row["id"], count))
+        if changes:
+            await conn.executemany("UPDATE document_chunks SET token_count = $2 WHERE id = $1", changes)
+
+        scanned += len(rows)
+        updated += len(changes)
+        last_id = str(rows[-1]["id"])
+        print(f"  scanned {scanned}, updated {updated} (last id {last_id})")
+
+    await conn.close()
+    print(f"\nDone. {updated} of {scanned} chunk token counts updated.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
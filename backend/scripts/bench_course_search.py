@@ -0,0 +1,240 @@
+"""
+Benchmark: filtered ANN search — one global HNSW index vs per-course partial HNSW indexes with
+ef_search sized by services.chunk_search — recall@k and latency at 1M+ chunks.
+
+Works on synthetic data in a scratch schema (bench_course_search), never on document_chunks:
+  --chunks vectors over --courses courses with Zipf-like sizes, --docs-per-course documents each;
+  every document's chunks are noisy copies of a document centre, so neighbours are realistic.
+Indexes built: the old layout (one HNSW over everything) and the new one (a partial HNSW per course
+with at least VECTOR_COURSE_INDEX_MIN_CHUNKS chunks). Each query searches 3–10 random documents of
+a random indexed course, like a session's active materials, and is scored against an exact scan.
+
+  global  — ORDER BY embedding <=> q over the global index, document filter applied after the scan,
+            default hnsw.ef_search (40): what retrieval did before migration 019
+  routed  — chunk_search's plan: exact scan for small candidate sets, otherwise the course's partial
+            index with SET LOCAL hnsw.ef_search = ef_search_for(k, candidates, course_chunks)
+
+Building HNSW over 1M × 1536 vectors takes a long while; --dims 256 gives the same picture faster.
+The global index is dropped after its pass, so --reuse (rerun against data generated earlier)
+measures the routed plan only; --drop removes the schema.
+
+Usage:
+    cd backend
+    python scripts/bench_course_search.py [--chunks 1000000] [--courses 60] [--dims 1536] [--queries 200]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services.chunk_search import ef_search_for
+
+SCHEMA = "bench_course_search"
+_BATCH = 20000
+
+
+def _course_sizes(total: int, courses: int) -> list[int]:
+    weights = 1 / np.arange(1, courses + 1) ** 0.8
+    sizes = np.floor(weights / weights.sum() * total).astype(int)
+    sizes[0] += total - sizes.sum()
+    return sizes.tolist()
+
+
+async def _generate(conn, args) -> None:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute(
+        f"""
+        CREATE TABLE {SCHEMA}.chunks (
+            id          BIGSERIAL PRIMARY KEY,
+            course_id   INT NOT NULL,
+            document_id INT NOT NULL,
+            embedding   vector({args.dims}) NOT NULL
+        )
+        """
+    )
+    rng = np.random.default_rng(0)
+    document_id = 0
+    start = time.perf_counter()
+    for course_id, size in enumerate(_course_sizes(args.chunks, args.courses)):
+        per_doc = np.array_split(np.arange(size), args.docs_per_course)
+        records = []
+        for members in per_doc:
+            document_id += 1
+            centre = rng.standard_normal(args.dims, dtype=np.float32)
+            vectors = centre + rng.standard_normal((len(members), args.dims), dtype=np.float32) * 1.5
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            records.extend((course_id, document_id, v) for v in vectors)
+            if len(records) >= _BATCH:
+                await conn.copy_records_to_table(
+                    "chunks", schema_name=SCHEMA, records=records, columns=["course_id", "document_id", "embedding"]
+                )
+                records = []
+        if records:
+            await conn.copy_records_to_table(
+                "chunks", schema_name=SCHEMA, records=records, columns=["course_id", "document_id", "embedding"]
+            )
+    print(f"Generated {args.chunks} chunks in {time.perf_counter() - start:.0f}s")
+
+    await conn.execute("SET maintenance_work_mem = '2GB'")
+    await conn.execute(f"CREATE INDEX ON {SCHEMA}.chunks (document_id)")
+    await conn.execute(f"CREATE INDEX ON {SCHEMA}.chunks (course_id)")
+
+    start = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX chunks_hnsw_global ON {SCHEMA}.chunks "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+    print(f"Global HNSW index: {time.perf_counter() - start:.0f}s")
+
+    start = time.perf_counter()
+    for row in await conn.fetch(
+        f"SELECT course_id FROM {SCHEMA}.chunks GROUP BY course_id HAVING COUNT(*) >= $1",
+        settings.vector_course_index_min_chunks,
+    ):
+        await conn.execute(
+            f"CREATE INDEX chunks_hnsw_course_{row['course_id']} ON {SCHEMA}.chunks "
+            "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) "
+            f"WHERE course_id = {int(row['course_id'])}"
+        )
+    print(f"Per-course HNSW indexes: {time.perf_counter() - start:.0f}s")
+    await conn.execute(f"ANALYZE {SCHEMA}.chunks")
+
+
+async def _exact(conn, doc_ids, q, k) -> list[int]:
+    rows = await conn.fetch(
+        f"""
+        WITH ranked AS MATERIALIZED (
+            SELECT id, embedding <=> $2 AS distance FROM {SCHEMA}.chunks
+            WHERE document_id = ANY($1::int[])
+            ORDER BY distance LIMIT $3
+        )
+        SELECT id FROM ranked ORDER BY distance
+        """,
+        doc_ids, q, k,
+    )
+    return [r["id"] for r in rows]
+
+
+async def _global(conn, doc_ids, q, k) -> list[int]:
+    rows = await conn.fetch(
+        f"""
+        SELECT id FROM {SCHEMA}.chunks
+        WHERE document_id = ANY($1::int[])
+        ORDER BY embedding <=> $2 LIMIT $3
+        """,
+        doc_ids, q, k,
+    )
+    return [r["id"] for r in rows]
+
+
+async def _routed(conn, course_id, course_chunks, doc_ids, candidates, q, k) -> tuple[list[int], int | None]:
+    ef_search = ef_search_for(k, candidates, course_chunks)
+    if ef_search is None:
+        return await _exact(conn, doc_ids, q, k), None
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+        rows = await conn.fetch(
+            f"""
+            SELECT id FROM {SCHEMA}.chunks
+            WHERE course_id = {int(course_id)} AND document_id = ANY($1::int[])
+            ORDER BY embedding <=> $2 LIMIT $3
+            """,
+            doc_ids, q, k,
+        )
+    return [r["id"] for r in rows], ef_search
+
+
+def _summary(name: str, times_ms: list[float], recalls: list[float]) -> str:
+    ordered = sorted(times_ms)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return (f"  {name:<8} median={statistics.median(ordered):8.2f} ms  p95={p95:8.2f} ms  "
+            f"recall@k mean={statistics.mean(recalls):.3f} min={min(recalls):.3f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--docs-per-course", type=int, default=40)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="query data generated by an earlier run")
+    parser.add_argument("--drop", action="store_true", help="drop the scratch schema and exit")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+    if args.drop:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+        return
+    if not args.reuse:
+        await _generate(conn, args)
+
+    courses = await conn.fetch(
+        f"SELECT course_id, COUNT(*) AS n FROM {SCHEMA}.chunks GROUP BY course_id HAVING COUNT(*) >= $1",
+        settings.vector_course_index_min_chunks,
+    )
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(args.queries):
+        course = courses[rng.integers(len(courses))]
+        docs = await conn.fetch(
+            f"SELECT document_id, COUNT(*) AS n FROM {SCHEMA}.chunks WHERE course_id = $1 GROUP BY document_id",
+            course["course_id"],
+        )
+        picked = rng.choice(len(docs), size=min(len(docs), int(rng.integers(3, 11))), replace=False)
+        doc_ids = [docs[i]["document_id"] for i in picked]
+        anchor = await conn.fetchval(
+            f"SELECT embedding FROM {SCHEMA}.chunks WHERE document_id = $1 ORDER BY random() LIMIT 1", doc_ids[0]
+        )
+        q = anchor + rng.standard_normal(len(anchor)).astype(np.float32) * 0.02
+        truth = set(await _exact(conn, doc_ids, q, args.k))
+        queries.append((course, doc_ids, sum(docs[i]["n"] for i in picked), q, truth))
+
+    results = {}
+    # Old layout first; then drop the global index (as migration 019 does) so the planner cannot
+    # pick it for the routed queries
+    if await conn.fetchval("SELECT to_regclass($1)", f"{SCHEMA}.chunks_hnsw_global"):
+        times, recalls = [], []
+        for course, doc_ids, candidates, q, truth in queries:
+            start = time.perf_counter()
+            ids = await _global(conn, doc_ids, q, args.k)
+            times.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth & set(ids)) / len(truth) if truth else 1.0)
+        results["global"] = (times, recalls)
+        await conn.execute(f"DROP INDEX {SCHEMA}.chunks_hnsw_global")
+
+    times, recalls, exact_plans = [], [], 0
+    for course, doc_ids, candidates, q, truth in queries:
+        start = time.perf_counter()
+        ids, ef_search = await _routed(conn, course["course_id"], course["n"], doc_ids, candidates, q, args.k)
+        times.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(truth & set(ids)) / len(truth) if truth else 1.0)
+        exact_plans += ef_search is None
+    results["routed"] = (times, recalls)
+
+    total = await conn.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.chunks")
+    print(f"{total} chunks, {len(courses)} indexed courses, {args.queries} queries, top-{args.k}")
+    for name, (times, recalls) in results.items():
+        print(_summary(name, times, recalls))
+    print(f"  routed used the exact plan for {exact_plans}/{args.queries} queries")
+    await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
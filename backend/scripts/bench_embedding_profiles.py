@@ -0,0 +1,156 @@
+"""
+Benchmark: embedding profiles (services.embedding_profile) — HNSW index size, query latency and
+recall@k of reduced-dimension / half-precision indexes against the full 1536-dim float32 baseline.
+
+Copies up to --chunks real chunk embeddings from document_chunks into a scratch schema
+(bench_embedding_profiles), so production indexes are untouched, and uses the --queries most recent
+stored question embeddings as queries (chunk embeddings with a little noise if there are none).
+Ground truth is an exact full-precision scan, taken before any index exists. Then for each profile
+an HNSW index is built over the profile's expression, exactly as chunk_search builds course
+indexes, and every query runs ORDER BY <expression> <=> <projected query> at --ef-search.
+
+Reduced profiles are only meaningful on real embeddings: text-embedding-3 vectors are
+Matryoshka-trained, random vectors are not.
+
+Usage:
+    cd backend
+    python scripts/bench_embedding_profiles.py [--chunks 200000] [--queries 200] [--ef-search 40]
+    python scripts/bench_embedding_profiles.py --profiles vector1536,halfvec768,halfvec512
+"""
+
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services.embedding_profile import Profile
+
+SCHEMA = "bench_embedding_profiles"
+DEFAULT_PROFILES = "vector1536,halfvec1536,vector768,halfvec768,halfvec512,halfvec256"
+
+
+def _parse_profiles(value: str) -> list[Profile]:
+    profiles = []
+    for tag in value.split(","):
+        match = re.fullmatch(r"(vector|halfvec)(\d+)", tag.strip())
+        if not match:
+            raise SystemExit(f"Bad profile {tag!r}: expected e.g. halfvec768")
+        profiles.append(Profile(int(match.group(2)), match.group(1)))
+    return profiles
+
+
+async def _copy_chunks(conn, limit: int) -> int:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute(
+        f"""
+        CREATE TABLE {SCHEMA}.chunks AS
+        SELECT id, embedding FROM document_chunks
+        WHERE embedding IS NOT NULL
+        ORDER BY id
+        LIMIT {int(limit)}
+        """
+    )
+    await conn.execute(f"ANALYZE {SCHEMA}.chunks")
+    return await conn.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.chunks")
+
+
+async def _queries(conn, n: int) -> list[np.ndarray]:
+    rows = await conn.fetch(
+        "SELECT embedding FROM questions WHERE embedding IS NOT NULL ORDER BY asked_at DESC LIMIT $1", n
+    )
+    if rows:
+        return [np.asarray(r["embedding"], dtype=np.float32) for r in rows]
+    rng = np.random.default_rng(0)
+    queries = []
+    for r in await conn.fetch(f"SELECT embedding FROM {SCHEMA}.chunks ORDER BY random() LIMIT $1", n):
+        q = np.asarray(r["embedding"], dtype=np.float32) + rng.standard_normal(1536).astype(np.float32) * 0.02
+        queries.append(q / np.linalg.norm(q))
+    return queries
+
+
+async def _search(conn, profile: Profile, q: np.ndarray, k: int) -> list[int]:
+    if profile.is_full:
+        sql = f"SELECT id FROM {SCHEMA}.chunks ORDER BY embedding <=> $1 LIMIT $2"
+        rows = await conn.fetch(sql, q, k)
+    else:
+        sql = (f"SELECT id FROM {SCHEMA}.chunks "
+               f"ORDER BY {profile.expression()} <=> {profile.query_cast('$1')} LIMIT $2")
+        rows = await conn.fetch(sql, profile.project(q), k)
+    return [r["id"] for r in rows]
+
+
+def _summary(profile: Profile, index_mb: float, build_s: float, times_ms: list[float], recalls: list[float]) -> str:
+    ordered = sorted(times_ms)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return (f"  {profile.tag:<12} index={index_mb:9.1f} MB  build={build_s:6.0f}s  "
+            f"median={statistics.median(ordered):7.2f} ms  p95={p95:7.2f} ms  "
+            f"recall@k mean={statistics.mean(recalls):.3f} min={min(recalls):.3f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--ef-search", type=int, default=40)
+    parser.add_argument("--profiles", default=DEFAULT_PROFILES)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+    profiles = _parse_profiles(args.profiles)
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+    total = await _copy_chunks(conn, args.chunks)
+    if not total:
+        print("No embedded chunks in document_chunks — nothing to benchmark.")
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+        return
+    queries = await _queries(conn, args.queries)
+
+    # Exact full-precision top-k: the 1536-dim float32 ground truth, before any index exists
+    truth = [set(await _search(conn, Profile(1536, "vector"), q, args.k)) for q in queries]
+
+    await conn.execute("SET maintenance_work_mem = '2GB'")
+    await conn.execute(f"SET hnsw.ef_search = {int(args.ef_search)}")
+    print(f"{total} chunks, {len(queries)} queries, top-{args.k}, ef_search={args.ef_search}")
+    for profile in profiles:
+        key = "embedding" if profile.is_full else f"({profile.expression()})"
+        start = time.perf_counter()
+        await conn.execute(
+            f"CREATE INDEX chunks_{profile.tag} ON {SCHEMA}.chunks "
+            f"USING hnsw ({key} {profile.opclass}) WITH (m = 16, ef_construction = 64)"
+        )
+        build_s = time.perf_counter() - start
+        index_mb = await conn.fetchval("SELECT pg_relation_size($1::regclass)", f"{SCHEMA}.chunks_{profile.tag}") / 2**20
+
+        times, recalls = [], []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ids = await _search(conn, profile, q, args.k)
+            times.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(expected & set(ids)) / len(expected) if expected else 1.0)
+        print(_summary(profile, index_mb, build_s, times, recalls))
+        # One index at a time, so the planner cannot answer a profile's query from another's index
+        await conn.execute(f"DROP INDEX {SCHEMA}.chunks_{profile.tag}")
+
+    if not args.keep:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark: how closely the course-materials block fills CONTEXT_MATERIAL_TOKEN_BUDGET, before and
+after the tokenizer-based packer.
+
+For a sample of real questions, retrieves the same top-20 chunks the RAG pipeline would, then packs
+them twice:
+  before — whitespace word counts, stop at the first chunk that does not fit (the old Step 5)
+  after  — rag_service._pack_materials: stored tokenizer counts plus header cost, skip-and-continue
+and measures the exact size of each resulting materials block with the tokenizer. Prints the mean
+size, mean absolute deviation from the budget, and how often each packer overshoots.
+
+Run scripts/backfill_token_counts.py first so stored counts are exact.
+
+Usage:
+    cd backend
+    python scripts/bench_prompt_packing.py [--questions 200] [--budget 8000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services import embedding_cache, tokenizer
+from services.rag_service import _active_document_ids, _pack_materials, _retrieve_chunks
+
+
+def _pack_by_words(chunks: list[dict], budget: int) -> str:
+    """The pre-tokenizer Step 5/6: word counts, break at the first chunk over budget."""
+    parts = []
+    tokens_used = 0
+    cite_num = 1
+    for c in chunks:
+        t = max(1, len(c["content"].split()))
+        if tokens_used + t > budget:
+            break
+        tokens_used += t
+        if c["is_real_chunk"]:
+            header = f"[{cite_num}] {c.get('filename', 'Document')} (Page {c['page_number'] or '?'})"
+            cite_num += 1
+        else:
+            header = f"[Ref] {c.get('filename', 'Document')}"
+        parts.append(f"{header}:\n{c['content']}")
+    return "\n\n".join(parts)
+
+
+def _report(name: str, sizes: list[int], budget: int) -> None:
+    deviation = [abs(s - budget) / budget * 100 for s in sizes]
+    over = [s for s in sizes if s > budget]
+    print(f"  {name:<7} mean={statistics.fmean(sizes):7.0f} tok  "
+          f"mean |dev|={statistics.fmean(deviation):5.1f}%  "
+          f"over budget={len(over) / len(sizes) * 100:5.1f}%  "
+          f"max={max(sizes)} tok")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=settings.context_material_token_budget)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+
+    questions = await conn.fetch(
+        "SELECT session_id, content FROM questions ORDER BY asked_at DESC LIMIT $1",
+        args.questions,
+    )
+    before: list[int] = []
+    after: list[int] = []
+    for q in questions:
+        active_doc_ids = await _active_document_ids(conn, str(q["session_id"]))
+        if not active_doc_ids:
+            continue
+        query_embedding = await embedding_cache.get_embedding(q["content"], conn)
+        chunks = await _retrieve_chunks(conn, str(q["session_id"]), active_doc_ids, query_embedding)
+        if not chunks:
+            continue
+        before.append(tokenizer.count_tokens(_pack_by_words(chunks, args.budget)))
+        materials, _, _ = _pack_materials(chunks, args.budget)
+        after.append(tokenizer.count_tokens(materials))
+
+    await conn.close()
+    if not before:
+        print("No questions with retrievable materials — nothing to compare.")
+        return
+
+    print(f"Materials block size for {len(before)} questions (budget {args.budget} tokens):")
+    _report("before", before, args.budget)
+    _report("after", after, args.budget)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark: database phase of build_session_report — query count and wall time, before and after
+the set-based rewrite.
+
+  before — the old loader: one row query with three correlated COUNT(*) subqueries per row, then
+           one answer_citations query per answered question (N+1)
+  after  — report_service._load_session_rows: grouped aggregates joined once plus one batched
+           ANY($1::uuid[]) citations query
+
+Each variant runs --runs times on the same connection; queries are counted by wrapping it.
+Defaults to the session with the most questions (load db/seed_demo_prod_bulk.sql first).
+
+Usage:
+    cd backend
+    python scripts/bench_report_queries.py [--session-id <uuid>] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services.report_service import _load_session_rows
+
+
+class _CountingConnection:
+    """Delegates to an asyncpg connection, counting round trips."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+        self.queries = 0
+
+    async def fetch(self, *args, **kwargs):
+        self.queries += 1
+        return await self._conn.fetch(*args, **kwargs)
+
+
+async def _load_n_plus_one(db, session_id: str):
+    rows = await db.fetch(
+        """
+        SELECT
+            q.id AS question_id, q.content AS question_content, q.asked_at, q.student_id,
+            q.category AS category, COALESCE(q.fork_count, 0) AS fork_count, q.forked_from AS forked_from,
+            a.id AS answer_id, a.content AS answer_content, a.model_used, a.generation_latency_ms,
+            COALESCE((SELECT COUNT(*) FROM answer_feedback af
+                      WHERE af.answer_id = a.id AND af.feedback = 'up'), 0)   AS thumbs_up,
+            COALESCE((SELECT COUNT(*) FROM answer_feedback af
+                      WHERE af.answer_id = a.id AND af.feedback = 'down'), 0) AS thumbs_down,
+            COALESCE((SELECT COUNT(*) FROM question_comments qc
+                      WHERE qc.question_id = q.id), 0)                         AS comment_count
+        FROM questions q
+        LEFT JOIN answers a ON a.question_id = q.id
+        WHERE q.session_id = $1
+        ORDER BY q.asked_at ASC
+        """,
+        session_id,
+    )
+    citations = {}
+    for row in rows:
+        if row["answer_id"]:
+            citations[row["answer_id"]] = await db.fetch(
+                """
+                SELECT ac.chunk_id, dc.content, dc.page_number, ac.relevance_score, ac.citation_order
+                FROM answer_citations ac
+                JOIN document_chunks dc ON dc.id = ac.chunk_id
+                WHERE ac.answer_id = $1
+                ORDER BY ac.citation_order
+                """,
+                row["answer_id"],
+            )
+    return rows, citations
+
+
+async def _measure(conn, loader, session_id: str, runs: int) -> tuple[int, list[float], int, int]:
+    times = []
+    for _ in range(runs):
+        db = _CountingConnection(conn)
+        start = time.perf_counter()
+        rows, citations = await loader(db, session_id)
+        times.append((time.perf_counter() - start) * 1000)
+    return db.queries, times, len(rows), sum(len(c) for c in citations.values())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session-id")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+    session_id = args.session_id or str(await conn.fetchval(
+        "SELECT session_id FROM questions GROUP BY session_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ))
+
+    print(f"Session {session_id}")
+    for name, loader in (("before", _load_n_plus_one), ("after", _load_session_rows)):
+        queries, times, n_rows, n_citations = await _measure(conn, loader, session_id, args.runs)
+        print(f"  {name:<7} queries={queries:<5} rows={n_rows:<5} citations={n_citations:<6} "
+              f"median={statistics.median(times):8.1f} ms  min={min(times):8.1f} ms")
+
+    await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
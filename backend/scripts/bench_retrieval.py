@@ -0,0 +1,137 @@
+"""
+Benchmark: chunk retrieval (step 4 of handle_question) — pgvector SQL vs the in-memory session index.
+
+For the --questions most recent questions that have a stored embedding and an active session with
+ready documents, runs both retrieval paths on the same connection. It reports per-query latency
+(median / p95) and the recall of the SQL path against the exact in-memory top-20. The first
+in-memory query per session includes the index build; it is reported separately. The two-stage
+quantized search (chunk_search.search_quantized, migration 020) is measured the same way, keeping
+--candidates chunks from the binary first stage.
+
+--synthetic skips the database and times the exact top-k matrix-vector product alone on random
+unit vectors for a few session sizes.
+
+Usage:
+    cd backend
+    python scripts/bench_retrieval.py [--questions 200] [--candidates 400]
+    python scripts/bench_retrieval.py --synthetic
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+
+def _summary(name: str, times_ms: list[float]) -> str:
+    ordered = sorted(times_ms)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return f"  {name:<22} median={statistics.median(ordered):7.2f} ms  p95={p95:7.2f} ms  (n={len(ordered)})"
+
+
+def _synthetic(k: int) -> None:
+    from services.vector_index import top_k
+
+    rng = np.random.default_rng(0)
+    for n in (300, 1000, 5000, 20000):
+        matrix = rng.standard_normal((n, 1536), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        queries = rng.standard_normal((200, 1536), dtype=np.float32)
+        times = []
+        for q in queries:
+            start = time.perf_counter()
+            top_k(matrix, q, k)
+            times.append((time.perf_counter() - start) * 1000)
+        print(_summary(f"{n} chunks", times))
+
+
+async def _database(args) -> None:
+    import asyncpg
+    from pgvector.asyncpg import register_vector
+
+    from config import settings
+    from services import chunk_search, rag_service, vector_index
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+    questions = await conn.fetch(
+        """
+        SELECT q.session_id, q.embedding FROM questions q
+        WHERE q.embedding IS NOT NULL
+        ORDER BY q.asked_at DESC
+        LIMIT $1
+        """,
+        args.questions,
+    )
+
+    sql_ms, memory_ms, build_ms, recalls = [], [], [], []
+    quantized_ms, quantized_recalls = [], []
+    seen_sessions: set[str] = set()
+    for q in questions:
+        session_id = str(q["session_id"])
+        active_doc_ids = await rag_service._active_document_ids(conn, session_id)
+        if not active_doc_ids:
+            continue
+
+        start = time.perf_counter()
+        exact = await vector_index.search(conn, session_id, active_doc_ids, q["embedding"], args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        if exact is None:
+            continue  # session above VECTOR_INDEX_MAX_CHUNKS
+        (memory_ms if session_id in seen_sessions else build_ms).append(elapsed)
+        seen_sessions.add(session_id)
+
+        start = time.perf_counter()
+        approx = await rag_service._search_chunks_sql(conn, active_doc_ids, q["embedding"])
+        sql_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        quantized = await chunk_search.search_quantized(
+            conn, active_doc_ids, q["embedding"], args.k, args.candidates
+        )
+        quantized_ms.append((time.perf_counter() - start) * 1000)
+
+        if exact:
+            truth = {c["id"] for c in exact}
+            recalls.append(len(truth & {c["id"] for c in approx}) / len(truth))
+            quantized_recalls.append(len(truth & {c["id"] for c in quantized}) / len(truth))
+
+    await conn.close()
+    if not sql_ms:
+        print("No questions with retrievable materials — nothing to compare.")
+        return
+    print(f"{len(sql_ms)} queries over {len(seen_sessions)} sessions, top-{args.k}")
+    print(_summary("pgvector SQL", sql_ms))
+    if memory_ms:
+        print(_summary("in-memory (warm)", memory_ms))
+    print(_summary("in-memory (with build)", build_ms))
+    print(_summary(f"quantized ({args.candidates})", quantized_ms))
+    if recalls:
+        print(f"  SQL recall@{args.k} vs exact: mean={statistics.mean(recalls):.3f}  min={min(recalls):.3f}")
+        print(f"  quantized recall@{args.k} vs exact: mean={statistics.mean(quantized_recalls):.3f}  "
+              f"min={min(quantized_recalls):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=400, help="first-stage candidates for the quantized search")
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+    if args.synthetic:
+        _synthetic(args.k)
+    else:
+        asyncio.run(_database(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: wall time of build_session_report for one session, cache bypassed.
+
+Builds the report --runs times with report_service._build_report (no cache, no single-flight) and prints
+the question count and per-run timings, plus the time spent in local topic clustering and
+near-duplicate detection alone. Then times an incremental refresh from the last full build, with
+the newest --new questions treated as arrived since (assigned to the nearest topic, no LLM calls).
+Targets: a 2,000-question session in under 3 s; duplicate detection for 10k questions well under
+1 s; an incremental refresh a small fraction of a full build.
+
+Usage (bulk demo data loaded, question embeddings backfilled):
+    cd backend
+    python scripts/bench_session_report.py --session-id <uuid> [--runs 3] [--new 20]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from database import create_pool
+from services import duplicate_detection, report_cache, report_service, topic_clustering
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--new", type=int, default=20)
+    args = parser.parse_args()
+
+    pool = await create_pool(settings.database_url)
+    async with pool.acquire() as db:
+        rows = await db.fetch(
+            "SELECT content AS question_content, embedding AS question_embedding FROM questions WHERE session_id = $1",
+            args.session_id,
+        )
+        embeddings = await report_service._question_embeddings(db, rows)
+
+        start = time.perf_counter()
+        labels, centroids = topic_clustering.cluster(embeddings)
+        print(f"{len(rows)} questions; local clustering: {time.perf_counter() - start:.2f}s, k={len(centroids)}")
+
+        start = time.perf_counter()
+        groups = duplicate_detection.find_duplicate_groups(embeddings, settings.repeating_question_similarity)
+        print(f"  duplicate detection: {time.perf_counter() - start:.3f}s, {len(groups)} groups")
+
+        for run in range(1, args.runs + 1):
+            start = time.perf_counter()
+            report, state = await report_service._build_report(db, args.session_id)
+            elapsed = time.perf_counter() - start
+            print(f"  run {run}: {elapsed:.2f}s — {len(report.groups)} topics, "
+                  f"{len(report.repeating_questions)} repeating groups")
+
+        newest = {
+            str(r["id"]) for r in await db.fetch(
+                "SELECT id FROM questions WHERE session_id = $1 ORDER BY asked_at DESC LIMIT $2",
+                args.session_id,
+                args.new,
+            )
+        }
+        state.topics = [
+            {**t, "question_ids": [qid for qid in t["question_ids"] if qid not in newest]} for t in state.topics
+        ]
+        previous = report_cache.CachedReport(
+            report=report, built_at=time.time(), question_count=report.total_questions, topic_state=state
+        )
+        start = time.perf_counter()
+        _, new_state = await report_service._build_report(db, args.session_id, previous=previous)
+        mode = "incremental" if new_state.centroids is state.centroids else "full recluster (drift)"
+        print(f"  refresh with {len(newest)} new questions: {time.perf_counter() - start:.2f}s — {mode}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Benchmark: p99 latency of unrelated endpoints while large PDFs are being ingested.
+
+Generates a --pages page PDF with fpdf2, uploads it --uploads times concurrently to the given
+course/session, and while the ingestion workers extract and embed them keeps probing the
+health check, the professor course list and login. Probing continues until every upload is
+'ready' or 'failed' (polled via GET /api/professor/documents/{id}/status). Prints p50/p95/p99
+per probe and exits non-zero if any probe's p99 exceeds --max-p99-ms.
+
+Before extraction moved to a process pool, pypdf ran on the event loop and every probe on
+that worker stalled for the whole extraction of each file.
+
+Usage (API running on :8000, dev seed loaded):
+    cd backend
+    python scripts/bench_upload_latency.py \\
+        --course-id 00000000-0000-0000-0000-000000000010 \\
+        --session-id <session uuid in that course> \\
+        --uploads 5 --pages 300
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from fpdf import FPDF
+
+PARAGRAPH = (
+    "Gradient descent updates each parameter in the direction of the negative gradient of the "
+    "loss. The learning rate controls the step size: too large and the iterates diverge, too "
+    "small and convergence is slow. Momentum and adaptive methods such as Adam rescale the step "
+    "per parameter using running averages of past gradients. "
+)
+
+
+def _make_pdf(pages: int) -> bytes:
+    pdf = FPDF()
+    pdf.set_font("helvetica", size=10)
+    for n in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, f"Page {n + 1}\n\n" + PARAGRAPH * 12)
+    return bytes(pdf.output())
+
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    r = await client.post("/auth/login", json={"email": email, "password": password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def _upload(client: httpx.AsyncClient, headers: dict, args, pdf: bytes, n: int) -> str:
+    r = await client.post(
+        f"/api/professor/courses/{args.course_id}/documents/upload",
+        headers=headers,
+        files={"file": (f"bench-{n}.pdf", pdf, "application/pdf")},
+        data={"title": f"Upload benchmark {n}", "session_ids": json.dumps([args.session_id])},
+    )
+    r.raise_for_status()
+    return r.json()["id"]
+
+
+async def _wait_processed(client: httpx.AsyncClient, headers: dict, doc_ids: list[str]) -> dict[str, str]:
+    pending = set(doc_ids)
+    final: dict[str, str] = {}
+    while pending:
+        for doc_id in list(pending):
+            r = await client.get(f"/api/professor/documents/{doc_id}/status", headers=headers)
+            r.raise_for_status()
+            state = r.json()["processing_status"]
+            if state in ("ready", "failed"):
+                final[doc_id] = state
+                pending.discard(doc_id)
+        await asyncio.sleep(0.5)
+    return final
+
+
+async def _probe(name: str, request, stop: asyncio.Event, samples: dict[str, list[float]], interval: float) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        r = await request()
+        elapsed = (time.perf_counter() - start) * 1000
+        if r.status_code < 500:
+            samples[name].append(elapsed)
+        await asyncio.sleep(interval)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--course-id", required=True)
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--email", default="prof@example.com")
+    parser.add_argument("--password", default="devpassword")
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between probe requests")
+    parser.add_argument("--max-p99-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    pdf = _make_pdf(args.pages)
+    print(f"Generated {args.pages}-page PDF ({len(pdf) / 1024 / 1024:.1f} MB)")
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0) as client:
+        token = await _login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        samples: dict[str, list[float]] = {"health": [], "courses": [], "login": []}
+        stop = asyncio.Event()
+        probe_tasks = [asyncio.create_task(p) for p in (
+            _probe("health", lambda: client.get("/"), stop, samples, args.probe_interval),
+            _probe("courses", lambda: client.get("/api/professor/courses", headers=headers),
+                   stop, samples, args.probe_interval),
+            _probe("login", lambda: client.post(
+                "/auth/login", json={"email": args.email, "password": args.password},
+            ), stop, samples, args.probe_interval),
+        )]
+
+        start = time.perf_counter()
+        doc_ids = await asyncio.gather(*(_upload(client, headers, args, pdf, n) for n in range(args.uploads)))
+        accepted_s = time.perf_counter() - start
+        final = await _wait_processed(client, headers, doc_ids)
+        total_s = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*probe_tasks)
+
+    ready = sum(1 for s in final.values() if s == "ready")
+    print(f"\n{args.uploads} uploads accepted in {accepted_s:.2f}s; "
+          f"{ready}/{len(final)} ready after {total_s:.1f}s")
+
+    print("\nProbe latency during ingestion:")
+    passed = True
+    for name, values in samples.items():
+        p50, p95, p99 = (_percentile(values, p) for p in (50, 95, 99))
+        verdict = "OK" if values and p99 <= args.max_p99_ms else "SLOW"
+        passed = passed and verdict == "OK"
+        print(f"  {name:<8} n={len(values):<5} p50={p50:7.1f} ms  p95={p95:7.1f} ms  p99={p99:7.1f} ms  "
+              f"max={max(values, default=0):7.1f} ms  {verdict}")
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
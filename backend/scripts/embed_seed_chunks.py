@@ -1,7 +1,9 @@
 """
-One-off script: embed the 3 seed document_chunks that have NULL embeddings.
+One-off script: embed the seed document_chunks that have NULL embeddings.
 Run once after `make db-seed`, before testing the RAG pipeline.
 
+Reads through the shared embedding cache, so re-running after a reseed costs no API calls.
+
 Usage:
     cd backend
     source venv/bin/activate
@@ -9,26 +11,23 @@ Usage:
 """
 
 import asyncio
-import os
 import sys
+from pathlib import Path
 
 import asyncpg
-import numpy as np
-from dotenv import load_dotenv
-from openai import OpenAI
 from pgvector.asyncpg import register_vector
 
-load_dotenv()
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
 
-DATABASE_URL = os.environ["DATABASE_URL"]
-OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
-EMBEDDING_MODEL = "text-embedding-3-small"
+from config import settings
+from services import embedding_cache
+from services.openai_client import EMBEDDING_MODEL
 
 
 async def main():
-    client = OpenAI(api_key=OPENAI_API_KEY)
-
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await asyncpg.connect(settings.database_url)
     await register_vector(conn)
 
     rows = await conn.fetch(
@@ -42,22 +41,18 @@ async def main():
 
     print(f"Embedding {len(rows)} chunk(s)...")
 
-    for row in rows:
-        text = row["content"].replace("\n", " ").strip()
-        response = client.embeddings.create(input=text, model=EMBEDDING_MODEL)
-        embedding = response.data[0].embedding
-        embedding_arr = np.array(embedding, dtype=np.float32)
-
+    embeddings = await embedding_cache.get_embeddings([row["content"] for row in rows], conn)
+    for row, embedding in zip(rows, embeddings):
         await conn.execute(
             "UPDATE document_chunks SET embedding = $1, embedding_model = $2 WHERE id = $3",
-            embedding_arr,
+            embedding,
             EMBEDDING_MODEL,
             row["id"],
         )
         print(f"  ✓ chunk id={row['id']}  chunk_index={row['chunk_index']}")
 
     await conn.close()
-    print("\nDone. All seed chunks now have embeddings.")
+    print(f"\nDone. All seed chunks now have embeddings. Cache: {embedding_cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+"""
+Load test: --callers concurrent report requests for one session, as when a projected report is
+opened by a whole class at once.
+
+Marks the session's cached reports stale first (unless --cold is given, which removes them), then
+fires all callers at build_session_report together and prints how many builds actually ran and the
+caller latency percentiles. With single-flight and stale-while-revalidate, a warm run should show
+one build and millisecond latencies; a --cold run one build that every caller waits for.
+
+Usage (migrations 016 and 017 applied):
+    cd backend
+    python scripts/load_session_report.py --session-id <uuid> [--callers 200] [--cold]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from database import create_pool
+from services import report_cache, report_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--cold", action="store_true", help="drop cached reports instead of marking them stale")
+    args = parser.parse_args()
+
+    pool = await create_pool(settings.database_url)
+    # Make sure there is a cached report to go stale
+    await report_service.build_session_report(pool, args.session_id)
+    if args.cold:
+        await pool.execute("DELETE FROM report_cache WHERE session_id = $1", args.session_id)
+        report_cache._memory.clear()
+    else:
+        await report_service.invalidate_report_cache_for_session(pool, args.session_id)
+
+    builds = 0
+    original = report_service._build_report
+
+    async def counting_build(db, session_id, previous=None):
+        nonlocal builds
+        builds += 1
+        return await original(db, session_id, previous)
+
+    report_service._build_report = counting_build
+
+    async def caller() -> tuple[float, bool]:
+        start = time.perf_counter()
+        report = await report_service.build_session_report(pool, args.session_id)
+        return (time.perf_counter() - start) * 1000, report.is_stale
+
+    results = await asyncio.gather(*(caller() for _ in range(args.callers)))
+    # Let a background rebuild finish before counting
+    await asyncio.gather(*report_service._BUILDS.values(), return_exceptions=True)
+
+    latencies = sorted(ms for ms, _ in results)
+    stale = sum(1 for _, is_stale in results if is_stale)
+    print(f"{args.callers} callers ({'cold' if args.cold else 'stale'} cache): {builds} build(s), "
+          f"{stale} served stale")
+    print(f"  latency p50={statistics.median(latencies):.1f} ms  "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f} ms  max={latencies[-1]:.1f} ms")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Load test: keep N questions in flight and check that non-LLM endpoints stay responsive.
+
+Fires --questions concurrent POST /api/student/sessions/{id}/questions (spread across the
+given student accounts so nobody hits MAX_QUESTIONS_PER_SESSION), and while they are in
+flight repeatedly probes login, the course list and the health check. Prints latency
+percentiles per probe and exits non-zero if any probe's p95 exceeds --max-p95-ms.
+
+Before the RAG pipeline released its connection during OpenAI calls, ten in-flight
+questions exhausted the pool (max_size=10) and every probe below stalled until an
+answer finished.
+
+Usage (API running on :8000, bulk demo data loaded):
+    cd backend
+    python scripts/load_test_questions.py \\
+        --session-id 2475a3af-237a-48e6-ba96-80961f1dda27 \\
+        --students devon@comedy101.com,lena@comedy101.com,omar@comedy101.com,... \\
+        --questions 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+QUESTION_TEMPLATES = [
+    "Can you explain the main idea from today's lecture again? (#{n})",
+    "What is the difference between the two approaches we covered? (#{n})",
+    "How would this concept show up on the exam? (#{n})",
+    "Could you give another example of this technique? (#{n})",
+]
+
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    r = await client.post("/auth/login", json={"email": email, "password": password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def _ask(client: httpx.AsyncClient, token: str, session_id: str, n: int) -> tuple[int, float]:
+    start = time.perf_counter()
+    r = await client.post(
+        f"/api/student/sessions/{session_id}/questions",
+        json={"content": QUESTION_TEMPLATES[n % len(QUESTION_TEMPLATES)].format(n=n)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    return r.status_code, (time.perf_counter() - start) * 1000
+
+
+async def _probe(
+    client: httpx.AsyncClient,
+    name: str,
+    request,
+    stop: asyncio.Event,
+    samples: dict[str, list[float]],
+    interval: float,
+) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        r = await request()
+        elapsed = (time.perf_counter() - start) * 1000
+        if r.status_code < 500:
+            samples[name].append(elapsed)
+        await asyncio.sleep(interval)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--students", required=True, help="Comma-separated student emails")
+    parser.add_argument("--password", default="devpassword")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--per-student", type=int, default=10, help="MAX_QUESTIONS_PER_SESSION on the server")
+    parser.add_argument("--probe-interval", type=float, default=0.2, help="Seconds between probe requests")
+    parser.add_argument("--max-p95-ms", type=float, default=500.0)
+    args = parser.parse_args()
+
+    emails = [e.strip() for e in args.students.split(",") if e.strip()]
+    if len(emails) * args.per_student < args.questions:
+        print(f"ERROR: {len(emails)} students x {args.per_student} questions < {args.questions}; add more students")
+        return 2
+
+    limits = httpx.Limits(max_connections=args.questions + 20, max_keepalive_connections=args.questions + 20)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0, limits=limits) as client:
+        tokens = await asyncio.gather(*(_login(client, e, args.password) for e in emails))
+        probe_token = tokens[0]
+
+        samples: dict[str, list[float]] = {"login": [], "courses": [], "health": []}
+        stop = asyncio.Event()
+        probes = [
+            _probe(client, "login", lambda: client.post(
+                "/auth/login", json={"email": emails[0], "password": args.password},
+            ), stop, samples, args.probe_interval),
+            _probe(client, "courses", lambda: client.get(
+                "/api/student/courses", headers={"Authorization": f"Bearer {probe_token}"},
+            ), stop, samples, args.probe_interval),
+            _probe(client, "health", lambda: client.get("/"), stop, samples, args.probe_interval),
+        ]
+        probe_tasks = [asyncio.create_task(p) for p in probes]
+
+        print(f"Sending {args.questions} concurrent questions to session {args.session_id}...")
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            _ask(client, tokens[i // args.per_student], args.session_id, i) for i in range(args.questions)
+        ))
+        total_s = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*probe_tasks)
+
+    ok = [ms for code, ms in results if code == 200]
+    print(f"\nQuestions: {len(ok)}/{len(results)} answered in {total_s:.1f}s "
+          f"(p50 {_percentile(ok, 50):.0f} ms, max {max(ok, default=0):.0f} ms)")
+    failed_codes = sorted({code for code, _ in results if code != 200})
+    if failed_codes:
+        print(f"  non-200 status codes: {failed_codes}")
+
+    print("\nProbe latency while questions were in flight:")
+    passed = True
+    for name, values in samples.items():
+        p50, p95 = _percentile(values, 50), _percentile(values, 95)
+        verdict = "OK" if values and p95 <= args.max_p95_ms else "SLOW"
+        passed = passed and verdict == "OK"
+        print(f"  {name:<8} n={len(values):<4} p50={p50:7.1f} ms  p95={p95:7.1f} ms  "
+              f"max={max(values, default=0):7.1f} ms  mean={statistics.fmean(values) if values else 0:7.1f} ms  {verdict}")
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
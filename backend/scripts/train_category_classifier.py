@@ -0,0 +1,107 @@
+"""
+Train the local question-category classifier from LLM-labelled questions and save a new version.
+
+Uses every question with category_source = 'llm' (labels the local model produced are never
+trained on) and its stored questions.embedding, falling back to the shared embedding cache for
+rows the backfill has not reached. Reports a holdout evaluation — accuracy, and
+precision/coverage above CATEGORY_CLASSIFIER_MIN_CONFIDENCE — then refits on all data and
+writes classifier_models/category-vNNNN.npz. Running API processes pick the new version up within a minute.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/train_category_classifier.py [--min-precision 0.9] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+# Add backend/ to path so config loads .env from backend/
+_backend = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_backend))
+
+from config import settings
+from services import category_classifier, embedding_cache
+from services.category_classifier import CategoryModel
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-samples", type=int, default=200)
+    parser.add_argument("--min-precision", type=float, default=0.9,
+                        help="Refuse to save if holdout precision above the confidence threshold is lower")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(settings.database_url)
+    await register_vector(conn)
+    rows = await conn.fetch(
+        "SELECT content, category, embedding FROM questions WHERE category_source = 'llm' AND category IS NOT NULL"
+    )
+    if len(rows) < args.min_samples:
+        print(f"Only {len(rows)} LLM-labelled questions (need {args.min_samples}) — not training.")
+        await conn.close()
+        return 1
+
+    missing = [r["content"] for r in rows if r["embedding"] is None]
+    if missing:
+        print(f"Embedding {len(missing)} labelled questions without a stored embedding...")
+    cached = iter(await embedding_cache.get_embeddings(missing, conn) if missing else [])
+    embeddings = np.stack([
+        np.asarray(r["embedding"], dtype=np.float32) if r["embedding"] is not None else next(cached) for r in rows
+    ])
+    await conn.close()
+    labels = [r["category"] for r in rows]
+    print(f"  labels: {dict(Counter(labels))}")
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(rows))
+    n_test = max(1, int(len(rows) * args.holdout))
+    test, trainset = order[:n_test], order[n_test:]
+
+    weights, bias = category_classifier.train(embeddings[trainset], [labels[i] for i in trainset])
+    model = CategoryModel(version=0, classes=list(category_classifier.QUESTION_CATEGORIES),
+                          weights=weights, bias=bias, meta={})
+    probs = model.probabilities(embeddings[test])
+    predicted = [model.classes[i] for i in probs.argmax(axis=1)]
+    truth = [labels[i] for i in test]
+    confident = probs.max(axis=1) >= settings.category_classifier_min_confidence
+
+    accuracy = float(np.mean([p == t for p, t in zip(predicted, truth)]))
+    coverage = float(confident.mean())
+    precision = (
+        float(np.mean([p == t for p, t, c in zip(predicted, truth, confident) if c])) if confident.any() else 0.0
+    )
+    print(f"\nHoldout ({n_test} questions): accuracy {accuracy:.3f}; "
+          f"at confidence >= {settings.category_classifier_min_confidence}: "
+          f"precision {precision:.3f}, coverage {coverage:.1%} (share of LLM calls avoided)")
+
+    if precision < args.min_precision:
+        print(f"Precision below --min-precision {args.min_precision} — not saving.")
+        return 1
+    if args.dry_run:
+        print("Dry run — not saving.")
+        return 0
+
+    weights, bias = category_classifier.train(embeddings, labels)
+    path = category_classifier.save(weights, bias, {
+        "samples": len(rows),
+        "holdout_accuracy": round(accuracy, 4),
+        "holdout_precision": round(precision, 4),
+        "holdout_coverage": round(coverage, 4),
+        "min_confidence": settings.category_classifier_min_confidence,
+    })
+    print(f"Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,117 @@
+"""Per-session semantic answer cache.
+
+Near-duplicate questions in the same session reuse an earlier GPT-4o answer instead of paying for a
+new generation. Entries are keyed by the question embedding and scoped to the personality and the
+signature of the session's ready active documents at the time of the answer — the set of
+(document_id, processed_at), as in services.vector_index. A question only ever hits an answer
+grounded in exactly the materials retrieval would search now: a document that finishes ingestion,
+is re-processed, or is linked or unlinked changes the signature. The cache is per process, and
+because the signature is read from the database on every lookup, other workers stay correct
+without their invalidation running; invalidate_* only frees memory early.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import settings
+
+
+@dataclass
+class CachedAnswer:
+    answer_id: str
+    answer_text: str
+    citation_chunks: list[tuple[dict, int]]  # (chunk, cite_num) exactly as saved with the source answer
+    similarity: float = 0.0
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray  # unit-normalised float32
+    personality: str
+    documents: frozenset[tuple[str, object]]  # (document_id, processed_at) of the ready active documents
+    answer: CachedAnswer
+    created_at: float
+
+
+# session_id -> entries, sessions kept in LRU order
+_CACHE: OrderedDict[str, list[_Entry]] = OrderedDict()
+_MAX_SESSIONS = 500
+
+
+def _normalise(embedding: list[float] | np.ndarray) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def lookup(
+    session_id: str,
+    embedding: list[float] | np.ndarray,
+    personality: str,
+    documents: frozenset,
+) -> CachedAnswer | None:
+    """Return the most similar cached answer above the configured cosine threshold, or None."""
+    entries = _CACHE.get(session_id)
+    if not entries:
+        return None
+    _CACHE.move_to_end(session_id)
+
+    candidates = [e for e in entries if e.personality == personality and e.documents == documents]
+    if not candidates:
+        return None
+
+    sims = np.stack([e.embedding for e in candidates]) @ _normalise(embedding)
+    best = int(np.argmax(sims))
+    if float(sims[best]) < settings.answer_cache_similarity_threshold:
+        return None
+    hit = candidates[best].answer
+    return CachedAnswer(
+        answer_id=hit.answer_id,
+        answer_text=hit.answer_text,
+        citation_chunks=hit.citation_chunks,
+        similarity=float(sims[best]),
+    )
+
+
+def store(
+    session_id: str,
+    embedding: list[float] | np.ndarray,
+    personality: str,
+    documents: frozenset,
+    answer_id: str,
+    answer_text: str,
+    citation_chunks: list[tuple[dict, int]],
+) -> None:
+    """Remember a freshly generated answer for later near-duplicate questions."""
+    entries = _CACHE.setdefault(session_id, [])
+    _CACHE.move_to_end(session_id)
+    entries.append(_Entry(
+        embedding=_normalise(embedding),
+        personality=personality,
+        documents=documents,
+        answer=CachedAnswer(answer_id=answer_id, answer_text=answer_text, citation_chunks=citation_chunks),
+        created_at=time.time(),
+    ))
+    if len(entries) > settings.answer_cache_max_entries_per_session:
+        del entries[: len(entries) - settings.answer_cache_max_entries_per_session]
+    while len(_CACHE) > _MAX_SESSIONS:
+        _CACHE.popitem(last=False)
+
+
+def invalidate_session(session_id: str) -> None:
+    """Drop every cached answer for a session (e.g. when its active documents change)."""
+    _CACHE.pop(session_id, None)
+
+
+def invalidate_document(document_id: str) -> None:
+    """Drop cached answers, in any session, grounded in an earlier version of this document. Only frees
+    memory: their signature no longer matches once the document is re-processed."""
+    for session_id in list(_CACHE):
+        kept = [e for e in _CACHE[session_id] if all(doc_id != document_id for doc_id, _ in e.documents)]
+        if kept:
+            _CACHE[session_id] = kept
+        else:
+            del _CACHE[session_id]
@@ -0,0 +1,172 @@
+"""Local question-category classifier over the question embedding.
+
+A multinomial logistic regression (NumPy) trained on questions the LLM has already labelled
+(questions.category_source = 'llm'). Models are saved as numbered versions —
+{settings.category_classifier_dir}/category-v0001.npz, v0002, … — and every process serves the
+newest one, checking the directory for a newer version at most once a minute. Callers use
+predict(); below settings.category_classifier_min_confidence it returns None and the question goes
+to the gpt-4o-mini fallback in classification_queue. With no trained model every question falls back.
+
+Train with scripts/train_category_classifier.py.
+"""
+
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from config import settings
+from services.openai_client import EMBEDDING_MODEL, QUESTION_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+_VERSION_RE = re.compile(r"^category-v(\d+)\.npz$")
+_RELOAD_INTERVAL_SEC = 60.0
+
+
+@dataclass
+class CategoryModel:
+    version: int
+    classes: list[str]
+    weights: np.ndarray  # (dims, classes) float32
+    bias: np.ndarray     # (classes,) float32
+    meta: dict
+
+    def probabilities(self, embeddings: np.ndarray) -> np.ndarray:
+        """Class probabilities for a (n, dims) batch of embeddings."""
+        logits = _normalise_rows(embeddings) @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+_model: CategoryModel | None = None
+_checked_at = 0.0
+
+
+def _model_dir() -> Path:
+    path = Path(settings.category_classifier_dir)
+    return path if path.is_absolute() else Path(__file__).resolve().parent.parent / path
+
+
+def _normalise_rows(embeddings: np.ndarray) -> np.ndarray:
+    x = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def _versions() -> dict[int, Path]:
+    directory = _model_dir()
+    if not directory.is_dir():
+        return {}
+    found = {}
+    for path in directory.iterdir():
+        match = _VERSION_RE.match(path.name)
+        if match:
+            found[int(match.group(1))] = path
+    return found
+
+
+def _load(path: Path, version: int) -> CategoryModel:
+    with np.load(path, allow_pickle=False) as data:
+        return CategoryModel(
+            version=version,
+            classes=[str(c) for c in data["classes"]],
+            weights=data["weights"].astype(np.float32),
+            bias=data["bias"].astype(np.float32),
+            meta=json.loads(str(data["meta"])),
+        )
+
+
+def current_model() -> CategoryModel | None:
+    """The newest model on disk, re-checked at most every _RELOAD_INTERVAL_SEC."""
+    global _model, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < _RELOAD_INTERVAL_SEC:
+        return _model
+    _checked_at = now
+    versions = _versions()
+    if not versions:
+        return _model
+    latest = max(versions)
+    if _model is None or _model.version != latest:
+        try:
+            _model = _load(versions[latest], latest)
+            logger.info("Loaded category classifier v%d (%s)", latest, _model.meta)
+        except Exception:
+            logger.exception("Could not load category classifier %s", versions[latest])
+    return _model
+
+
+def predict(embeddings: list[np.ndarray] | np.ndarray) -> list[str | None]:
+    """A category per embedding, or None where the model is missing or not confident enough."""
+    if len(embeddings) == 0:
+        return []
+    model = current_model()
+    if model is None or model.meta.get("embedding_model") != EMBEDDING_MODEL:
+        return [None] * len(embeddings)
+    probs = model.probabilities(np.stack(embeddings) if isinstance(embeddings, list) else embeddings)
+    best = probs.argmax(axis=1)
+    return [
+        model.classes[b] if probs[i, b] >= settings.category_classifier_min_confidence else None
+        for i, b in enumerate(best)
+    ]
+
+
+def train(
+    embeddings: np.ndarray,
+    labels: list[str],
+    epochs: int = 300,
+    learning_rate: float = 0.5,
+    l2: float = 1e-3,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit softmax regression by full-batch gradient descent. Returns (weights, bias)."""
+    x = _normalise_rows(embeddings)
+    index = {c: i for i, c in enumerate(QUESTION_CATEGORIES)}
+    y = np.zeros((len(labels), len(QUESTION_CATEGORIES)), dtype=np.float32)
+    y[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+
+    # Inverse-frequency class weights so a dominant "Doubts" class does not swamp the rest
+    counts = y.sum(axis=0)
+    sample_weight = (y @ (len(labels) / (len(counts) * np.maximum(counts, 1))))[:, None]
+
+    weights = np.zeros((x.shape[1], len(QUESTION_CATEGORIES)), dtype=np.float32)
+    bias = np.zeros(len(QUESTION_CATEGORIES), dtype=np.float32)
+    for _ in range(epochs):
+        logits = x @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        grad = (probs - y) * sample_weight / len(labels)
+        weights -= learning_rate * (x.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+    return weights, bias
+
+
+def save(weights: np.ndarray, bias: np.ndarray, meta: dict) -> Path:
+    """Write the next model version and return its path. Existing versions are kept for rollback."""
+    directory = _model_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    version = max(_versions(), default=0) + 1
+    meta = {
+        **meta,
+        "version": version,
+        "embedding_model": EMBEDDING_MODEL,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+    path = directory / f"category-v{version:04d}.npz"
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(
+        tmp,
+        classes=np.array(QUESTION_CATEGORIES),
+        weights=weights.astype(np.float32),
+        bias=bias.astype(np.float32),
+        meta=np.array(json.dumps(meta)),
+    )
+    tmp.rename(path)  # atomic: readers never see a half-written version
+    return path
@@ -0,0 +1,339 @@
+"""Chunk vector search in Postgres, routed to per-course HNSW indexes.
+
+There is no global chunk HNSW index (migration 019). Every course with at least
+settings.vector_course_index_min_chunks chunks gets a partial index
+`idx_chunks_hnsw_course_<uuid hex> … WHERE course_id = '<uuid>'`, so an index only ever holds one
+course's chunks. A search for a session's active documents is planned per query:
+
+  exact — candidate set at most settings.vector_exact_scan_max_chunks, no index for the course, or
+          a document filter so selective that HNSW would need ef_search beyond pgvector's 1000:
+          distances for the candidates only, via the document_id B-tree. Perfect recall.
+  ann   — the course's partial index, with the course_id literal in the query so the planner can
+          prove the index predicate, and hnsw.ef_search sized so that about k results survive
+          the document filter (ef ≈ margin × k × course_chunks / candidates).
+
+With settings.vector_quantized_first_stage on, an exact plan over more candidates than
+settings.vector_rerank_candidates runs in two stages instead. The first stage ranks the candidates
+by Hamming distance between binary-quantized embeddings (document_chunks.embedding_bits,
+migration 020, stored inline) and keeps the nearest vector_rerank_candidates. The second stage
+reranks only those by exact cosine on the full vectors. The full vectors are TOASTed, so the
+quantized scan reads about 192 bytes per chunk instead of 6 KB.
+
+The indexes are built over the current embedding profile (services.embedding_profile): the full
+vector, or its leading dimensions as halfvec/vector, with the query projected the same way. Indexes
+of other profiles are ignored by search and dropped by reindex_courses once the course's
+current-profile index is built. Returned similarities are always full-precision cosine.
+
+Used for sessions too large for the in-memory index (services.vector_index) or with it disabled.
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import settings
+from services import embedding_profile
+
+logger = logging.getLogger(__name__)
+
+HNSW_MAX_EF_SEARCH = 1000   # pgvector's upper bound for hnsw.ef_search
+_ROUTE_TTL_SEC = 60.0
+_ROUTE_CACHE_MAX = 1000
+
+_EXACT_SQL = """
+WITH ranked AS MATERIALIZED (
+    SELECT dc.id, dc.embedding <=> $2 AS distance
+    FROM document_chunks dc
+    JOIN documents d ON d.id = dc.document_id
+    WHERE dc.document_id = ANY($1::uuid[])
+      AND d.processing_status = 'ready'
+      AND dc.embedding IS NOT NULL
+    ORDER BY distance
+    LIMIT $3
+)
+SELECT dc.id, dc.content, dc.page_number, dc.token_count, d.id AS document_id, d.filename,
+       1 - r.distance AS cosine_similarity
+FROM ranked r
+JOIN document_chunks dc ON dc.id = r.id
+JOIN documents d ON d.id = dc.document_id
+ORDER BY r.distance
+"""
+
+# Stage 1 over the inline sign bits, stage 2 exact cosine over the $4 survivors only
+_QUANTIZED_SQL = """
+WITH candidates AS MATERIALIZED (
+    SELECT dc.id
+    FROM document_chunks dc
+    JOIN documents d ON d.id = dc.document_id
+    WHERE dc.document_id = ANY($1::uuid[])
+      AND d.processing_status = 'ready'
+      AND dc.embedding_bits IS NOT NULL
+    ORDER BY dc.embedding_bits <~> binary_quantize($2::vector)::bit(1536)
+    LIMIT $4
+),
+ranked AS MATERIALIZED (
+    SELECT dc.id, dc.embedding <=> $2::vector AS distance
+    FROM candidates c
+    JOIN document_chunks dc ON dc.id = c.id
+    ORDER BY distance
+    LIMIT $3
+)
+SELECT dc.id, dc.content, dc.page_number, dc.token_count, d.id AS document_id, d.filename,
+       1 - r.distance AS cosine_similarity
+FROM ranked r
+JOIN document_chunks dc ON dc.id = r.id
+JOIN documents d ON d.id = dc.document_id
+ORDER BY r.distance
+"""
+
+# course_id is inlined (a validated UUID): with a bind parameter the planner cannot match the
+# partial index predicate under a generic plan. {expression} <=> {query} is the profile's indexed
+# expression against the projected query ($4); $2 is the full query for the returned similarity.
+_ANN_SQL = """
+SELECT dc.id, dc.content, dc.page_number, dc.token_count, d.id AS document_id, d.filename,
+       1 - (dc.embedding <=> $2) AS cosine_similarity
+FROM document_chunks dc
+JOIN documents d ON d.id = dc.document_id
+WHERE dc.course_id = '{course_id}'::uuid
+  AND dc.document_id = ANY($1::uuid[])
+  AND d.processing_status = 'ready'
+  AND dc.embedding IS NOT NULL
+ORDER BY {expression} <=> {query}
+LIMIT $3
+"""
+
+
+@dataclass
+class _Route:
+    course_id: str | None   # None when the documents span courses (exact only)
+    candidates: int         # embedded chunks in the searched documents
+    course_chunks: int
+    indexed: bool           # the course has a valid partial HNSW index
+    fetched_at: float
+
+
+# frozenset(document_ids) -> route; counts only size ef_search, so a minute of staleness is fine
+_routes: OrderedDict[frozenset, _Route] = OrderedDict()
+# course_id -> index build running in this process
+_indexing: dict[str, asyncio.Task] = {}
+
+
+def index_name(course_id: str, profile: embedding_profile.Profile | None = None) -> str:
+    """idx_chunks_hnsw_course_<uuid hex> for the full profile (migration 019's name), otherwise
+    idx_chunks_<storage><dimensions>_course_<uuid hex>."""
+    profile = profile or embedding_profile.current()
+    kind = "hnsw" if profile.is_full else profile.tag
+    return f"idx_chunks_{kind}_course_{uuid.UUID(str(course_id)).hex}"
+
+
+def ef_search_for(k: int, candidates: int, course_chunks: int) -> int | None:
+    """hnsw.ef_search for a top-k search over `candidates` of a course's `course_chunks` chunks,
+    or None when an exact scan of the candidates is the better plan."""
+    if candidates <= settings.vector_exact_scan_max_chunks:
+        return None
+    # The index scan yields the ef nearest chunks of the whole course before the document filter;
+    # about candidates/course_chunks of them survive it.
+    ef = math.ceil(settings.vector_ef_search_margin * k * max(course_chunks, 1) / candidates)
+    if ef > HNSW_MAX_EF_SEARCH:
+        return None
+    return max(ef, settings.vector_ef_search_min)
+
+
+async def _index_is_valid(db, course_id: str) -> bool | None:
+    """True/False for a valid/invalid (failed concurrent build) index, None if there is none."""
+    return await db.fetchval(
+        "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = $1",
+        index_name(course_id),
+    )
+
+
+async def _route(db, document_ids: list[str]) -> _Route:
+    key = frozenset(document_ids)
+    route = _routes.get(key)
+    if route is not None and time.time() - route.fetched_at < _ROUTE_TTL_SEC:
+        _routes.move_to_end(key)
+        return route
+
+    rows = await db.fetch(
+        """
+        SELECT course_id, COUNT(*) AS n FROM document_chunks
+        WHERE document_id = ANY($1::uuid[]) AND embedding IS NOT NULL
+        GROUP BY course_id
+        """,
+        document_ids,
+    )
+    if len(rows) == 1:
+        course_id = str(rows[0]["course_id"])
+        course_chunks = await db.fetchval(
+            "SELECT COUNT(*) FROM document_chunks WHERE course_id = $1 AND embedding IS NOT NULL", course_id
+        )
+        route = _Route(
+            course_id=course_id,
+            candidates=rows[0]["n"],
+            course_chunks=course_chunks,
+            indexed=bool(await _index_is_valid(db, course_id)),
+            fetched_at=time.time(),
+        )
+    else:
+        route = _Route(
+            course_id=None, candidates=sum(r["n"] for r in rows), course_chunks=0, indexed=False, fetched_at=time.time()
+        )
+    _routes[key] = route
+    while len(_routes) > _ROUTE_CACHE_MAX:
+        _routes.popitem(last=False)
+    return route
+
+
+async def search(db, document_ids: list[str], query_embedding, k: int) -> list[dict]:
+    """Top-k chunks of the given documents by cosine similarity, best first, as dicts with
+    id, content, page_number, token_count, document_id, filename, cosine_similarity."""
+    route = await _route(db, document_ids)
+    embedding = np.asarray(query_embedding, dtype=np.float32)
+    ef_search = None
+    if route.indexed:
+        ef_search = ef_search_for(k, route.candidates, route.course_chunks)
+
+    if ef_search is None:
+        if settings.vector_quantized_first_stage and route.candidates > settings.vector_rerank_candidates:
+            return await search_quantized(db, document_ids, embedding, k)
+        rows = await db.fetch(_EXACT_SQL, document_ids, embedding, k)
+    else:
+        profile = embedding_profile.current()
+        sql = _ANN_SQL.format(
+            course_id=route.course_id,
+            expression=profile.expression("dc.embedding"),
+            query="$2" if profile.is_full else profile.query_cast("$4"),
+        )
+        args = [document_ids, embedding, k] + ([] if profile.is_full else [profile.project(embedding)])
+        async with db.transaction():
+            await db.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+            rows = await db.fetch(sql, *args)
+        # A reduced profile orders by the projection; order by the exact similarity returned
+        rows = sorted(rows, key=lambda r: r["cosine_similarity"], reverse=True)
+    return [dict(r) for r in rows]
+
+
+async def search_quantized(db, document_ids: list[str], query_embedding, k: int, candidates: int | None = None) -> list[dict]:
+    """Two-stage top-k: the `candidates` (default settings.vector_rerank_candidates) nearest chunks
+    by binary-quantized Hamming distance, reranked by exact cosine. Same dicts as search()."""
+    embedding = np.asarray(query_embedding, dtype=np.float32)
+    candidates = max(candidates or settings.vector_rerank_candidates, k)
+    rows = await db.fetch(_QUANTIZED_SQL, document_ids, embedding, k, candidates)
+    return [dict(r) for r in rows]
+
+
+async def ensure_course_index(pool, course_id: str) -> bool:
+    """Create the course's partial HNSW index if the course is large enough. Returns True if it exists.
+
+    Built CONCURRENTLY so ingestion and retrieval keep running; an invalid leftover from a failed
+    build is dropped and rebuilt. A session advisory lock keeps workers from building it twice.
+    """
+    name = index_name(course_id)
+    course_id = str(uuid.UUID(str(course_id)))
+    async with pool.acquire() as db:
+        count = await db.fetchval("SELECT COUNT(*) FROM document_chunks WHERE course_id = $1", course_id)
+        if count < settings.vector_course_index_min_chunks:
+            return False
+        if await _index_is_valid(db, course_id):
+            return True
+        if not await db.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", name):
+            return False  # another worker is building it
+        try:
+            valid = await _index_is_valid(db, course_id)
+            if valid:
+                return True
+            if valid is False:
+                await db.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            profile = embedding_profile.current()
+            key = "embedding" if profile.is_full else f"({profile.expression()})"
+            start = time.perf_counter()
+            await db.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON document_chunks
+                USING hnsw ({key} {profile.opclass}) WITH (m = 16, ef_construction = 64)
+                WHERE course_id = '{course_id}'::uuid
+                """
+            )
+            logger.info("Built %s over %d chunks in %.1fs", name, count, time.perf_counter() - start)
+        finally:
+            await db.execute("SELECT pg_advisory_unlock(hashtext($1))", name)
+    # Route this course's searches to the new index straight away
+    for key in [k for k, r in _routes.items() if r.course_id == course_id]:
+        del _routes[key]
+    return True
+
+
+def schedule_course_index(pool, course_id: str) -> None:
+    """Run ensure_course_index in the background (called after a document is ingested)."""
+    course_id = str(course_id)
+    if course_id in _indexing:
+        return
+
+    def done(task: asyncio.Task) -> None:
+        _indexing.pop(course_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Index build for course %s failed", course_id, exc_info=task.exception())
+
+    task = asyncio.create_task(ensure_course_index(pool, course_id), name=f"course-index-{course_id}")
+    _indexing[course_id] = task
+    task.add_done_callback(done)
+
+
+async def reindex_courses(pool) -> dict:
+    """Move every large course to the current embedding profile: build its index, then drop the
+    course's indexes of other profiles. Courses are done one at a time; until a course's new index
+    is valid its searches take the exact plan. Returns counts of built and dropped indexes."""
+    async with pool.acquire() as db:
+        courses = await db.fetch(
+            """
+            SELECT course_id FROM document_chunks
+            GROUP BY course_id HAVING COUNT(*) >= $1
+            ORDER BY COUNT(*) DESC
+            """,
+            settings.vector_course_index_min_chunks,
+        )
+        existing = {
+            r["indexname"]
+            for r in await db.fetch(
+                r"""
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'document_chunks' AND indexname ~ '^idx_chunks_[a-z0-9]+_course_[0-9a-f]{32}$'
+                """
+            )
+        }
+    built = dropped = 0
+    for row in courses:
+        course_id = str(row["course_id"])
+        name = index_name(course_id)
+        if not await ensure_course_index(pool, course_id):
+            continue  # another worker holds the build lock; its run finishes the switch
+        built += name not in existing
+        suffix = name[name.rindex("_course_"):]
+        for stale in sorted(i for i in existing if i.endswith(suffix) and i != name):
+            async with pool.acquire() as db:
+                await db.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {stale}")
+            logger.info("Dropped %s (embedding profile is now %s)", stale, embedding_profile.current().tag)
+            dropped += 1
+    return {"built": built, "dropped": dropped}
+
+
+def start_reindex(pool) -> asyncio.Task:
+    """Run reindex_courses in the background (startup), so a profile change needs only a restart."""
+
+    def done(task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("Embedding profile reindex failed", exc_info=task.exception())
+        elif any(task.result().values()):
+            logger.info("Embedding profile reindex: %s", task.result())
+
+    task = asyncio.create_task(reindex_courses(pool), name="embedding-profile-reindex")
+    task.add_done_callback(done)
+    return task
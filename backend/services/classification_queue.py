@@ -0,0 +1,148 @@
+"""Background question classification.
+
+Questions with category IS NULL are the queue — new questions the local classifier was not
+confident about, and any historical rows never classified. A worker claims up to
+settings.classification_batch_size of them with SELECT … FOR UPDATE SKIP LOCKED, labels what it can
+with services.category_classifier, and sends the rest to gpt-4o-mini in one call, so the answer
+path never waits on classification. Failed or unparseable questions are retried with exponential
+backoff; after settings.classification_max_attempts they get the "Doubts" default that the old
+inline classifier used on error.
+"""
+
+import asyncio
+import logging
+
+import asyncpg
+
+from config import settings
+from services import category_classifier, embedding_cache, openai_client
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_CATEGORY = "Doubts"
+
+_CLAIM_SQL = """
+UPDATE questions q
+SET classify_locked_at = now(), classify_attempts = q.classify_attempts + 1
+WHERE q.id IN (
+    SELECT id FROM questions
+    WHERE category IS NULL
+      AND classify_next_attempt_at <= now()
+      AND (classify_locked_at IS NULL OR classify_locked_at < now() - make_interval(secs => $2))
+    ORDER BY asked_at
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING q.id, q.content, q.classify_attempts, q.embedding
+"""
+
+# Set by notify() so an idle worker in this process starts collecting a batch straight away.
+_wakeup = asyncio.Event()
+
+
+def notify() -> None:
+    """Signal that a new question is waiting for a category."""
+    _wakeup.set()
+
+
+async def _record_results(
+    pool: asyncpg.Pool,
+    batch: list[asyncpg.Record],
+    categories: list[str | None],
+    sources: list[str],
+) -> None:
+    done, retry = [], []
+    for row, category, source in zip(batch, categories, sources):
+        if category is None and row["classify_attempts"] >= settings.classification_max_attempts:
+            category, source = FALLBACK_CATEGORY, "fallback"
+        if category is None:
+            backoff_sec = settings.classification_retry_backoff_sec * 2 ** (row["classify_attempts"] - 1)
+            retry.append((row["id"], float(backoff_sec)))
+        else:
+            done.append((row["id"], category, source))
+
+    async with pool.acquire() as db:
+        if done:
+            await db.executemany(
+                """
+                UPDATE questions SET category = $2, category_source = $3, classify_locked_at = NULL
+                WHERE id = $1 AND category IS NULL
+                """,
+                done,
+            )
+        if retry:
+            await db.executemany(
+                """
+                UPDATE questions
+                SET classify_locked_at = NULL, classify_next_attempt_at = now() + make_interval(secs => $2)
+                WHERE id = $1
+                """,
+                retry,
+            )
+
+
+async def run_once(pool: asyncpg.Pool) -> int:
+    """Claim and classify one batch. Returns the number of questions claimed (0 = queue empty)."""
+    async with pool.acquire() as db:
+        batch = await db.fetch(
+            _CLAIM_SQL,
+            settings.classification_batch_size,
+            float(settings.classification_lock_timeout_sec),
+        )
+    if not batch:
+        return 0
+
+    texts = [row["content"] for row in batch]
+    try:
+        # Stored with the question; rows from before that are embedding-cache hits
+        embeddings = [row["embedding"] for row in batch]
+        if any(e is None for e in embeddings):
+            embeddings = await embedding_cache.get_embeddings(texts, pool)
+        categories = category_classifier.predict(embeddings)
+    except Exception as e:
+        logger.warning("Local classification failed, using the LLM for the batch: %s", e)
+        categories = [None] * len(batch)
+    sources = ["local" if c else "llm" for c in categories]
+
+    pending = [i for i, c in enumerate(categories) if c is None]
+    if pending:
+        try:
+            llm_categories = await openai_client.classify_questions_async([texts[i] for i in pending])
+        except Exception as e:
+            logger.warning("Classification of %d questions failed: %s", len(pending), e)
+            llm_categories = [None] * len(pending)
+        for i, category in zip(pending, llm_categories):
+            categories[i] = category
+
+    await _record_results(pool, batch, categories, sources)
+    return len(batch)
+
+
+async def _worker(pool: asyncpg.Pool) -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            claimed = await run_once(pool)
+            if claimed == settings.classification_batch_size:
+                continue  # backlog (e.g. historical NULLs): keep draining
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Classification worker error")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.classification_poll_interval_sec)
+            # Micro-batch: give concurrent questions a moment to join this batch
+            await asyncio.sleep(settings.classification_batch_wait_sec)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(pool: asyncpg.Pool, count: int) -> list[asyncio.Task]:
+    """Start `count` classification workers on the running loop (called from the app lifespan)."""
+    return [asyncio.create_task(_worker(pool), name=f"classification-worker-{i}") for i in range(count)]
+
+
+async def stop_workers(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,91 +1,180 @@
 """Process text documents: chunk, embed, and link to sessions."""
 
-import asyncio
 import re
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator
+from datetime import datetime
 
-from services import openai_client
+from config import settings
+from services import embedding_cache, tokenizer
 
 EMBEDDING_MODEL = "text-embedding-3-small"
-CHUNK_SIZE = 1500  # chars, ~400 tokens
-CHUNK_OVERLAP = 150
-
-
-def _chunk_text(text: str) -> list[tuple[str, int | None]]:
-    """Split text into chunks. Returns [(chunk_text, page_number), ...]. Page is None for text docs."""
-    text = text.strip()
-    if not text:
-        return []
-
-    # Split by double newlines (paragraphs) first, then merge into chunks
-    paragraphs = re.split(r'\n\s*\n', text)
-    chunks: list[tuple[str, int | None]] = []
-    current = []
-    current_len = 0
-
-    for p in paragraphs:
-        p = p.strip()
-        if not p:
-            continue
-        p_len = len(p) + 2  # +2 for \n\n
-        if current_len + p_len > CHUNK_SIZE and current:
-            chunk_text = "\n\n".join(current)
-            chunks.append((chunk_text, None))
-            # Overlap: keep last part of current
-            overlap_text = current[-1]
-            if len(overlap_text) > CHUNK_OVERLAP:
-                current = [overlap_text[-CHUNK_OVERLAP:]]
-                current_len = len(current[0])
-            else:
-                current = []
-                current_len = 0
-        current.append(p)
-        current_len += p_len
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 40
+
+CHUNK_COLUMNS = ["document_id", "chunk_index", "page_number", "content", "token_count", "embedding", "embedding_model"]
+
+
+async def _single_page(text: str) -> AsyncIterator[tuple[int | None, str]]:
+    yield None, text
+
+
+# Largest piece of a paragraph: with the carried-over overlap and a "\n\n" separator in front of it,
+# it still fits in one chunk.
+_PIECE_TOKENS = CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS - 1
+
+
+def _split_long(tokens: list[int]) -> list[str]:
+    """Cut a paragraph longer than _PIECE_TOKENS into _PIECE_TOKENS-sized pieces."""
+    return [tokenizer.decode(tokens[i:i + _PIECE_TOKENS]) for i in range(0, len(tokens), _PIECE_TOKENS)]
+
+
+def _joined_tokens(paragraphs: list[tuple[str, int | None]]) -> int:
+    return tokenizer.count_tokens("\n\n".join(para for para, _ in paragraphs))
+
+
+async def chunk_pages(pages: AsyncIterable[tuple[int | None, str]]) -> AsyncIterator[tuple[str, int | None, int]]:
+    """Incrementally split a (page_number, text) stream into chunks of at most CHUNK_TOKENS tokens.
+
+    Yields (chunk_text, page_number, token_count) where page_number is the page the chunk starts on
+    (None for text docs) and token_count is exact under services.tokenizer. The limit is checked
+    on the joined text, overlap included, so BPE merges across pieces cannot push a chunk over it.
+    Only the paragraphs of the chunk being built are held, so memory stays bounded by a page or two
+    regardless of document size.
+    """
+    current: list[tuple[str, int | None]] = []  # (paragraph, page it came from)
+
+    def emit() -> tuple[str, int | None, int]:
+        chunk_text = "\n\n".join(para for para, _ in current)
+        return chunk_text, current[0][1], tokenizer.count_tokens(chunk_text)
+
+    async for page_number, text in pages:
+        # Split by double newlines (paragraphs) first, then merge into chunks
+        for p in re.split(r'\n\s*\n', text):
+            p = p.strip()
+            if not p:
+                continue
+            tokens = tokenizer.encode(p)
+            pieces = _split_long(tokens) if len(tokens) > _PIECE_TOKENS else [p]
+            for piece in pieces:
+                if current and _joined_tokens(current + [(piece, page_number)]) > CHUNK_TOKENS:
+                    yield emit()
+                    # Overlap: carry the last CHUNK_OVERLAP_TOKENS tokens into the next chunk
+                    overlap_text, overlap_page = current[-1]
+                    tail = tokenizer.decode(tokenizer.encode(overlap_text)[-CHUNK_OVERLAP_TOKENS:]).strip()
+                    current = [(tail, overlap_page)] if tail else []
+                    if current and _joined_tokens(current + [(piece, page_number)]) > CHUNK_TOKENS:
+                        current = []  # decoded piece re-tokenised longer; it starts the chunk alone
+                current.append((piece, page_number))
 
     if current:
-        chunks.append(("\n\n".join(current), None))
-    return chunks
+        yield emit()
+
 
+async def _claimed(db, document_id: str, claimed_at: datetime) -> bool:
+    """Lock the document row if this worker's claim is still current.
 
-async def process_text_document(
-    db,
+    A worker whose claim expired may race the one that reclaimed it; every write checks the claim
+    so only the current holder can touch the document's chunks or status.
+    """
+    return bool(await db.fetchval(
+        """
+        SELECT 1 FROM documents
+        WHERE id = $1 AND processing_status = 'processing' AND locked_at = $2
+        FOR UPDATE
+        """,
+        document_id,
+        claimed_at,
+    ))
+
+
+async def _write_chunks(pool, document_id: str, claimed_at: datetime, records: list[tuple]) -> bool:
+    async with pool.acquire() as db:
+        async with db.transaction():
+            if not await _claimed(db, document_id, claimed_at):
+                return False
+            await db.copy_records_to_table("document_chunks", records=records, columns=CHUNK_COLUMNS)
+    return True
+
+
+async def process_document(
+    pool,
     document_id: str,
-    content: str,
+    pages: AsyncIterable[tuple[int | None, str]],
+    claimed_at: datetime,
+    store_content: bool = False,
+    info: dict | None = None,
 ) -> None:
     """
-    Chunk the text, embed each chunk, insert into document_chunks, and set document to ready.
+    Chunk a (page_number, text) stream, embed the chunks a window at a time, and COPY each window
+    into document_chunks, then set the document to ready with its page count (info["page_count"],
+    filled in by file_extractor.extract_pages_async for PDFs; NULL for documents without pages).
+
+    Pages are consumed as they are extracted and only one window of chunks
+    (EMBEDDING_BATCH_SIZE × EMBEDDING_BATCH_CONCURRENCY) is held at once. Chunks of a document that
+    is not yet ready are invisible to retrieval. No connection is held while embedding.
+    store_content keeps the full text in documents.content (inline TXT/DOCX documents).
+    Raises ValueError if the document has no usable text.
     """
-    chunks = _chunk_text(content)
-    if not chunks:
+    doc_uuid = uuid.UUID(document_id)
+    window_size = settings.embedding_batch_size * settings.embedding_batch_concurrency
+    text_parts: list[str] = []
+
+    async def tracked_pages():
+        async for page_number, text in pages:
+            if store_content:
+                text_parts.append(text)
+            yield page_number, text
+
+    # Drop chunks left by an earlier failed or abandoned attempt
+    async with pool.acquire() as db:
+        async with db.transaction():
+            if not await _claimed(db, document_id, claimed_at):
+                return
+            await db.execute("DELETE FROM document_chunks WHERE document_id = $1", document_id)
+
+    chunk_count = 0
+    text_chars = 0
+    window: list[tuple[str, int | None, int]] = []
+
+    async def flush() -> bool:
+        nonlocal chunk_count
+        embeddings = await embedding_cache.get_embeddings([chunk_text for chunk_text, _, _ in window], pool)
+        records = [
+            (doc_uuid, chunk_count + i, page_num, chunk_text, token_count, embedding, EMBEDDING_MODEL)
+            for i, ((chunk_text, page_num, token_count), embedding) in enumerate(zip(window, embeddings))
+        ]
+        chunk_count += len(records)
+        window.clear()
+        return await _write_chunks(pool, document_id, claimed_at, records)
+
+    async for chunk in chunk_pages(tracked_pages()):
+        window.append(chunk)
+        text_chars += len(chunk[0])
+        if len(window) >= window_size and not await flush():
+            return
+    if text_chars < 10:
+        raise ValueError("Could not extract enough text from file. Try a different file or paste text instead.")
+    if window and not await flush():
         return
 
-    for i, (chunk_text, page_num) in enumerate(chunks):
-        embedding = await asyncio.to_thread(
-            openai_client.get_embedding,
-            chunk_text.replace("\n", " ").strip(),
-        )
-        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-        token_count = len(chunk_text.split())  # rough estimate
-
-        await db.execute(
-            """
-            INSERT INTO document_chunks (document_id, chunk_index, page_number, content, token_count, embedding, embedding_model)
-            VALUES ($1, $2, $3, $4, $5, $6::vector, $7)
-            """,
-            document_id,
-            i,
-            page_num,
-            chunk_text,
-            token_count,
-            embedding_str,
-            EMBEDDING_MODEL,
-        )
-
-    await db.execute(
-        """
-        UPDATE documents
-        SET processing_status = 'ready', processed_at = now(), page_count = $2
-        WHERE id = $1
-        """,
-        document_id,
-        len(chunks),
-    )
+    async with pool.acquire() as db:
+        async with db.transaction():
+            if not await _claimed(db, document_id, claimed_at):
+                return
+            await db.execute(
+                """
+                UPDATE documents
+                SET processing_status = 'ready', processed_at = now(), page_count = $2,
+                    content = COALESCE($3, content), error_message = NULL, locked_at = NULL
+                WHERE id = $1
+                """,
+                document_id,
+                (info or {}).get("page_count"),
+                "\n\n".join(text_parts).strip() if store_content else None,
+            )
+
+
+async def process_text_document(pool, document_id: str, content: str, claimed_at: datetime) -> None:
+    """process_document for a document whose full text is already in hand (no page numbers)."""
+    await process_document(pool, document_id, _single_page(content), claimed_at)
@@ -0,0 +1,82 @@
+"""Near-duplicate ("repeating") question detection on question embeddings.
+
+Two stages, then grouping:
+  1. candidates — blocked all-pairs cosine on the first PREFILTER_DIMS dimensions. The
+     text-embedding-3 models are Matryoshka-trained, so a truncated, re-normalised prefix ranks
+     neighbours almost like the full vector at a fraction of the cost. The threshold is lowered by
+     PREFILTER_MARGIN so true duplicates are not lost to truncation error.
+  2. verification — exact full-dimension cosine for the candidate pairs only.
+  3. grouping — union-find over verified pairs.
+Memory stays bounded by BLOCK_ROWS × n similarities at a time.
+"""
+
+import numpy as np
+
+PREFILTER_DIMS = 256
+PREFILTER_MARGIN = 0.08
+BLOCK_ROWS = 1024
+_VERIFY_CHUNK = 65536
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def candidate_pairs(embeddings: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """(i, j) index arrays, i < j, of pairs whose truncated-prefix cosine clears threshold - margin."""
+    x = np.asarray(embeddings, dtype=np.float32)
+    prefix = _unit(np.ascontiguousarray(x[:, :PREFILTER_DIMS]))
+    cutoff = threshold - PREFILTER_MARGIN
+    rows, cols = [], []
+    for start in range(0, len(prefix), BLOCK_ROWS):
+        block = prefix[start:start + BLOCK_ROWS]
+        # Upper triangle only: compare each row with itself and everything after it
+        sims = block @ prefix[start:].T
+        i, j = np.divmod(np.flatnonzero(sims >= cutoff), sims.shape[1])
+        keep = j > i
+        rows.append(i[keep] + start)
+        cols.append(j[keep] + start)  # j is relative to prefix[start:]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def verified_pairs(embeddings: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs whose exact cosine similarity is at least threshold."""
+    x = _unit(np.asarray(embeddings, dtype=np.float32))
+    i, j = candidate_pairs(x, threshold)
+    keep = np.zeros(len(i), dtype=bool)
+    for start in range(0, len(i), _VERIFY_CHUNK):
+        a, b = i[start:start + _VERIFY_CHUNK], j[start:start + _VERIFY_CHUNK]
+        keep[start:start + _VERIFY_CHUNK] = np.einsum("ij,ij->i", x[a], x[b]) >= threshold
+    return i[keep], j[keep]
+
+
+def group(n: int, i: np.ndarray, j: np.ndarray) -> list[list[int]]:
+    """Connected components (size >= 2) of the pair graph via union-find, largest first."""
+    parent = list(range(n))
+
+    def find(a: int) -> int:
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]  # path halving
+            a = parent[a]
+        return a
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    components: dict[int, list[int]] = {}
+    for a in np.unique(np.concatenate([i, j])).tolist():
+        components.setdefault(find(a), []).append(a)
+    return sorted((sorted(c) for c in components.values() if len(c) >= 2), key=lambda c: (-len(c), c[0]))
+
+
+def find_duplicate_groups(embeddings: np.ndarray, threshold: float) -> list[list[int]]:
+    """Groups of row indices whose questions are near-duplicates, largest first."""
+    if len(embeddings) < 2:
+        return []
+    i, j = verified_pairs(embeddings, threshold)
+    return group(len(embeddings), i, j)
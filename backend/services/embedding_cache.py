@@ -0,0 +1,124 @@
+"""Content-hash embedding cache shared by ingestion, the question path and scripts.
+
+Two read-through tiers in front of the embeddings API:
+  1. an in-process LRU bounded by bytes (settings.embedding_cache_memory_mb)
+  2. the Postgres embedding_cache table, shared by every worker and surviving deploys
+
+Keys are sha256(normalised text) + EMBEDDING_MODEL, so repeated page headers, re-uploaded PDFs and
+resubmitted questions are embedded once.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from config import settings
+from services import openai_client
+
+_memory: OrderedDict[str, np.ndarray] = OrderedDict()
+_memory_bytes = 0
+
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0}
+
+
+def normalise(text: str) -> str:
+    """Collapse all whitespace runs (including newlines) to single spaces."""
+    return " ".join(text.split())
+
+
+def _key(normalised_text: str) -> str:
+    return hashlib.sha256(normalised_text.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, embedding: np.ndarray) -> None:
+    global _memory_bytes
+    if key in _memory:
+        _memory.move_to_end(key)
+        return
+    _memory[key] = embedding
+    _memory_bytes += embedding.nbytes
+    limit = settings.embedding_cache_memory_mb * 1024 * 1024
+    while _memory_bytes > limit and _memory:
+        _, evicted = _memory.popitem(last=False)
+        _memory_bytes -= evicted.nbytes
+        _stats["evictions"] += 1
+
+
+def stats() -> dict:
+    """Hit/miss counters and memory-tier size, for the /health/caches endpoint."""
+    lookups = _stats["memory_hits"] + _stats["db_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round((lookups - _stats["misses"]) / lookups, 4) if lookups else None,
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory_bytes,
+    }
+
+
+async def get_embedding(text: str, db) -> np.ndarray:
+    """Embedding for one text via the cache. db may be a connection or the pool."""
+    return (await get_embeddings([text], db))[0]
+
+
+async def get_embeddings(texts: list[str], db) -> list[np.ndarray]:
+    """Embeddings (float32 arrays, input order) for texts, embedding only the ones no tier has seen.
+
+    db may be a connection or the pool; with the pool no connection is held during API calls.
+    """
+    cleaned = [normalise(t) for t in texts]
+    keys = [_key(t) for t in cleaned]
+    found: dict[str, np.ndarray] = {}
+
+    # Tier 1: in-process LRU
+    for key in keys:
+        if key in found:
+            continue
+        hit = _memory.get(key)
+        if hit is not None:
+            _memory.move_to_end(key)
+            found[key] = hit
+            _stats["memory_hits"] += 1
+
+    # Tier 2: Postgres
+    pending = list(dict.fromkeys(k for k in keys if k not in found))
+    if pending:
+        rows = await db.fetch(
+            "SELECT content_hash, embedding FROM embedding_cache WHERE model = $1 AND content_hash = ANY($2::text[])",
+            openai_client.EMBEDDING_MODEL,
+            pending,
+        )
+        for r in rows:
+            embedding = np.asarray(r["embedding"], dtype=np.float32)
+            found[r["content_hash"]] = embedding
+            _remember(r["content_hash"], embedding)
+            _stats["db_hits"] += 1
+
+    # Miss: call the API, then write through both tiers
+    missing: dict[str, str] = {}
+    for key, text in zip(keys, cleaned):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        new_rows = []
+        texts_to_embed = list(missing.values())
+        if len(texts_to_embed) == 1:
+            embedded = [await openai_client.get_embedding_async(texts_to_embed[0])]
+        else:
+            embedded = await openai_client.get_embeddings_async(texts_to_embed)
+        for key, raw in zip(missing, embedded):
+            embedding = np.asarray(raw, dtype=np.float32)
+            found[key] = embedding
+            _remember(key, embedding)
+            new_rows.append((key, openai_client.EMBEDDING_MODEL, embedding))
+            _stats["misses"] += 1
+        await db.executemany(
+            """
+            INSERT INTO embedding_cache (content_hash, model, embedding)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (content_hash, model) DO NOTHING
+            """,
+            new_rows,
+        )
+
+    return [found[k] for k in keys]
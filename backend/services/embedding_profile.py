@@ -0,0 +1,71 @@
+"""Embedding profile for Postgres chunk search: how many dimensions are indexed and at what precision.
+
+document_chunks.embedding always keeps the full text-embedding-3-small vector (1536 float32). The
+text-embedding-3 models are Matryoshka-trained: the API's shortened `dimensions=d` output is the
+first d components re-normalised, so a shorter profile is a projection of the stored vector rather
+than a second API call. The projection lives only in the HNSW expression index and the query:
+
+    subvector(dc.embedding, 1, d)::halfvec(d)  halfvec_cosine_ops     (cosine ignores the norm)
+
+Full vectors stay available for exact reranking and for switching profile again without
+re-embedding. Changing settings.embedding_dimensions / settings.embedding_storage makes
+services.chunk_search build indexes under the new profile's names in the background
+(reindex_courses) and search the new expression once a course's index is valid.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import settings
+
+FULL_DIMENSIONS = 1536   # text-embedding-3-small; document_chunks.embedding is vector(1536)
+STORAGES = ("vector", "halfvec")
+_MAX_INDEX_DIMENSIONS = {"vector": 2000, "halfvec": 4000}   # pgvector HNSW limits
+
+
+@dataclass(frozen=True)
+class Profile:
+    dimensions: int
+    storage: str   # "vector" (float32) or "halfvec" (float16)
+
+    def __post_init__(self):
+        if self.storage not in STORAGES:
+            raise ValueError(f"embedding storage must be one of {STORAGES}, not {self.storage!r}")
+        if not 1 <= self.dimensions <= min(FULL_DIMENSIONS, _MAX_INDEX_DIMENSIONS[self.storage]):
+            raise ValueError(f"embedding dimensions must be between 1 and {FULL_DIMENSIONS}")
+
+    @property
+    def is_full(self) -> bool:
+        return self.dimensions == FULL_DIMENSIONS and self.storage == "vector"
+
+    @property
+    def tag(self) -> str:
+        return f"{self.storage}{self.dimensions}"
+
+    @property
+    def opclass(self) -> str:
+        return f"{self.storage}_cosine_ops"
+
+    def expression(self, column: str = "embedding") -> str:
+        """SQL for the indexed/searched form of a full-precision vector column."""
+        if self.is_full:
+            return column
+        value = column if self.dimensions == FULL_DIMENSIONS else f"subvector({column}, 1, {self.dimensions})"
+        return f"({value})::{self.storage}({self.dimensions})"
+
+    def query_cast(self, placeholder: str) -> str:
+        """SQL for a query parameter already projected with project()."""
+        if self.is_full:
+            return placeholder
+        return f"{placeholder}::vector({self.dimensions})::{self.storage}({self.dimensions})"
+
+    def project(self, embedding) -> np.ndarray:
+        """The first `dimensions` components, re-normalised (what the API returns for dimensions=d)."""
+        v = np.asarray(embedding, dtype=np.float32)[: self.dimensions]
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+
+def current() -> Profile:
+    return Profile(settings.embedding_dimensions, settings.embedding_storage)
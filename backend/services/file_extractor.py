@@ -1,10 +1,120 @@
-"""Extract text from uploaded files (PDF, TXT, DOCX)."""
+"""Extract text from uploaded files (PDF, TXT, DOCX).
 
+pypdf and python-docx are CPU-bound and hold the GIL, so the async entry point
+(extract_pages_async) runs them in a bounded ProcessPoolExecutor instead of on the event loop.
+Large PDFs are split into page ranges extracted in parallel and streamed back page by page, and
+every file has a timeout.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from config import settings
+
+logger = logging.getLogger(__name__)
+
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".docx"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 
+_executor: ProcessPoolExecutor | None = None
+
+
+class ExtractionTimeout(Exception):
+    """Extraction did not finish within settings.extraction_timeout_sec."""
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the API process has a running event loop and helper threads
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.extraction_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown() -> None:
+    """Stop the extraction processes (called from the app lifespan)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _kill_executor() -> None:
+    """Terminate a pool whose worker is stuck on a pathological file; the next call starts a new one.
+
+    Extractions running in the same pool fail with BrokenProcessPool and are retried by the queue.
+    """
+    global _executor
+    executor, _executor = _executor, None
+    if executor is None:
+        return
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract_pages_async(
+    file_path: Path, filename: str, info: dict | None = None
+) -> AsyncIterator[tuple[int | None, str]]:
+    """Stream (page_number, text) for a file, extracted in the process pool.
+
+    PDFs are read in ranges of EXTRACTION_PAGES_PER_TASK pages, with up to EXTRACTION_PROCESSES
+    ranges in flight ahead of the consumer, so memory is bounded by a few ranges of text whatever
+    the page count. TXT/DOCX have no pages and yield a single (None, text).
+    For a PDF, info["page_count"] is set to the document's page count (blank and image-only pages
+    included) before the first page is yielded.
+    Raises ValueError like extract_text_from_file, or ExtractionTimeout once the time spent waiting
+    on extraction exceeds EXTRACTION_TIMEOUT_SEC.
+    """
+    ext = Path(filename).suffix.lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type: {ext}. Use .pdf, .txt, or .docx")
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    remaining = settings.extraction_timeout_sec
+
+    async def wait(future):
+        nonlocal remaining
+        started = loop.time()
+        try:
+            return await asyncio.wait_for(future, max(remaining, 0.001))
+        except asyncio.TimeoutError:
+            logger.warning("Extraction of %s timed out after %ss", filename, settings.extraction_timeout_sec)
+            _kill_executor()
+            raise ExtractionTimeout(f"Text extraction timed out after {settings.extraction_timeout_sec:g}s")
+        finally:
+            remaining -= loop.time() - started
+
+    if ext != ".pdf":
+        yield None, await wait(loop.run_in_executor(executor, extract_text_from_file, file_path, filename))
+        return
+
+    page_count = await wait(loop.run_in_executor(executor, _pdf_page_count, file_path))
+    if info is not None:
+        info["page_count"] = page_count
+    step = settings.extraction_pages_per_task
+    ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+    in_flight: deque[asyncio.Future] = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < settings.extraction_processes:
+                start, stop = ranges.popleft()
+                in_flight.append(loop.run_in_executor(executor, _extract_pdf_range, file_path, start, stop))
+            for page in await wait(in_flight.popleft()):
+                yield page
+    finally:
+        for future in in_flight:
+            future.cancel()
+
 
 def extract_text_from_file(file_path: Path, filename: str) -> str:
     """Extract text from a file. Raises ValueError for unsupported types or extraction errors."""
@@ -27,15 +137,35 @@ def _extract_txt(path: Path) -> str:
 
 
 def _extract_pdf(path: Path) -> str:
+    return "\n\n".join(text for _, text in iter_pdf_pages(path)).strip()
+
+
+def iter_pdf_pages(path: Path, start: int = 0, stop: int | None = None) -> Iterator[tuple[int, str]]:
+    """Yield (1-based page number, text) for pages [start, stop) that have text, one page at a time."""
     from pypdf import PdfReader
 
     reader = PdfReader(str(path))
-    parts = []
-    for page in reader.pages:
-        text = page.extract_text()
+    for index in range(start, len(reader.pages) if stop is None else stop):
+        text = (reader.pages[index].extract_text() or "").strip()
         if text:
-            parts.append(text)
-    return "\n\n".join(parts).strip()
+            yield index + 1, text
+
+
+def _pdf_page_count(path: Path) -> int:
+    from pypdf import PdfReader
+
+    try:
+        return len(PdfReader(str(path)).pages)
+    except Exception as e:
+        raise ValueError(f"Could not read PDF: {e}") from e
+
+
+def _extract_pdf_range(path: Path, start: int, stop: int) -> list[tuple[int, str]]:
+    """Pool task: pages [start, stop) of a PDF. Each task opens its own reader; pypdf parses pages lazily."""
+    try:
+        return list(iter_pdf_pages(path, start, stop))
+    except Exception as e:
+        raise ValueError(f"Could not read PDF pages {start + 1}-{stop}: {e}") from e
 
 
 def _extract_docx(path: Path) -> str:
@@ -0,0 +1,164 @@
+"""Background document ingestion.
+
+documents doubles as the job queue: processing_status moves uploaded → processing → ready | failed.
+Workers claim one document at a time with SELECT … FOR UPDATE SKIP LOCKED, so any number of
+workers across uvicorn processes can run side by side. Failed attempts are retried with
+exponential backoff up to settings.ingestion_max_attempts; documents left in 'processing' by a
+crashed worker are reclaimed after settings.ingestion_lock_timeout_sec, and marked failed once
+they have used all their attempts.
+"""
+
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+import asyncpg
+
+from config import settings
+from services import answer_cache, chunk_search, storage_service
+from services.document_service import process_document, process_text_document
+from services.file_extractor import extract_pages_async
+
+logger = logging.getLogger(__name__)
+
+_CLAIM_SQL = """
+UPDATE documents d
+SET processing_status = 'processing', attempts = d.attempts + 1, locked_at = now()
+WHERE d.id = (
+    SELECT id FROM documents
+    WHERE (processing_status = 'uploaded' AND next_attempt_at <= now())
+       OR (processing_status = 'processing' AND locked_at < now() - make_interval(secs => $1)
+           AND attempts < $2)
+    ORDER BY next_attempt_at
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING d.id, d.course_id, d.filename, d.source_path, d.content, d.attempts, d.locked_at
+"""
+
+# A document whose worker died or hung on every allowed attempt is not reclaimed again
+_FAIL_ABANDONED_SQL = """
+UPDATE documents
+SET processing_status = 'failed',
+    error_message = 'Processing did not finish after ' || attempts || ' attempts',
+    locked_at = NULL
+WHERE processing_status = 'processing'
+  AND locked_at < now() - make_interval(secs => $1)
+  AND attempts >= $2
+"""
+
+# Set by notify() so a worker in this process picks up a new upload without waiting for the poll.
+_wakeup = asyncio.Event()
+
+
+def notify() -> None:
+    """Wake idle workers in this process after enqueueing a document."""
+    _wakeup.set()
+
+
+async def _process(pool: asyncpg.Pool, job: asyncpg.Record) -> None:
+    document_id = str(job["id"])
+    if not job["source_path"]:
+        await process_text_document(pool, document_id, job["content"] or "", job["locked_at"])
+    else:
+        data = await asyncio.to_thread(storage_service.download_file, job["source_path"])
+        suffix = Path(job["source_path"]).suffix.lower()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            tmp.write(data)
+            tmp_path = Path(tmp.name)
+        del data
+        info: dict = {}
+        pages = extract_pages_async(tmp_path, job["source_path"], info)
+        try:
+            # PDFs are served from storage; TXT/DOCX are shown inline from documents.content
+            await process_document(
+                pool, document_id, pages, job["locked_at"], store_content=suffix != ".pdf", info=info
+            )
+        finally:
+            await pages.aclose()
+            tmp_path.unlink(missing_ok=True)
+        if suffix != ".pdf":
+            await _drop_source(pool, document_id, job["source_path"])
+
+    # Cached answers keyed by the old document signature can no longer hit; free them in this worker
+    answer_cache.invalidate_document(document_id)
+    # The course may have just grown past the size that gets its own HNSW index
+    chunk_search.schedule_course_index(pool, job["course_id"])
+
+
+async def _drop_source(pool: asyncpg.Pool, document_id: str, source_path: str) -> None:
+    """Delete a TXT/DOCX upload once its text is in documents.content; nothing reads it after that."""
+    async with pool.acquire() as db:
+        await db.execute("UPDATE documents SET source_path = NULL WHERE id = $1", document_id)
+    try:
+        await asyncio.to_thread(storage_service.delete_file, source_path)
+    except Exception:
+        # The document is ready either way; an orphaned object only costs storage
+        logger.warning("Could not delete source %s of document %s", source_path, document_id, exc_info=True)
+
+
+async def _record_failure(pool: asyncpg.Pool, job: asyncpg.Record, error: Exception) -> None:
+    # ValueError: unreadable file or no text — retrying cannot help
+    retry = not isinstance(error, ValueError) and job["attempts"] < settings.ingestion_max_attempts
+    backoff_sec = settings.ingestion_retry_backoff_sec * 2 ** (job["attempts"] - 1)
+    async with pool.acquire() as db:
+        await db.execute(
+            """
+            UPDATE documents
+            SET processing_status = $2::processing_status,
+                error_message = $3,
+                next_attempt_at = now() + make_interval(secs => $4),
+                locked_at = NULL
+            WHERE id = $1 AND locked_at = $5
+            """,
+            job["id"],
+            "uploaded" if retry else "failed",
+            str(error)[:1000] or error.__class__.__name__,
+            float(backoff_sec),
+            job["locked_at"],
+        )
+
+
+async def run_once(pool: asyncpg.Pool) -> bool:
+    """Claim and process one document. Returns False when the queue is empty."""
+    lock_timeout = float(settings.ingestion_lock_timeout_sec)
+    async with pool.acquire() as db:
+        await db.execute(_FAIL_ABANDONED_SQL, lock_timeout, settings.ingestion_max_attempts)
+        job = await db.fetchrow(_CLAIM_SQL, lock_timeout, settings.ingestion_max_attempts)
+    if job is None:
+        return False
+
+    try:
+        await _process(pool, job)
+    except Exception as e:
+        logger.warning("Ingestion of document %s failed (attempt %s): %s", job["id"], job["attempts"], e)
+        await _record_failure(pool, job, e)
+    return True
+
+
+async def _worker(pool: asyncpg.Pool) -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            if await run_once(pool):
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ingestion worker error")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.ingestion_poll_interval_sec)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(pool: asyncpg.Pool, count: int) -> list[asyncio.Task]:
+    """Start `count` ingestion workers on the running loop (called from the app lifespan)."""
+    return [asyncio.create_task(_worker(pool), name=f"ingestion-worker-{i}") for i in range(count)]
+
+
+async def stop_workers(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,26 +1,147 @@
+"""OpenAI wrappers. Async functions (suffix _async) share one pooled AsyncOpenAI client and are
+what the API uses; the sync functions remain for scripts and share the same prompts and parsing."""
+
+import asyncio
 import json
 import time
+from collections.abc import AsyncIterator
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
 from config import settings
 
 _client = OpenAI(api_key=settings.openai_api_key)
 
+# One AsyncOpenAI client per process with explicit pool limits, so a lecture spike queues
+# on HTTP connections instead of exhausting the default thread executor.
+_async_client = AsyncOpenAI(
+    api_key=settings.openai_api_key,
+    timeout=settings.openai_timeout,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+        ),
+        timeout=settings.openai_timeout,
+    ),
+)
+
 EMBEDDING_MODEL = "text-embedding-3-small"
 CHAT_MODEL = "gpt-4o"
+MINI_MODEL = "gpt-4o-mini"
 
 
-def get_embedding(text: str) -> list[float]:
-    """Return the 1536-dim embedding for text using text-embedding-3-small.
+async def close_async_client() -> None:
+    """Close the shared async client's connection pool (called on app shutdown)."""
+    await _async_client.close()
 
-    Called via asyncio.to_thread() from async routes — the OpenAI SDK is sync.
-    """
+
+def _chat_messages(system_prompt: str, user_message: str, history: list[dict] | None) -> list[dict]:
+    messages = [{"role": "system", "content": system_prompt}]
+    if history:
+        messages.extend(history)
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def _mini_json(prompt: str, temperature: float = 0) -> dict:
+    response = _client.chat.completions.create(
+        model=MINI_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+    )
+    return json.loads(response.choices[0].message.content or "{}")
+
+
+async def _mini_json_async(prompt: str, temperature: float = 0) -> dict:
+    response = await _async_client.chat.completions.create(
+        model=MINI_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+    )
+    return json.loads(response.choices[0].message.content or "{}")
+
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+def get_embedding(text: str) -> list[float]:
+    """Return the 1536-dim embedding for text using text-embedding-3-small."""
     cleaned = text.replace("\n", " ").strip()
     response = _client.embeddings.create(input=cleaned, model=EMBEDDING_MODEL)
     return response.data[0].embedding
 
 
+async def get_embedding_async(text: str) -> list[float]:
+    """Async get_embedding. Single latency-sensitive inputs (questions) skip the batch budget."""
+    cleaned = text.replace("\n", " ").strip()
+    response = await _async_client.embeddings.create(input=cleaned, model=EMBEDDING_MODEL)
+    return response.data[0].embedding
+
+
+class _TokensPerMinute:
+    """Token bucket shared by all embedding requests in this process, refilled continuously."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.available = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(float(tokens), self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+
+_embedding_budget = _TokensPerMinute(settings.embedding_tokens_per_minute)
+_embedding_slots = asyncio.Semaphore(settings.embedding_batch_concurrency)
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+async def get_embeddings_async(texts: list[str]) -> list[list[float]]:
+    """Embed many texts: settings.embedding_batch_size inputs per API request, at most
+    settings.embedding_batch_concurrency requests in flight, within the tokens-per-minute budget.
+    Returns embeddings in input order.
+    """
+    cleaned = [t.replace("\n", " ").strip() for t in texts]
+    size = settings.embedding_batch_size
+
+    async def embed_batch(batch: list[str]) -> list[list[float]]:
+        async with _embedding_slots:
+            await _embedding_budget.acquire(sum(_estimate_tokens(t) for t in batch))
+            response = await _async_client.embeddings.create(input=batch, model=EMBEDDING_MODEL)
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    results = await asyncio.gather(*(embed_batch(cleaned[i:i + size]) for i in range(0, len(cleaned), size)))
+    return [embedding for batch in results for embedding in batch]
+
+
+# ---------------------------------------------------------------------------
+# Chat completions
+# ---------------------------------------------------------------------------
+
+def _token_counts(usage) -> tuple[int, int]:
+    return (
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+    )
+
+
 def get_chat_completion(
     system_prompt: str,
     user_message: str,
@@ -29,40 +150,72 @@ def get_chat_completion(
 ) -> tuple[str, int, tuple[int, int]]:
     """Call GPT-4o and return (answer_text, latency_ms, (input_tokens, output_tokens)).
 
-    Called via asyncio.to_thread() from async routes.
     history: optional list of prior {"role": "user"/"assistant", "content": str} messages.
     """
-    messages = [{"role": "system", "content": system_prompt}]
-    if history:
-        messages.extend(history)
-    messages.append({"role": "user", "content": user_message})
     start = time.perf_counter()
     response = _client.chat.completions.create(
         model=CHAT_MODEL,
-        messages=messages,
+        messages=_chat_messages(system_prompt, user_message, history),
         temperature=0.2,
         max_tokens=max_tokens,
     )
     latency_ms = int((time.perf_counter() - start) * 1000)
-    content = response.choices[0].message.content or ""
-    usage = response.usage
-    token_counts = (
-        usage.prompt_tokens if usage else 0,
-        usage.completion_tokens if usage else 0,
+    return response.choices[0].message.content or "", latency_ms, _token_counts(response.usage)
+
+
+async def get_chat_completion_async(
+    system_prompt: str,
+    user_message: str,
+    max_tokens: int = 800,
+    history: list[dict] | None = None,
+) -> tuple[str, int, tuple[int, int]]:
+    """Async get_chat_completion."""
+    start = time.perf_counter()
+    response = await _async_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=_chat_messages(system_prompt, user_message, history),
+        temperature=0.2,
+        max_tokens=max_tokens,
     )
-    return content, latency_ms, token_counts
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    return response.choices[0].message.content or "", latency_ms, _token_counts(response.usage)
 
 
-QUESTION_CATEGORIES = ["Homework", "Doubts", "Summaries", "Exam Prep"]
+async def stream_chat_completion_async(
+    system_prompt: str,
+    user_message: str,
+    max_tokens: int = 800,
+    history: list[dict] | None = None,
+) -> AsyncIterator[str | tuple[int, int]]:
+    """Stream GPT-4o output. Yields answer text deltas as they arrive, then a final
+    (input_tokens, output_tokens) tuple once the stream is exhausted.
+    """
+    stream = await _async_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=_chat_messages(system_prompt, user_message, history),
+        temperature=0.2,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    token_counts = (0, 0)
+    async for chunk in stream:
+        if chunk.usage:
+            token_counts = _token_counts(chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    yield token_counts
 
 
-def classify_question(question_text: str) -> str:
-    """Classify a student question into one of four categories.
+# ---------------------------------------------------------------------------
+# Question classification
+# ---------------------------------------------------------------------------
 
-    Returns one of: "Homework" | "Doubts" | "Summaries" | "Exam Prep"
-    Called via asyncio.to_thread().
-    """
-    prompt = (
+QUESTION_CATEGORIES = ["Homework", "Doubts", "Summaries", "Exam Prep"]
+
+
+def _classify_prompt(question_text: str) -> str:
+    return (
         "Classify this student question into exactly one category.\n"
         "Categories: Homework, Doubts, Summaries, Exam Prep\n\n"
         "Rules:\n"
@@ -73,152 +226,187 @@ def classify_question(question_text: str) -> str:
         f"Question: {question_text}\n\n"
         'Return ONLY valid JSON: {"category": "Doubts"}'
     )
+
+
+def _parse_category(data: dict) -> str:
+    category = data.get("category", "Doubts")
+    return category if category in QUESTION_CATEGORIES else "Doubts"
+
+
+def classify_question(question_text: str) -> str:
+    """Classify a student question into one of four categories.
+
+    Returns one of: "Homework" | "Doubts" | "Summaries" | "Exam Prep"
+    """
     try:
-        response = _client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        raw = response.choices[0].message.content or "{}"
-        data = json.loads(raw)
-        category = data.get("category", "Doubts")
-        return category if category in QUESTION_CATEGORIES else "Doubts"
+        return _parse_category(_mini_json(_classify_prompt(question_text)))
     except Exception:
         return "Doubts"
 
 
-def cluster_questions_by_topic(questions: list[dict]) -> list[dict]:
-    """Group questions into topic clusters using GPT-4o-mini.
+def _classify_batch_prompt(question_texts: list[str]) -> str:
+    lines = "\n".join(f"{i}. {text}" for i, text in enumerate(question_texts, 1))
+    return (
+        "Classify each numbered student question into exactly one category.\n"
+        "Categories: Homework, Doubts, Summaries, Exam Prep\n\n"
+        "Rules:\n"
+        "- Homework: questions about assignments, problem sets, or exercises\n"
+        "- Doubts: conceptual questions, clarifications, or confusion about material\n"
+        "- Summaries: requests for overviews, key points, or recaps\n"
+        "- Exam Prep: questions about what to study, past exams, or test-taking\n\n"
+        f"Questions:\n{lines}\n\n"
+        'Return ONLY valid JSON mapping each question number to its category: {"1": "Doubts", "2": "Homework"}'
+    )
+
 
-    Input:  [{"question_id": str, "content": str}, ...]
-    Output: [{"topic_name": str, "question_ids": [str, ...]}, ...]
+async def classify_questions_async(question_texts: list[str]) -> list[str | None]:
+    """Classify many questions in one gpt-4o-mini call.
 
-    Falls back to a single "General" group on any error.
+    Returns a category per input, in order; None where the model returned nothing usable so the
+    caller can retry just those. Raises on API or JSON errors.
     """
-    if not questions:
-        return []
-    if len(questions) == 1:
-        return [{"topic_name": "General", "question_ids": [questions[0]["question_id"]]}]
+    data = await _mini_json_async(_classify_batch_prompt(question_texts))
+    results = []
+    for i in range(1, len(question_texts) + 1):
+        category = data.get(str(i))
+        results.append(category if category in QUESTION_CATEGORIES else None)
+    return results
 
-    lines = "\n".join(f'[{q["question_id"]}] {q["content"]}' for q in questions)
-    prompt = (
-        "You are grouping student questions from a university lecture into topic clusters.\n\n"
-        f"Questions:\n{lines}\n\n"
-        "Group them into 2–6 meaningful topic clusters based on the concept being asked about.\n"
+
+# ---------------------------------------------------------------------------
+# Report helpers
+# ---------------------------------------------------------------------------
+
+def _name_topics_prompt(samples: list[list[str]]) -> str:
+    blocks = "\n\n".join(
+        f"Cluster {i}:\n" + "\n".join(f"- {text[:200]}" for text in texts)
+        for i, texts in enumerate(samples, 1)
+    )
+    return (
+        "Student questions from a university lecture have been grouped into topic clusters. "
+        "Below are the most representative questions of each cluster.\n\n"
+        f"{blocks}\n\n"
+        "Name each cluster after the concept being asked about.\n"
         "Rules:\n"
-        "- Every question must appear in exactly one group.\n"
         "- Topic names must be concise (2–4 words), e.g. 'Learning Rate', 'MSE Cost Function'.\n"
-        "- Return ONLY valid JSON matching this exact shape — no prose, no markdown:\n"
-        '{"groups":[{"topic_name":"...","question_ids":["id1","id2"]}]}'
+        "- Every cluster gets a different name.\n"
+        "- Return ONLY valid JSON mapping each cluster number to its name — no prose, no markdown:\n"
+        '{"1": "...", "2": "..."}'
     )
+
+
+def _parse_topic_names(data: dict, count: int) -> list[str]:
+    names: list[str] = []
+    for i in range(1, count + 1):
+        name = str(data.get(str(i)) or "").strip() or f"Topic {i}"
+        while name in names:
+            name += " (cont.)"
+        names.append(name)
+    return names
+
+
+async def name_topic_clusters_async(samples: list[list[str]]) -> list[str]:
+    """Name topic clusters from their representative questions using GPT-4o-mini.
+
+    Input:  per cluster, a few representative question texts
+    Output: one distinct 2–4 word topic name per cluster, in order
+
+    One call regardless of session size. Falls back to "General" / "Topic N" on any error.
+    """
+    if not samples:
+        return []
+    if len(samples) == 1 and len(samples[0]) == 1:
+        return ["General"]
     try:
-        response = _client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        raw = response.choices[0].message.content or "{}"
-        data = json.loads(raw)
-        return data.get("groups", [])
+        return _parse_topic_names(await _mini_json_async(_name_topics_prompt(samples)), len(samples))
     except Exception:
-        # Graceful fallback: single group with all questions
-        return [{"topic_name": "General", "question_ids": [q["question_id"] for q in questions]}]
+        return ["General"] if len(samples) == 1 else _parse_topic_names({}, len(samples))
+
+
+def _repeating_summary_prompt(samples: list[list[str]]) -> str:
+    blocks = "\n\n".join(
+        f"Group {i}:\n" + "\n".join(f"- {text[:200]}" for text in texts)
+        for i, texts in enumerate(samples, 1)
+    )
+    return (
+        "Each group below holds student questions from a lecture that ask the same thing in different words.\n\n"
+        f"{blocks}\n\n"
+        "For each group, write a short summary (5-10 words) of what the students are asking.\n"
+        "Return ONLY valid JSON mapping each group number to its summary — no prose, no markdown:\n"
+        '{"1": "...", "2": "..."}'
+    )
+
+
+def _fallback_repeating_summary(texts: list[str]) -> str:
+    words = texts[0].split()
+    return " ".join(words[:10]) + ("…" if len(words) > 10 else "")
+
 
+def _parse_repeating_summaries(data: dict, samples: list[list[str]]) -> list[str]:
+    return [
+        str(data.get(str(i)) or "").strip() or _fallback_repeating_summary(texts)
+        for i, texts in enumerate(samples, 1)
+    ]
 
-def identify_repeating_questions(questions: list[dict]) -> list[dict]:
-    """Identify groups of similar/repeating questions.
 
-    Input:  [{"question_id": str, "content": str}, ...]
-    Output: [{"summary": str, "question_ids": [str, ...], "count": int}, ...]
-    Only returns groups with count >= 2.
+async def summarize_repeating_groups_async(samples: list[list[str]]) -> list[str]:
+    """Write a 5-10 word summary per group of near-duplicate questions using GPT-4o-mini.
+
+    Input:  per group, a few of its question texts (groups come from duplicate_detection)
+    Output: one summary per group, in order; falls back to the first question's opening words.
     """
-    if len(questions) < 2:
+    if not samples:
         return []
+    try:
+        return _parse_repeating_summaries(await _mini_json_async(_repeating_summary_prompt(samples)), samples)
+    except Exception:
+        return _parse_repeating_summaries({}, samples)
+
 
-    lines = "\n".join(f'[{q["question_id"]}] {q["content"]}' for q in questions)
+def _text_or_empty(data: dict, key: str) -> str:
+    return str(data.get(key) or "").strip()
+
+
+async def summarize_topic_questions_async(topic_name: str, question_texts: list[str]) -> str:
+    """Map step: one sentence on what students asked, from one batch of a topic's questions."""
+    lines = "\n".join(f"- {text[:200]}" for text in question_texts)
     prompt = (
-        "You are analyzing student questions from a lecture to find REPEATING or SIMILAR questions.\n\n"
-        f"Questions:\n{lines}\n\n"
-        "Group questions that ask the SAME or VERY SIMILAR thing (different wording, same concept).\n"
-        "Rules:\n"
-        "- Only create groups with 2+ similar questions.\n"
-        "- Each question can appear in at most one group.\n"
-        "- For each group, write a short summary (5-10 words) of what they're asking.\n"
-        "- Return ONLY valid JSON — no prose, no markdown:\n"
-        '{"repeating_groups":[{"summary":"...","question_ids":["id1","id2"]}]}'
+        f'Students in a university lecture asked these questions about "{topic_name}":\n{lines}\n\n'
+        "In one sentence, summarize what they asked and where they seem stuck, for the professor.\n"
+        'Return ONLY valid JSON: {"summary": "..."}'
     )
     try:
-        response = _client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        raw = response.choices[0].message.content or "{}"
-        data = json.loads(raw)
-        groups = data.get("repeating_groups", [])
-        return [
-            {**g, "count": len(g.get("question_ids", []))}
-            for g in groups
-            if len(g.get("question_ids", [])) >= 2
-        ]
+        return _text_or_empty(await _mini_json_async(prompt, temperature=0.2), "summary")
     except Exception:
-        return []
-
+        return ""
 
-def summarize_questions_for_dashboard(
-    questions: list[dict],
-    topic_groups: list[dict],
-) -> dict:
-    """Generate session summary and per-topic summaries for the professor dashboard.
 
-    Input:  questions, topic_groups (from cluster_questions_by_topic)
-    Output: {
-        "session_summary": str,
-        "topic_summaries": [{"topic_name": str, "summary": str, "question_count": int}],
-        "hot_topics": [str]  # topic names with most questions, max 3
-    }
-    """
-    if not questions:
-        return {
-            "session_summary": "",
-            "topic_summaries": [],
-            "hot_topics": [],
-        }
-
-    topic_lines = "\n".join(
-        f"- {g.get('topic_name', '?')}: {len(g.get('question_ids', []))} questions"
-        for g in topic_groups
-    )
-    question_sample = "\n".join(
-        (q["content"][:100] + ("..." if len(q["content"]) > 100 else "")) for q in questions[:15]
+async def merge_topic_summaries_async(topic_name: str, partial_summaries: list[str]) -> str:
+    """Reduce step within a large topic: combine batch summaries into one sentence."""
+    lines = "\n".join(f"- {s}" for s in partial_summaries if s)
+    prompt = (
+        f'These are summaries of different batches of student questions about "{topic_name}":\n{lines}\n\n'
+        "Combine them into one sentence summarizing what students asked about this topic.\n"
+        'Return ONLY valid JSON: {"summary": "..."}'
     )
-    if len(questions) > 15:
-        question_sample += f"\n... and {len(questions) - 15} more questions"
+    try:
+        return _text_or_empty(await _mini_json_async(prompt, temperature=0.2), "summary")
+    except Exception:
+        return next((s for s in partial_summaries if s), "")
+
 
+async def summarize_session_async(total_questions: int, topics: list[tuple[str, int, str]]) -> str:
+    """Final reduce: a 2-4 sentence session overview from (topic_name, question_count, summary) per topic."""
+    lines = "\n".join(f"- {name} ({count} questions): {summary or 'no summary'}" for name, count, summary in topics)
     prompt = (
         "You are summarizing student questions from a university lecture for the professor.\n\n"
-        f"Total questions: {len(questions)}\n\n"
-        f"Topics (with question counts):\n{topic_lines}\n\n"
-        f"Sample of questions:\n{question_sample}\n\n"
-        "Provide:\n"
-        "1. session_summary: A 2-4 sentence overview of what students are asking about. "
+        f"Total questions: {total_questions}\n\n"
+        f"Topics, with question counts and what students asked:\n{lines}\n\n"
+        "Write session_summary: a 2-4 sentence overview of what students are asking about. "
         "Highlight main themes and any patterns.\n"
-        "2. topic_summaries: For each topic, a 1-sentence summary of what students asked.\n"
-        "3. hot_topics: The top 1-3 topic names that had the most questions (by count).\n"
-        "Return ONLY valid JSON:\n"
-        '{"session_summary":"...","topic_summaries":[{"topic_name":"...","summary":"...","question_count":N}],"hot_topics":["..."]}'
+        'Return ONLY valid JSON: {"session_summary": "..."}'
     )
     try:
-        response = _client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        )
-        raw = response.choices[0].message.content or "{}"
-        return json.loads(raw)
+        return _text_or_empty(await _mini_json_async(prompt, temperature=0.2), "session_summary")
     except Exception:
-        return {
-            "session_summary": "",
-            "topic_summaries": [],
-            "hot_topics": [],
-        }
+        return ""
@@ -1,11 +1,29 @@
 import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime
 
 import asyncpg
-import numpy as np
 
 from config import settings
 from models import AnswerOut, CitationOut, QuestionOut
-from services import openai_client
+from services import (
+    answer_cache,
+    category_classifier,
+    chunk_search,
+    classification_queue,
+    embedding_cache,
+    openai_client,
+    tokenizer,
+    vector_index,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_TOP_K = 20
 
 _PERSONALITY_INSTRUCTIONS: dict[str, str] = {
     "supportive": (
@@ -22,55 +40,78 @@ _PERSONALITY_INSTRUCTIONS: dict[str, str] = {
 }
 
 
-async def handle_question(
-    session_id: str,
-    student_id: str,
-    content: str,
-    db: asyncpg.Connection,
-    personality: str = "supportive",
-    anonymous: bool = False,
-) -> QuestionOut:
-    """Full RAG pipeline: save question → embed → retrieve top chunks → generate → save answer+citations → return."""
+@dataclass
+class _PreparedQuestion:
+    """Everything produced before the chat call: the saved question row and the grounded prompt."""
+    session_id: str
+    question_id: str
+    asked_at: datetime
+    system_prompt: str
+    history: list[dict]
+    citation_chunks: list[tuple[dict, int]]
+    query_embedding: list[float]
+    personality: str
+    active_doc_ids: list[str]
+    document_signature: frozenset   # (document_id, processed_at) of the ready active documents
+    stage_timings: dict[str, int]
+    category: str | None
+    cached: answer_cache.CachedAnswer | None = None
 
-    # Step 1: Save question
-    q_row = await db.fetchrow(
-        "INSERT INTO questions (session_id, student_id, content, anonymous) VALUES ($1, $2, $3, $4) RETURNING id, asked_at",
-        session_id,
-        student_id,
-        content,
-        anonymous,
+
+def _citation_out(chunk: dict, cite_num: int) -> CitationOut:
+    return CitationOut(
+        chunk_id=str(chunk["id"]),
+        content=chunk["content"],
+        page_number=chunk["page_number"],
+        relevance_score=round(float(chunk["cosine_similarity"]), 4),
+        citation_order=cite_num,
+        filename=chunk.get("filename"),
+        document_id=str(chunk["document_id"]) if chunk.get("document_id") else None,
     )
-    question_id = str(q_row["id"])
 
-    # Step 2: Embed the question
-    query_embedding = await asyncio.to_thread(openai_client.get_embedding, content)
 
-    # Step 3: Get active document IDs for this session
+async def _active_documents(db: asyncpg.Connection, session_id: str) -> tuple[list[str], frozenset]:
+    """Step 3: active document IDs for this session, and the (document_id, processed_at) signature of
+    the ready ones — what the answer cache is scoped by."""
     doc_rows = await db.fetch(
-        "SELECT document_id FROM session_documents WHERE session_id = $1 AND is_active = true",
+        """
+        SELECT sd.document_id, d.processing_status, d.processed_at
+        FROM session_documents sd
+        JOIN documents d ON d.id = sd.document_id
+        WHERE sd.session_id = $1 AND sd.is_active = true
+        """,
         session_id,
     )
-    active_doc_ids = [str(r["document_id"]) for r in doc_rows]
+    signature = frozenset(
+        (str(r["document_id"]), r["processed_at"]) for r in doc_rows if r["processing_status"] == "ready"
+    )
+    return [str(r["document_id"]) for r in doc_rows], signature
 
-    # Step 4: Vector similarity search — top 20 candidates, ranked by relevance
+
+async def _active_document_ids(db: asyncpg.Connection, session_id: str) -> list[str]:
+    """Step 3: active document IDs for this session."""
+    return (await _active_documents(db, session_id))[0]
+
+
+async def _search_chunks_sql(db: asyncpg.Connection, active_doc_ids: list[str], query_embedding: list[float]) -> list[dict]:
+    """Top chunks in Postgres (per-course HNSW, exact, or quantized scan + exact rerank), for sessions
+    too large for the in-memory index."""
+    return await chunk_search.search(db, active_doc_ids, query_embedding, RETRIEVAL_TOP_K)
+
+
+async def _retrieve_chunks(
+    db: asyncpg.Connection, session_id: str, active_doc_ids: list[str], query_embedding: list[float]
+) -> list[dict]:
+    """Step 4: top chunks across the active documents by cosine similarity."""
+    # Step 4: Vector similarity search — top 20 candidates, ranked by relevance (exact, in memory)
     chunks: list[dict] = []
     if active_doc_ids:
-        embedding_vec = np.array(query_embedding, dtype=np.float32)
-        chunk_rows = await db.fetch(
-            """
-            SELECT dc.id, dc.content, dc.page_number, dc.token_count, d.id AS document_id, d.filename,
-                   1 - (dc.embedding <=> $2) AS cosine_similarity
-            FROM document_chunks dc
-            JOIN documents d ON d.id = dc.document_id
-            WHERE dc.document_id = ANY($1::uuid[])
-              AND dc.embedding IS NOT NULL
-            ORDER BY dc.embedding <=> $2
-            LIMIT 20
-            """,
-            active_doc_ids,
-            embedding_vec,
-        )
-        chunks = [dict(r) | {"is_real_chunk": True} for r in chunk_rows]
+        found = None
+        if settings.vector_index_enabled:
+            found = await vector_index.search(db, session_id, active_doc_ids, query_embedding, RETRIEVAL_TOP_K)
+        if found is None:
+            found = await _search_chunks_sql(db, active_doc_ids, query_embedding)
+        chunks = [c | {"is_real_chunk": True} for c in found]
 
         # Append inline-text documents (no chunks/embeddings) ranked last
         doc_content_rows = await db.fetch(
@@ -78,6 +119,7 @@ async def handle_question(
             SELECT d.id, d.filename, d.content
             FROM documents d
             WHERE d.id = ANY($1::uuid[])
+              AND d.processing_status = 'ready'
               AND d.content IS NOT NULL
               AND trim(d.content) != ''
               AND NOT EXISTS (
@@ -92,143 +134,426 @@ async def handle_question(
                 "content": r["content"],
                 "filename": r["filename"],
                 "page_number": None,
-                "token_count": max(1, len(r["content"].split())),
+                "token_count": tokenizer.count_tokens(r["content"]),
                 "cosine_similarity": 0.0,
                 "is_real_chunk": False,
             })
+    return chunks
 
-    # Step 5: Budget-trim — greedily take chunks in relevance order until token budget exhausted
-    budget = settings.context_material_token_budget
-    context_chunks: list[dict] = []
-    tokens_used = 0
-    for chunk in chunks:
-        t = chunk["token_count"] or max(1, len(chunk["content"].split()))
-        if tokens_used + t > budget:
-            break
-        context_chunks.append(chunk)
-        tokens_used += t
-
-    # Step 6: Build grounded system prompt — number real chunks so AI can cite them inline
-    # Track citation number per chunk so saved citation_order matches what the model sees
-    personality_instruction = _PERSONALITY_INSTRUCTIONS.get(personality, _PERSONALITY_INSTRUCTIONS["supportive"])
-    citation_chunks = []  # (chunk, cite_num) pairs — built while constructing the prompt
-    if context_chunks:
-        materials_parts = []
-        cite_num = 1
-        for c in context_chunks:
-            if c["is_real_chunk"]:
-                header = f"[{cite_num}] {c.get('filename', 'Document')} (Page {c['page_number'] or '?'})"
-                citation_chunks.append((c, cite_num))
-                cite_num += 1
-            else:
-                header = f"[Ref] {c.get('filename', 'Document')}"
-            materials_parts.append(f"{header}:\n{c['content']}")
-        materials = "\n\n".join(materials_parts)
-        system_prompt = (
-            f"You are an AI teaching assistant. {personality_instruction} "
-            "Answer the student's question using ONLY the following numbered course materials. "
-            "Whenever you use information from a source, place its citation number inline in your answer like [1] or [2]. "
-            "If the answer cannot be found in the materials, say so clearly — do not use outside knowledge.\n\n"
-            f"--- Course Materials ---\n{materials}\n---"
-        )
-    else:
-        system_prompt = (
-            f"You are an AI teaching assistant. {personality_instruction} "
-            "No course materials are currently available for this session. "
-            "Let the student know their question cannot be answered from course materials right now."
-        )
 
-    # Step 6.5: Fetch prior Q&A history for this student in this session (last 5, oldest first)
+async def _fetch_history(db: asyncpg.Connection, session_id: str, student_id: str) -> list[dict]:
+    """Step 6.5: prior Q&A history for this student in this session (last 5, oldest first).
+
+    Only answered questions count, so the question being asked is never included, whether or not
+    its INSERT has landed yet.
+    """
     history_rows = await db.fetch(
         """
         SELECT q.content AS question, a.content AS answer
         FROM questions q
         JOIN answers a ON a.question_id = q.id
         WHERE q.session_id = $1 AND q.student_id = $2
-          AND q.id != $3::uuid
         ORDER BY q.asked_at DESC
         LIMIT 5
         """,
         session_id,
         student_id,
-        question_id,
     )
     history: list[dict] = []
     for row in reversed(history_rows):
         history.append({"role": "user", "content": row["question"]})
         history.append({"role": "assistant", "content": row["answer"]})
+    return history
 
-    # Step 7: Call GPT-4o — unpack 3-tuple (text, latency_ms, (input_tokens, output_tokens))
-    answer_text, latency_ms, (input_tokens, output_tokens) = await asyncio.to_thread(
-        openai_client.get_chat_completion,
-        system_prompt,
-        content,
-        settings.max_answer_tokens,
-        history or None,
-    )
 
-    # Step 8: Save answer with token counts
-    a_row = await db.fetchrow(
+def _pack_materials(chunks: list[dict], budget: int) -> tuple[str, list[tuple[dict, int]], int]:
+    """Steps 5-6: greedily pack chunks, in relevance order, into the course-materials block.
+
+    Costs are exact tokens under services.tokenizer: the chunk's stored token_count plus its
+    "[n] file (Page p):" header and separator. A chunk that does not fit is skipped rather than
+    ending the pass, so smaller lower-ranked chunks can still use the remaining budget.
+    Returns (materials, [(chunk, cite_num)], tokens_used); citation numbers match what the model sees.
+    """
+    parts: list[str] = []
+    citation_chunks: list[tuple[dict, int]] = []
+    tokens_used = 0
+    cite_num = 1
+    for c in chunks:
+        if c["is_real_chunk"]:
+            header = f"[{cite_num}] {c.get('filename', 'Document')} (Page {c['page_number'] or '?'})"
+        else:
+            header = f"[Ref] {c.get('filename', 'Document')}"
+        content_tokens = c["token_count"] if c["token_count"] is not None else tokenizer.count_tokens(c["content"])
+        cost = content_tokens + tokenizer.count_tokens(f"{header}:\n") + (1 if parts else 0)
+        if tokens_used + cost > budget:
+            continue
+        parts.append(f"{header}:\n{c['content']}")
+        tokens_used += cost
+        if c["is_real_chunk"]:
+            citation_chunks.append((c, cite_num))
+            cite_num += 1
+    return "\n\n".join(parts), citation_chunks, tokens_used
+
+
+async def _insert_question(
+    db: asyncpg.Connection,
+    session_id: str,
+    student_id: str,
+    content: str,
+    anonymous: bool,
+    query_embedding,
+    category: str | None,
+) -> asyncpg.Record:
+    """Step 2: save the question. The embedding goes in the same INSERT, so analytics never re-embed,
+    and so does the local category: only questions the local classifier abstains on (category NULL)
+    ever reach the classification queue."""
+    return await db.fetchrow(
         """
-        INSERT INTO answers (question_id, content, model_used, generation_latency_ms, input_tokens, output_tokens)
-        VALUES ($1, $2, $3, $4, $5, $6)
-        RETURNING id
+        INSERT INTO questions (session_id, student_id, content, anonymous, embedding, category, category_source)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING id, asked_at
         """,
-        question_id,
-        answer_text,
-        openai_client.CHAT_MODEL,
-        latency_ms,
-        input_tokens or None,
-        output_tokens or None,
+        session_id,
+        student_id,
+        content,
+        anonymous,
+        query_embedding,
+        category,
+        "local" if category else None,
     )
-    answer_id = str(a_row["id"])
 
-    # Step 8.5: Classify question category (fire-and-forget, don't block)
-    try:
-        category = await asyncio.to_thread(openai_client.classify_question, content)
-        await db.execute(
-            "UPDATE questions SET category = $1 WHERE id = $2",
-            category,
-            question_id,
+
+async def _on_connection(pool: asyncpg.Pool, step, *args):
+    """Run step(db, *args) on its own pooled connection, so independent steps run concurrently."""
+    async with pool.acquire() as db:
+        return await step(db, *args)
+
+
+async def _timed(timings: dict[str, int], stage: str, awaitable):
+    """Await a stage and record its wall time; a cancelled or failed stage records nothing."""
+    start = time.perf_counter()
+    result = await awaitable
+    timings[stage] = int((time.perf_counter() - start) * 1000)
+    return result
+
+
+async def _prepare_question(
+    session_id: str,
+    student_id: str,
+    content: str,
+    pool: asyncpg.Pool,
+    personality: str,
+    anonymous: bool,
+) -> _PreparedQuestion:
+    """Steps 1–6.5: embed → save question with its embedding → retrieve top chunks + history → build prompt.
+
+    The steps run as a small dependency graph, each DB step on its own pooled connection:
+
+        embed ───────┬──────────────────── insert question (+ local category)
+        active docs ─┴─ answer cache ───── retrieve chunks
+        history ────────────────────────── (independent)
+
+    Only the INSERT and retrieval wait for the embedding. The INSERT must, because the embedding is
+    written with the question row. No connection is held during the embedding call. Per-stage
+    wall times go to stage_timings.
+
+    If a near-duplicate question in this session was already answered from the same materials,
+    returns early with `cached` set and no prompt — the caller reuses that answer.
+    """
+    timings: dict[str, int] = {}
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as tg:
+        # Step 1: Embed the question (read-through embedding cache; pool passed so no connection is pinned)
+        embed = tg.create_task(_timed(timings, "embed", embedding_cache.get_embedding(content, pool)))
+        # Step 3: Active documents; Step 6.5: history — neither needs the embedding or the question row
+        docs = tg.create_task(_timed(timings, "active_docs", _on_connection(pool, _active_documents, session_id)))
+        history_task = tg.create_task(
+            _timed(timings, "history", _on_connection(pool, _fetch_history, session_id, student_id))
         )
-    except Exception:
-        pass
 
-    # Step 9: Save citations — use the exact cite_num assigned in the prompt so [n] always resolves
-    citation_outs = []
-    for chunk, cite_num in citation_chunks:
-        await db.execute(
-            """
-            INSERT INTO answer_citations (answer_id, chunk_id, relevance_score, citation_order)
-            VALUES ($1, $2, $3, $4)
-            """,
+        query_embedding = await embed
+        # Step 2.5: Classify locally from the embedding, so the category is saved with the question
+        category = category_classifier.predict([query_embedding])[0]
+        insert = tg.create_task(_timed(timings, "insert", _on_connection(
+            pool, _insert_question, session_id, student_id, content, anonymous, query_embedding, category
+        )))
+
+        # Step 3.5: Semantic answer cache — same session, personality and active materials
+        active_doc_ids, document_signature = await docs
+        cached = answer_cache.lookup(session_id, query_embedding, personality, document_signature)
+        if cached:
+            history_task.cancel()
+        else:
+            # Step 4: Retrieval, concurrently with the INSERT
+            retrieve = tg.create_task(_timed(timings, "retrieve", _on_connection(
+                pool, _retrieve_chunks, session_id, active_doc_ids, query_embedding
+            )))
+
+    q_row = insert.result()
+    question_id = str(q_row["id"])
+    if cached:
+        timings["prepare"] = int((time.perf_counter() - start) * 1000)
+        return _PreparedQuestion(
+            session_id=session_id,
+            question_id=question_id,
+            asked_at=q_row["asked_at"],
+            system_prompt="",
+            history=[],
+            citation_chunks=cached.citation_chunks,
+            query_embedding=query_embedding,
+            personality=personality,
+            active_doc_ids=active_doc_ids,
+            document_signature=document_signature,
+            stage_timings=timings,
+            category=category,
+            cached=cached,
+        )
+    chunks = retrieve.result()
+    history = history_task.result()
+
+    # Step 5 + 6: Pack chunks into the token budget and number real chunks so AI can cite them inline
+    pack_start = time.perf_counter()
+    personality_instruction = _PERSONALITY_INSTRUCTIONS.get(personality, _PERSONALITY_INSTRUCTIONS["supportive"])
+    materials, citation_chunks, _ = _pack_materials(chunks, settings.context_material_token_budget)
+    if materials:
+        system_prompt = (
+            f"You are an AI teaching assistant. {personality_instruction} "
+            "Answer the student's question using ONLY the following numbered course materials. "
+            "Whenever you use information from a source, place its citation number inline in your answer like [1] or [2]. "
+            "If the answer cannot be found in the materials, say so clearly — do not use outside knowledge.\n\n"
+            f"--- Course Materials ---\n{materials}\n---"
+        )
+    else:
+        system_prompt = (
+            f"You are an AI teaching assistant. {personality_instruction} "
+            "No course materials are currently available for this session. "
+            "Let the student know their question cannot be answered from course materials right now."
+        )
+    timings["pack"] = int((time.perf_counter() - pack_start) * 1000)
+    timings["prepare"] = int((time.perf_counter() - start) * 1000)
+
+    return _PreparedQuestion(
+        session_id=session_id,
+        question_id=question_id,
+        asked_at=q_row["asked_at"],
+        system_prompt=system_prompt,
+        history=history,
+        citation_chunks=citation_chunks,
+        query_embedding=query_embedding,
+        personality=personality,
+        active_doc_ids=active_doc_ids,
+        document_signature=document_signature,
+        stage_timings=timings,
+        category=category,
+    )
+
+
+async def _save_answer(
+    pool: asyncpg.Pool,
+    prepared: _PreparedQuestion,
+    answer_text: str,
+    latency_ms: int,
+    input_tokens: int,
+    output_tokens: int,
+) -> AnswerOut:
+    """Steps 8–9: save answer + citations, queue classification. Fresh answers are added to the answer cache."""
+    question_id = prepared.question_id
+    cached = prepared.cached
+
+    async with pool.acquire() as db:
+        async with db.transaction():
+            # Step 8: Save answer with token counts, and the question's stage timings in the same statement
+            a_row = await db.fetchrow(
+                """
+                WITH timed AS (
+                    UPDATE questions SET stage_timings = $9::jsonb WHERE id = $1
+                )
+                INSERT INTO answers (question_id, content, model_used, generation_latency_ms, input_tokens, output_tokens,
+                                     cache_hit, cached_from)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                RETURNING id
+                """,
+                question_id,
+                answer_text,
+                openai_client.CHAT_MODEL,
+                latency_ms,
+                input_tokens or None,
+                output_tokens or None,
+                cached is not None,
+                cached.answer_id if cached else None,
+                json.dumps(prepared.stage_timings if cached else prepared.stage_timings | {"generate": latency_ms}),
+            )
+            answer_id = str(a_row["id"])
+
+            # Step 9: Save citations — use the exact cite_num assigned in the prompt so [n] always resolves
+            if prepared.citation_chunks:
+                await db.executemany(
+                    """
+                    INSERT INTO answer_citations (answer_id, chunk_id, relevance_score, citation_order)
+                    VALUES ($1, $2, $3, $4)
+                    """,
+                    [
+                        (answer_id, str(chunk["id"]), float(chunk["cosine_similarity"]), cite_num)
+                        for chunk, cite_num in prepared.citation_chunks
+                    ],
+                )
+
+    if cached is None:
+        answer_cache.store(
+            prepared.session_id,
+            prepared.query_embedding,
+            prepared.personality,
+            prepared.document_signature,
             answer_id,
-            str(chunk["id"]),
-            float(chunk["cosine_similarity"]),
-            cite_num,
+            answer_text,
+            prepared.citation_chunks,
         )
-        citation_outs.append(CitationOut(
-            chunk_id=str(chunk["id"]),
-            content=chunk["content"],
-            page_number=chunk["page_number"],
-            relevance_score=round(float(chunk["cosine_similarity"]), 4),
-            citation_order=cite_num,
-            filename=chunk.get("filename"),
-            document_id=str(chunk["document_id"]) if chunk.get("document_id") else None,
-        ))
+
+    # Not confident locally — the background micro-batched LLM classifier picks it up; never awaited here
+    if not prepared.category:
+        classification_queue.notify()
+
+    return AnswerOut(
+        answer_id=answer_id,
+        content=answer_text,
+        model_used=openai_client.CHAT_MODEL,
+        generation_latency_ms=latency_ms,
+        citations=[_citation_out(chunk, cite_num) for chunk, cite_num in prepared.citation_chunks],
+        cache_hit=cached is not None,
+    )
+
+
+async def handle_question(
+    session_id: str,
+    student_id: str,
+    content: str,
+    pool: asyncpg.Pool,
+    personality: str = "supportive",
+    anonymous: bool = False,
+) -> QuestionOut:
+    """Full RAG pipeline: save question → embed → retrieve top chunks → generate → save answer+citations → return.
+
+    Takes the pool rather than a connection: each DB phase acquires and releases its own
+    connection, so in-flight OpenAI calls never pin pool capacity.
+    """
+    prepared = await _prepare_question(session_id, student_id, content, pool, personality, anonymous)
+
+    # Step 7: Call GPT-4o — unpack 3-tuple (text, latency_ms, (input_tokens, output_tokens))
+    if prepared.cached:
+        answer_text, latency_ms, (input_tokens, output_tokens) = prepared.cached.answer_text, 0, (0, 0)
+    else:
+        answer_text, latency_ms, (input_tokens, output_tokens) = await openai_client.get_chat_completion_async(
+            prepared.system_prompt,
+            content,
+            settings.max_answer_tokens,
+            prepared.history or None,
+        )
+
+    answer = await _save_answer(pool, prepared, answer_text, latency_ms, input_tokens, output_tokens)
 
     # Step 10: Return full QuestionOut
     return QuestionOut(
-        question_id=question_id,
+        question_id=prepared.question_id,
         content=content,
-        asked_at=q_row["asked_at"],
+        asked_at=prepared.asked_at,
         student_id=student_id,
         anonymous=anonymous,
-        answer=AnswerOut(
-            answer_id=answer_id,
-            content=answer_text,
-            model_used=openai_client.CHAT_MODEL,
-            generation_latency_ms=latency_ms,
-            citations=citation_outs,
-        ),
+        answer=answer,
+    )
+
+
+# Streaming tasks outlive the client connection so the answer is saved even if the student navigates away.
+_STREAM_TASKS: set[asyncio.Task] = set()
+
+
+async def stream_question(
+    session_id: str,
+    student_id: str,
+    content: str,
+    pool: asyncpg.Pool,
+    personality: str = "supportive",
+    anonymous: bool = False,
+) -> AsyncIterator[tuple[str, dict | list]]:
+    """Streaming variant of handle_question. Yields (event, data) pairs:
+
+    "question"  — {"question_id", "asked_at"} once the question is saved
+    "citations" — [CitationOut, ...] as soon as retrieval finishes
+    "token"     — {"delta": str} for each piece of answer text from GPT-4o
+    "done"      — the full QuestionOut, after the answer and citations are persisted
+    "error"     — {"detail": str} if the pipeline fails
+
+    Generation runs in a background task, so a client disconnect never leaves a
+    question without its saved answer.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        _run_streamed_question(queue, session_id, student_id, content, pool, personality, anonymous)
     )
+    _STREAM_TASKS.add(task)
+    task.add_done_callback(_STREAM_TASKS.discard)
+
+    while True:
+        event = await queue.get()
+        if event is None:
+            return
+        yield event
+
+
+async def _run_streamed_question(
+    queue: asyncio.Queue,
+    session_id: str,
+    student_id: str,
+    content: str,
+    pool: asyncpg.Pool,
+    personality: str,
+    anonymous: bool,
+) -> None:
+    try:
+        prepared = await _prepare_question(session_id, student_id, content, pool, personality, anonymous)
+
+        await queue.put(("question", {
+            "question_id": prepared.question_id,
+            "asked_at": prepared.asked_at.isoformat(),
+        }))
+        await queue.put(("citations", [
+            _citation_out(chunk, cite_num).model_dump() for chunk, cite_num in prepared.citation_chunks
+        ]))
+
+        # Step 7 (streaming): forward each delta as soon as it arrives
+        parts: list[str] = []
+        input_tokens, output_tokens, latency_ms = 0, 0, 0
+        if prepared.cached:
+            parts.append(prepared.cached.answer_text)
+            await queue.put(("token", {"delta": prepared.cached.answer_text}))
+        else:
+            start = time.perf_counter()
+            async for item in openai_client.stream_chat_completion_async(
+                prepared.system_prompt,
+                content,
+                settings.max_answer_tokens,
+                prepared.history or None,
+            ):
+                if isinstance(item, tuple):
+                    input_tokens, output_tokens = item
+                    continue
+                parts.append(item)
+                await queue.put(("token", {"delta": item}))
+            latency_ms = int((time.perf_counter() - start) * 1000)
+        answer_text = "".join(parts)
+
+        answer = await _save_answer(pool, prepared, answer_text, latency_ms, input_tokens, output_tokens)
+
+        await queue.put(("done", QuestionOut(
+            question_id=prepared.question_id,
+            content=content,
+            asked_at=prepared.asked_at,
+            student_id=student_id,
+            anonymous=anonymous,
+            answer=answer,
+        ).model_dump(mode="json")))
+    except Exception:
+        # CancelledError is not an Exception and propagates; everything else is logged, then reported
+        logger.exception("Streamed question failed (session %s)", session_id)
+        await queue.put(("error", {"detail": "Could not generate an answer. Please try again."}))
+    finally:
+        await queue.put(None)
@@ -0,0 +1,306 @@
+"""Session report cache, shared by every API worker.
+
+Two read-through tiers, keyed by (session_id, variant) — variant is "review" for the professor
+report built with include_review_data and "student" otherwise:
+  1. an in-process LRU bounded by bytes of serialised report (settings.report_cache_memory_mb)
+  2. the Postgres report_cache table, shared by every worker and surviving deploys
+
+An entry is fresh while it is younger than settings.report_cache_ttl_sec, fewer than
+settings.report_cache_question_threshold questions have been asked since it was built, and it has
+not been invalidated since its build started. Stale entries are still returned so the report
+service can serve them while it rebuilds.
+
+invalidate() stamps invalidated_at on the session's rows and sends NOTIFY report_cache_invalidate;
+a listener started from the app lifespan marks the session stale in this worker's memory tier. With
+settings.report_cache_backend = "memory" only the first tier is used (single-process dev setups,
+or a database without migration 016).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import asyncpg
+import numpy as np
+
+from config import settings
+from models import SessionReportResponse
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "report_cache_invalidate"
+_RECONNECT_DELAY_SEC = 5.0
+
+
+@dataclass
+class TopicState:
+    """Topic clustering behind a report, kept so the next build can update it incrementally."""
+    topics: list[dict]         # [{"topic_name", "question_ids"}], aligned with centroids
+    centroids: np.ndarray      # (k, dims) unit centroids from the last full clustering
+    clustered_count: int       # questions in the session at the last full clustering
+
+    def to_json(self) -> str:
+        return json.dumps({"topics": self.topics, "clustered_count": self.clustered_count})
+
+    @classmethod
+    def from_row(cls, state: str, centroids: bytes) -> "TopicState":
+        data = json.loads(state)
+        return cls(
+            topics=data["topics"],
+            centroids=np.frombuffer(centroids, dtype=np.float32).reshape(len(data["topics"]), -1),
+            clustered_count=data["clustered_count"],
+        )
+
+
+@dataclass
+class CachedReport:
+    report: SessionReportResponse
+    built_at: float        # epoch seconds when the build started
+    question_count: int
+    size: int = 0          # bytes of serialised report and topic state, for the memory bound
+    invalidated_at: float = 0.0
+    topic_state: TopicState | None = None
+
+
+def variant(include_review_data: bool) -> str:
+    return "review" if include_review_data else "student"
+
+
+def is_fresh(entry: CachedReport, current_question_count: int, now: float | None = None) -> bool:
+    age = (time.time() if now is None else now) - entry.built_at
+    new_questions = current_question_count - entry.question_count
+    return (
+        age < settings.report_cache_ttl_sec
+        and new_questions < settings.report_cache_question_threshold
+        and entry.invalidated_at < entry.built_at
+    )
+
+
+class MemoryTier:
+    """Per-process LRU bounded by total serialised size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, str], CachedReport] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str, variant: str) -> CachedReport | None:
+        entry = self._entries.get((session_id, variant))
+        if entry is not None:
+            self._entries.move_to_end((session_id, variant))
+        return entry
+
+    def put(self, session_id: str, variant: str, entry: CachedReport) -> None:
+        self._drop((session_id, variant))
+        if entry.size > self.max_bytes:
+            return
+        self._entries[(session_id, variant)] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+    def mark_invalidated(self, session_id: str, at: float) -> None:
+        for key, entry in self._entries.items():
+            if key[0] == session_id:
+                entry.invalidated_at = max(entry.invalidated_at, at)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+
+class PostgresTier:
+    """The report_cache table. db may be a connection or the pool."""
+
+    async def get(self, db, session_id: str, variant: str) -> CachedReport | None:
+        row = await db.fetchrow(
+            """
+            SELECT report, question_count, topic_state, topic_centroids,
+                   EXTRACT(EPOCH FROM built_at)::float8 AS built_at,
+                   COALESCE(EXTRACT(EPOCH FROM invalidated_at)::float8, 0) AS invalidated_at
+            FROM report_cache
+            WHERE session_id = $1 AND variant = $2
+            """,
+            session_id,
+            variant,
+        )
+        if row is None:
+            return None
+        topic_state = None
+        if row["topic_state"] is not None and row["topic_centroids"] is not None:
+            topic_state = TopicState.from_row(row["topic_state"], row["topic_centroids"])
+        return CachedReport(
+            report=SessionReportResponse.model_validate_json(row["report"]),
+            built_at=row["built_at"],
+            question_count=row["question_count"],
+            size=len(row["report"]) + (topic_state.centroids.nbytes if topic_state else 0),
+            invalidated_at=row["invalidated_at"],
+            topic_state=topic_state,
+        )
+
+    async def put(self, db, session_id: str, variant: str, entry: CachedReport, payload: str) -> None:
+        # A slower concurrent build must not overwrite a report that was started later
+        state = entry.topic_state
+        await db.execute(
+            """
+            INSERT INTO report_cache
+                (session_id, variant, report, question_count, built_at, topic_state, topic_centroids)
+            VALUES ($1, $2, $3::jsonb, $4, to_timestamp($5), $6::jsonb, $7)
+            ON CONFLICT (session_id, variant) DO UPDATE
+            SET report = EXCLUDED.report, question_count = EXCLUDED.question_count, built_at = EXCLUDED.built_at,
+                topic_state = EXCLUDED.topic_state, topic_centroids = EXCLUDED.topic_centroids
+            WHERE report_cache.built_at <= EXCLUDED.built_at
+            """,
+            session_id,
+            variant,
+            payload,
+            entry.question_count,
+            entry.built_at,
+            state.to_json() if state else None,
+            state.centroids.astype(np.float32).tobytes() if state else None,
+        )
+
+    async def invalidate(self, db, session_id: str, at: float) -> None:
+        # Stamped with the app clock, the same clock built_at comes from
+        await db.execute(
+            """
+            WITH marked AS (
+                UPDATE report_cache SET invalidated_at = to_timestamp($3) WHERE session_id = $1
+            )
+            SELECT pg_notify($2, $1::text)
+            """,
+            session_id,
+            CHANNEL,
+            at,
+        )
+
+
+_memory = MemoryTier(settings.report_cache_memory_mb * 1024 * 1024)
+_shared: PostgresTier | None = PostgresTier() if settings.report_cache_backend == "postgres" else None
+
+# session_id -> time of the last invalidation seen by this worker; a build that started before it
+# is stored already stale, so a report computed from pre-invalidation data is rebuilt again.
+# Oldest invalidation first; entries older than the TTL are dropped, since a build that started
+# before them is stale by age anyway.
+_invalidated_at: OrderedDict[str, float] = OrderedDict()
+
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stale": 0}
+
+
+def stats() -> dict:
+    """Hit/miss counters and memory-tier size, for the /health/caches endpoint."""
+    lookups = _stats["memory_hits"] + _stats["db_hits"] + _stats["stale"] + _stats["misses"]
+    return {
+        **_stats,
+        "backend": settings.report_cache_backend,
+        "hit_rate": round((_stats["memory_hits"] + _stats["db_hits"]) / lookups, 4) if lookups else None,
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory.bytes,
+        "evictions": _memory.evictions,
+    }
+
+
+async def get(db, session_id: str, variant: str, current_question_count: int) -> CachedReport | None:
+    """The newest cached report for the session variant, fresh or stale (check is_fresh), or None."""
+    now = time.time()
+    entry = _memory.get(session_id, variant)
+    if entry is not None and is_fresh(entry, current_question_count, now):
+        _stats["memory_hits"] += 1
+        return entry
+
+    if _shared is not None:
+        # The shared tier may hold a newer build from another worker
+        shared = await _shared.get(db, session_id, variant)
+        if shared is not None and (entry is None or shared.built_at > entry.built_at):
+            shared.invalidated_at = max(shared.invalidated_at, _invalidated_at.get(session_id, 0.0))
+            _memory.put(session_id, variant, shared)
+            entry = shared
+        if entry is not None and is_fresh(entry, current_question_count, now):
+            _stats["db_hits"] += 1
+            return entry
+
+    _stats["stale" if entry is not None else "misses"] += 1
+    return entry
+
+
+async def put(db, session_id: str, variant: str, entry: CachedReport) -> None:
+    """Write a freshly built report through both tiers."""
+    entry.invalidated_at = max(entry.invalidated_at, _invalidated_at.get(session_id, 0.0))
+    payload = entry.report.model_dump_json()
+    entry.size = len(payload) + (entry.topic_state.centroids.nbytes if entry.topic_state else 0)
+    _memory.put(session_id, variant, entry)
+    if _shared is not None:
+        await _shared.put(db, session_id, variant, entry, payload)
+
+
+def _invalidate_local(session_id: str) -> float:
+    at = time.time()
+    _invalidated_at[session_id] = at
+    _invalidated_at.move_to_end(session_id)
+    while next(iter(_invalidated_at.values())) < at - settings.report_cache_ttl_sec:
+        _invalidated_at.popitem(last=False)
+    _memory.mark_invalidated(session_id, at)
+    return at
+
+
+async def invalidate(db, session_id: str) -> None:
+    """Mark every cached variant of a session's report stale, in all workers."""
+    at = _invalidate_local(session_id)
+    if _shared is not None:
+        await _shared.invalidate(db, session_id, at)
+
+
+def _on_notify(conn, pid, channel, payload) -> None:
+    _invalidate_local(payload)
+
+
+async def _listen() -> None:
+    while True:
+        try:
+            conn = await asyncpg.connect(settings.database_url)
+        except Exception as e:
+            logger.warning("Report cache listener could not connect: %s", e)
+            await asyncio.sleep(_RECONNECT_DELAY_SEC)
+            continue
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _conn: closed.set())
+        try:
+            await conn.add_listener(CHANNEL, _on_notify)
+            # Notifications sent while disconnected are lost; start from the shared tier again
+            _memory.clear()
+            await closed.wait()
+            logger.warning("Report cache listener connection lost, reconnecting")
+        except Exception:
+            logger.exception("Report cache listener error")
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(_RECONNECT_DELAY_SEC)
+
+
+def start_listener() -> asyncio.Task | None:
+    """Start the invalidation listener on the running loop (called from the app lifespan)."""
+    if _shared is None:
+        return None
+    return asyncio.create_task(_listen(), name="report-cache-listener")
+
+
+async def stop_listener(task: asyncio.Task | None) -> None:
+    if task is None:
+        return
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -1,9 +1,22 @@
 """Shared report building logic for session Q&A (student and professor)."""
 
 import asyncio
+import logging
 import time
+import uuid
+from datetime import datetime, timezone
 
-from services import openai_client
+import numpy as np
+
+from config import settings
+from services import (
+    duplicate_detection,
+    embedding_cache,
+    openai_client,
+    report_cache,
+    report_summary,
+    topic_clustering,
+)
 from models import (
     AnswerOut,
     AnswerFeedbackOut,
@@ -14,6 +27,12 @@ from models import (
     TopicGroup,
 )
 
+logger = logging.getLogger(__name__)
+
+# (session_id, variant) -> the report build running in this worker; concurrent callers await it
+_BUILDS: dict[tuple[str, str], asyncio.Task] = {}
+_LEASE_POLL_SEC = 0.5
+
 _ANIMALS = [
     "Lion", "Tiger", "Bear", "Wolf", "Eagle", "Dolphin", "Fox", "Owl",
     "Hawk", "Panther", "Jaguar", "Falcon", "Lynx", "Puma", "Raven",
@@ -31,46 +50,32 @@ def _animal_name(student_id: str, sorted_student_ids: list[str]) -> str:
     return f"Anonymous {_ANIMALS[idx % len(_ANIMALS)]}"
 
 
-# Cache: refresh every 10 min or when 10 new questions. Key: session_id.
-_REPORT_CACHE: dict[str, dict] = {}
-_CACHE_TTL_SEC = 600  # 10 minutes
-_CACHE_QUESTION_THRESHOLD = 10
-
-
-def invalidate_report_cache_for_session(session_id: str) -> None:
-    """Clear cached reports for a session (e.g. when professor updates labels)."""
-    keys_to_remove = [k for k in _REPORT_CACHE if k.startswith(f"{session_id}:")]
-    for k in keys_to_remove:
-        del _REPORT_CACHE[k]
-
-
-async def build_session_report(
-    db,
-    session_id: str,
-    published_only: bool = True,  # kept for call-site compatibility, ignored
-    include_review_data: bool = False,
-) -> SessionReportResponse:
-    """Build anonymised Q&A report for a session. Caller must verify access.
-    Summary is cached and refreshed every 10 min or when 10 new questions arrive."""
-    now = time.time()
-
-    # Get current question count for cache decision
-    current_count = await db.fetchval(
-        "SELECT COUNT(*) FROM questions q WHERE q.session_id = $1",
-        session_id,
-    )
-    current_count = int(current_count or 0)
-
-    cache_key = f"{session_id}"
-    cached = _REPORT_CACHE.get(cache_key)
-    if cached:
-        age_sec = now - cached["built_at"]
-        new_questions = current_count - cached["question_count"]
-        if age_sec < _CACHE_TTL_SEC and new_questions < _CACHE_QUESTION_THRESHOLD:
-            return cached["report"]
+async def _load_session_rows(db, session_id: str) -> tuple[list, dict]:
+    """Everything the report needs from the database in two set-based queries.
 
+    Returns (question/answer rows in asked_at order, {answer_id: citation rows in citation order}).
+    Feedback and comment counts are grouped once and joined rather than counted per row.
+    """
     rows = await db.fetch(
-        f"""
+        """
+        WITH session_questions AS (
+            SELECT id FROM questions WHERE session_id = $1
+        ),
+        feedback_counts AS (
+            SELECT af.answer_id,
+                   COUNT(*) FILTER (WHERE af.feedback = 'up')   AS thumbs_up,
+                   COUNT(*) FILTER (WHERE af.feedback = 'down') AS thumbs_down
+            FROM answer_feedback af
+            JOIN answers a ON a.id = af.answer_id
+            WHERE a.question_id IN (SELECT id FROM session_questions)
+            GROUP BY af.answer_id
+        ),
+        comment_counts AS (
+            SELECT qc.question_id, COUNT(*) AS comment_count
+            FROM question_comments qc
+            WHERE qc.question_id IN (SELECT id FROM session_questions)
+            GROUP BY qc.question_id
+        )
         SELECT
             q.id                  AS question_id,
             q.content             AS question_content,
@@ -79,26 +84,268 @@ async def build_session_report(
             q.category            AS category,
             COALESCE(q.fork_count, 0) AS fork_count,
             q.forked_from         AS forked_from,
+            q.embedding           AS question_embedding,
             a.id                  AS answer_id,
             a.content             AS answer_content,
             a.model_used,
             a.generation_latency_ms,
-            COALESCE((SELECT COUNT(*) FROM answer_feedback af
-                      WHERE af.answer_id = a.id AND af.feedback = 'up'), 0)   AS thumbs_up,
-            COALESCE((SELECT COUNT(*) FROM answer_feedback af
-                      WHERE af.answer_id = a.id AND af.feedback = 'down'), 0) AS thumbs_down,
-            COALESCE((SELECT COUNT(*) FROM question_comments qc
-                      WHERE qc.question_id = q.id), 0)                         AS comment_count
+            COALESCE(fc.thumbs_up, 0)     AS thumbs_up,
+            COALESCE(fc.thumbs_down, 0)   AS thumbs_down,
+            COALESCE(cc.comment_count, 0) AS comment_count
         FROM questions q
-        LEFT JOIN answers a ON a.question_id = q.id
+        LEFT JOIN answers a          ON a.question_id = q.id
+        LEFT JOIN feedback_counts fc ON fc.answer_id = a.id
+        LEFT JOIN comment_counts cc  ON cc.question_id = q.id
         WHERE q.session_id = $1
         ORDER BY q.asked_at ASC
         """,
         session_id,
     )
 
-    if not rows:
+    answer_ids = [r["answer_id"] for r in rows if r["answer_id"]]
+    citations_by_answer: dict = {}
+    if answer_ids:
+        citation_rows = await db.fetch(
+            """
+            SELECT ac.answer_id, ac.chunk_id, dc.content, dc.page_number,
+                   ac.relevance_score, ac.citation_order
+            FROM answer_citations ac
+            JOIN document_chunks dc ON dc.id = ac.chunk_id
+            WHERE ac.answer_id = ANY($1::uuid[])
+            ORDER BY ac.answer_id, ac.citation_order
+            """,
+            answer_ids,
+        )
+        for cr in citation_rows:
+            citations_by_answer.setdefault(cr["answer_id"], []).append(cr)
+    return rows, citations_by_answer
+
+
+async def _question_embeddings(db, rows) -> np.ndarray:
+    """Stored question embeddings in row order; rows from before they were stored go through the cache."""
+    missing = [r["question_content"] for r in rows if r["question_embedding"] is None]
+    filled = iter(await embedding_cache.get_embeddings(missing, db) if missing else [])
+    return np.stack([
+        np.asarray(r["question_embedding"], dtype=np.float32) if r["question_embedding"] is not None else next(filled)
+        for r in rows
+    ])
+
+
+async def _cluster_topics(question_list: list[dict], embeddings: np.ndarray) -> tuple[list[dict], np.ndarray]:
+    """Topic groups ({"topic_name", "question_ids"}, largest first) from local clustering plus one naming call,
+    and their unit centroids in the same order."""
+    # NumPy releases the GIL in the matrix products; keep the event loop free for large sessions
+    labels, centroids = await asyncio.to_thread(topic_clustering.cluster, embeddings)
+    reps = topic_clustering.representatives(embeddings, labels, centroids)
+    clusters = sorted(
+        ((j, np.flatnonzero(labels == j), reps[j]) for j in range(len(centroids))),
+        key=lambda c: -len(c[1]),
+    )
+    clusters = [c for c in clusters if len(c[1])]
+    names = await openai_client.name_topic_clusters_async(
+        [[question_list[i]["content"] for i in rep_idx] for _, _, rep_idx in clusters]
+    )
+    groups = [
+        {"topic_name": name, "question_ids": [question_list[i]["question_id"] for i in members]}
+        for name, (_, members, _) in zip(names, clusters)
+    ]
+    return groups, centroids[[j for j, _, _ in clusters]]
+
+
+def _incremental_topics(
+    question_list: list[dict], embeddings: np.ndarray, state: report_cache.TopicState
+) -> list[dict] | None:
+    """The previous topics with new questions added to the nearest centroid, or None when a full
+    recluster is due: the session grew by settings.report_recluster_growth since it was last
+    clustered, or a topic's centroid drifted past settings.report_topic_drift_threshold."""
+    if len(question_list) > state.clustered_count * (1 + settings.report_recluster_growth):
+        return None
+    index = {q["question_id"]: i for i, q in enumerate(question_list)}
+    members = [[index[qid] for qid in t["question_ids"] if qid in index] for t in state.topics]
+    known = {i for m in members for i in m}
+    new = [i for i in range(len(question_list)) if i not in known]
+    if new:
+        for i, j in zip(new, topic_clustering.assign(embeddings[new], state.centroids).tolist()):
+            members[j].append(i)
+    if topic_clustering.drift(embeddings, members, state.centroids) > settings.report_topic_drift_threshold:
+        return None
+    return [
+        {"topic_name": t["topic_name"], "question_ids": [question_list[i]["question_id"] for i in sorted(m)]}
+        for t, m in zip(state.topics, members)
+    ]
+
+
+async def _repeating_groups(
+    question_list: list[dict], embeddings: np.ndarray, known_summaries: dict[tuple[str, ...], str]
+) -> list[dict]:
+    """Near-duplicate groups ({"summary", "question_ids", "count"}, largest first); the LLM only writes summaries.
+
+    known_summaries maps the first five question ids of a previous group (what the LLM was shown)
+    to its summary; groups that still start with the same questions keep it without a call.
+    """
+    groups = await asyncio.to_thread(
+        duplicate_detection.find_duplicate_groups, embeddings, settings.repeating_question_similarity
+    )
+    groups = groups[:settings.max_repeating_groups]
+    leads = [tuple(question_list[i]["question_id"] for i in members[:5]) for members in groups]
+    pending = [g for g, lead in enumerate(leads) if not known_summaries.get(lead)]
+    fresh = iter(await openai_client.summarize_repeating_groups_async(
+        [[question_list[i]["content"] for i in groups[g][:5]] for g in pending]
+    ))
+    pending_set = set(pending)
+    summaries = [next(fresh) if g in pending_set else known_summaries[lead] for g, lead in enumerate(leads)]
+    return [
+        {
+            "summary": summary,
+            "question_ids": [question_list[i]["question_id"] for i in members],
+            "count": len(members),
+        }
+        for summary, members in zip(summaries, groups)
+    ]
+
+
+async def invalidate_report_cache_for_session(db, session_id: str) -> None:
+    """Clear cached reports for a session in every worker (e.g. when feedback changes).
+    db may be a connection or the pool."""
+    await report_cache.invalidate(db, str(session_id))
+
+
+async def _question_count(db, session_id: str) -> int:
+    count = await db.fetchval("SELECT COUNT(*) FROM questions q WHERE q.session_id = $1", session_id)
+    return int(count or 0)
+
+
+def _with_age(entry: report_cache.CachedReport, is_stale: bool) -> SessionReportResponse:
+    # Copy: the cached report object is shared by every caller
+    return entry.report.model_copy(update={
+        "generated_at": datetime.fromtimestamp(entry.built_at, tz=timezone.utc),
+        "age_seconds": max(0, int(time.time() - entry.built_at)),
+        "is_stale": is_stale,
+    })
+
+
+async def build_session_report(
+    pool,
+    session_id: str,
+    published_only: bool = True,  # kept for call-site compatibility, ignored
+    include_review_data: bool = False,
+) -> SessionReportResponse:
+    """Anonymised Q&A report for a session. Caller must verify access.
+
+    Cached per report variant (services.report_cache) and rebuilt after settings.report_cache_ttl_sec,
+    settings.report_cache_question_threshold new questions, or an invalidation. Once a cached report
+    goes stale it is returned straight away (is_stale, age_seconds) while a rebuild runs in the
+    background; only a session with no cached report waits for the build. Either way at most one
+    build per session variant runs at a time.
+    """
+    current_count = await _question_count(pool, session_id)
+    variant = report_cache.variant(include_review_data)
+    cached = await report_cache.get(pool, session_id, variant, current_count)
+    if cached and report_cache.is_fresh(cached, current_count):
+        return _with_age(cached, is_stale=False)
+
+    build = _start_build(pool, session_id, include_review_data)
+    if cached:
+        return _with_age(cached, is_stale=True)
+
+    # Shielded: a caller that disconnects must not cancel the build other callers are awaiting
+    entry = await asyncio.shield(build)
+    if entry is None:
         return SessionReportResponse(groups=[], total_questions=0)
+    return _with_age(entry, is_stale=False)
+
+
+def _start_build(pool, session_id: str, include_review_data: bool) -> asyncio.Task:
+    """The in-flight build for this session variant, started if there is none."""
+    key = (str(session_id), report_cache.variant(include_review_data))
+    task = _BUILDS.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _build_and_cache(pool, key[0], include_review_data), name=f"report-build-{key[0]}-{key[1]}"
+        )
+        _BUILDS[key] = task
+        task.add_done_callback(lambda t: _build_done(key, t))
+    return task
+
+
+def _build_done(key: tuple[str, str], task: asyncio.Task) -> None:
+    _BUILDS.pop(key, None)
+    # Background rebuilds have no awaiting caller, so log failures here
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Report build for session %s (%s) failed", key[0], key[1], exc_info=task.exception())
+
+
+async def _claim_lease(pool, session_id: str, variant: str, owner: str) -> bool:
+    """Take the cross-worker build lease for this session variant, if it is free or expired."""
+    claimed = await pool.fetchval(
+        """
+        INSERT INTO report_build_leases (session_id, variant, owner, lease_until)
+        VALUES ($1, $2, $3, now() + make_interval(secs => $4))
+        ON CONFLICT (session_id, variant) DO UPDATE
+            SET owner = EXCLUDED.owner, lease_until = EXCLUDED.lease_until
+            WHERE report_build_leases.lease_until < now()
+        RETURNING true
+        """,
+        session_id, variant, owner, settings.report_build_lease_sec,
+    )
+    return bool(claimed)
+
+
+async def _release_lease(pool, session_id: str, variant: str, owner: str) -> None:
+    await pool.execute(
+        "DELETE FROM report_build_leases WHERE session_id = $1 AND variant = $2 AND owner = $3",
+        session_id, variant, owner,
+    )
+
+
+async def _build_and_cache(pool, session_id: str, include_review_data: bool) -> report_cache.CachedReport | None:
+    """Build and cache one session variant, at most one build at a time across API workers.
+
+    Every database step takes its own short pool acquire; no connection (and no transaction) is
+    held through the embedding and LLM calls. A worker that finds the lease taken waits for it,
+    then re-reads the cache, which the previous holder wrote before releasing.
+    """
+    variant = report_cache.variant(include_review_data)
+    owner = str(uuid.uuid4())
+    while not await _claim_lease(pool, session_id, variant, owner):
+        await asyncio.sleep(_LEASE_POLL_SEC)
+    try:
+        current_count = await _question_count(pool, session_id)
+        cached = await report_cache.get(pool, session_id, variant, current_count)
+        if cached and report_cache.is_fresh(cached, current_count):
+            return cached
+
+        built_at = time.time()
+        built = await _build_report(pool, session_id, previous=cached)
+        if built is None:
+            return None
+        report, topic_state = built
+        entry = report_cache.CachedReport(
+            report=report, built_at=built_at, question_count=report.total_questions, topic_state=topic_state
+        )
+        await report_cache.put(pool, session_id, variant, entry)
+        return entry
+    finally:
+        await _release_lease(pool, session_id, variant, owner)
+
+
+async def _build_report(
+    db, session_id: str, previous: report_cache.CachedReport | None = None
+) -> tuple[SessionReportResponse, report_cache.TopicState] | None:
+    """Build the report from the database (None for a session without questions). No caching.
+
+    db may be a connection or the pool; with the pool each query takes a short acquire and no
+    connection is held during the embedding and LLM calls.
+
+    Questions, answers and feedback are always reloaded. With a previous report to start from, topics
+    are updated incrementally (_incremental_topics) and keep their names and summaries, so a refresh
+    costs no LLM calls beyond summaries of new repeating-question groups; otherwise, or once the
+    topics have drifted, the session is reclustered and re-summarized.
+    """
+    rows, citations_by_answer = await _load_session_rows(db, session_id)
+
+    if not rows:
+        return None
 
     sorted_student_ids = sorted({str(r["student_id"]) for r in rows})
     report_items: dict[str, ReportQuestionOut] = {}
@@ -106,17 +353,7 @@ async def build_session_report(
     for row in rows:
         answer = None
         if row["answer_id"]:
-            citation_rows = await db.fetch(
-                """
-                SELECT ac.chunk_id, dc.content, dc.page_number,
-                       ac.relevance_score, ac.citation_order
-                FROM answer_citations ac
-                JOIN document_chunks dc ON dc.id = ac.chunk_id
-                WHERE ac.answer_id = $1
-                ORDER BY ac.citation_order
-                """,
-                row["answer_id"],
-            )
+            citation_rows = citations_by_answer.get(row["answer_id"], [])
             up, down = int(row["thumbs_up"]), int(row["thumbs_down"])
             feedback = AnswerFeedbackOut(
                 thumbs_up=up,
@@ -157,19 +394,43 @@ async def build_session_report(
         )
 
     question_list = [{"question_id": qid, "content": item.content} for qid, item in report_items.items()]
+    # One row per question, in report_items order (a question can join more than one answer row)
+    embeddings = await _question_embeddings(db, list({str(r["question_id"]): r for r in rows}.values()))
 
-    # Run clustering and repeating-question detection in parallel
-    raw_groups, repeating_raw = await asyncio.gather(
-        asyncio.to_thread(openai_client.cluster_questions_by_topic, question_list),
-        asyncio.to_thread(openai_client.identify_repeating_questions, question_list),
-    )
+    known_summaries = {}
+    raw_groups = None
+    if previous is not None:
+        known_summaries = {tuple(g.question_ids[:5]): g.summary for g in previous.report.repeating_questions}
+        if previous.topic_state is not None and previous.report.session_summary:
+            raw_groups = _incremental_topics(question_list, embeddings, previous.topic_state)
 
-    # Summarize with topic context
-    summary_data = await asyncio.to_thread(
-        openai_client.summarize_questions_for_dashboard,
-        question_list,
-        raw_groups,
-    )
+    if raw_groups is not None:
+        topic_state = report_cache.TopicState(
+            topics=raw_groups,
+            centroids=previous.topic_state.centroids,
+            clustered_count=previous.topic_state.clustered_count,
+        )
+        repeating_raw = await _repeating_groups(question_list, embeddings, known_summaries)
+        ranked = sorted(raw_groups, key=lambda g: -len(g["question_ids"]))
+        summary_data = {
+            "session_summary": previous.report.session_summary,
+            "topic_summaries": [
+                {"topic_name": g.topic_name, "summary": g.summary or ""} for g in previous.report.groups
+            ],
+            "hot_topics": [g["topic_name"] for g in ranked[:report_summary.HOT_TOPICS] if g["question_ids"]],
+        }
+        raw_groups = ranked
+    else:
+        # Run clustering and repeating-question detection in parallel
+        (raw_groups, centroids), repeating_raw = await asyncio.gather(
+            _cluster_topics(question_list, embeddings),
+            _repeating_groups(question_list, embeddings, known_summaries),
+        )
+        topic_state = report_cache.TopicState(
+            topics=raw_groups, centroids=centroids, clustered_count=len(question_list)
+        )
+        # Summarize: per-topic map (cached by membership) reduced into the session summary
+        summary_data = await report_summary.summarize_session(question_list, raw_groups)
 
     qid_to_student: dict[str, str] = {str(r["question_id"]): str(r["student_id"]) for r in rows}
     topic_summary_map = {ts["topic_name"]: ts.get("summary", "") for ts in summary_data.get("topic_summaries", [])}
@@ -221,10 +482,4 @@ async def build_session_report(
         repeating_questions=repeating_questions,
         hot_topics=summary_data.get("hot_topics", []),
     )
-
-    _REPORT_CACHE[cache_key] = {
-        "report": report,
-        "built_at": now,
-        "question_count": len(report_items),
-    }
-    return report
+    return report, topic_state
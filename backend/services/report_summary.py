@@ -0,0 +1,112 @@
+"""Map-reduce summarization of session questions for the professor dashboard.
+
+map    — each topic cluster is summarized from all of its questions, in batches of
+         settings.summary_batch_size; a topic with several batches is merged into one sentence.
+reduce — the per-topic summaries become the session summary. Hot topics are the largest topics.
+
+At most settings.summary_concurrency gpt-4o-mini calls run at once per report. Topic summaries are
+cached by a hash of the topic's question ids, so a rebuild after a few new questions only
+re-summarizes the topics whose membership changed (and the session reduce).
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from config import settings
+from services import openai_client
+
+HOT_TOPICS = 3
+_CACHE_MAX_ENTRIES = 5000
+
+# membership hash -> summary (topic summaries and session reduces share the LRU)
+_summaries: OrderedDict[str, str] = OrderedDict()
+
+
+def _membership_key(kind: str, parts: list[str]) -> str:
+    return kind + ":" + hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _cached(key: str) -> str | None:
+    summary = _summaries.get(key)
+    if summary is not None:
+        _summaries.move_to_end(key)
+    return summary
+
+
+def _remember(key: str, summary: str) -> None:
+    if not summary:
+        return  # failed call: retry on the next build rather than caching an empty summary
+    _summaries[key] = summary
+    _summaries.move_to_end(key)
+    while len(_summaries) > _CACHE_MAX_ENTRIES:
+        _summaries.popitem(last=False)
+
+
+async def _summarize_topic(topic_name: str, questions: list[dict], slots: asyncio.Semaphore) -> str:
+    key = _membership_key("topic", sorted(q["question_id"] for q in questions))
+    cached = _cached(key)
+    if cached is not None:
+        return cached
+
+    async def limited(coro):
+        async with slots:
+            return await coro
+
+    size = settings.summary_batch_size
+    batches = [questions[i:i + size] for i in range(0, len(questions), size)]
+    partials = await asyncio.gather(*(
+        limited(openai_client.summarize_topic_questions_async(topic_name, [q["content"] for q in batch]))
+        for batch in batches
+    ))
+    summary = partials[0] if len(partials) == 1 else await limited(
+        openai_client.merge_topic_summaries_async(topic_name, list(partials))
+    )
+    _remember(key, summary)
+    return summary
+
+
+async def summarize_session(question_list: list[dict], topic_groups: list[dict]) -> dict:
+    """Session summary, per-topic summaries and hot topics.
+
+    Input:  question_list [{"question_id", "content"}], topic_groups [{"topic_name", "question_ids"}]
+    Output: {
+        "session_summary": str,
+        "topic_summaries": [{"topic_name": str, "summary": str, "question_count": int}],
+        "hot_topics": [str]  # topic names with most questions, max 3
+    }
+    """
+    if not question_list:
+        return {"session_summary": "", "topic_summaries": [], "hot_topics": []}
+
+    by_id = {q["question_id"]: q for q in question_list}
+    topics = [
+        (g["topic_name"], [by_id[qid] for qid in g.get("question_ids", []) if qid in by_id])
+        for g in topic_groups
+    ]
+    topics = [(name, questions) for name, questions in topics if questions]
+
+    slots = asyncio.Semaphore(settings.summary_concurrency)
+    summaries = await asyncio.gather(*(_summarize_topic(name, questions, slots) for name, questions in topics))
+
+    reduce_key = _membership_key(
+        "session",
+        [f"{name}|{len(questions)}|{summary}" for (name, questions), summary in zip(topics, summaries)],
+    )
+    session_summary = _cached(reduce_key)
+    if session_summary is None:
+        session_summary = await openai_client.summarize_session_async(
+            len(question_list),
+            [(name, len(questions), summary) for (name, questions), summary in zip(topics, summaries)],
+        )
+        _remember(reduce_key, session_summary)
+
+    ranked = sorted(topics, key=lambda t: -len(t[1]))
+    return {
+        "session_summary": session_summary,
+        "topic_summaries": [
+            {"topic_name": name, "summary": summary, "question_count": len(questions)}
+            for (name, questions), summary in zip(topics, summaries)
+        ],
+        "hot_topics": [name for name, _ in ranked[:HOT_TOPICS]],
+    }
@@ -25,6 +25,31 @@ def upload_file(blob_name: str, data: bytes) -> None:
         (local_dir / blob_name).write_bytes(data)
 
 
+def download_file(blob_name: str) -> bytes:
+    if _use_azure():
+        from azure.storage.blob import BlobServiceClient
+        client = BlobServiceClient.from_connection_string(settings.azure_storage_connection_string)
+        blob_client = client.get_blob_client(
+            container=settings.azure_storage_container, blob=blob_name
+        )
+        return blob_client.download_blob().readall()
+    local_dir = Path(__file__).resolve().parent.parent / "uploads"
+    return (local_dir / blob_name).read_bytes()
+
+
+def delete_file(blob_name: str) -> None:
+    if _use_azure():
+        from azure.storage.blob import BlobServiceClient
+        client = BlobServiceClient.from_connection_string(settings.azure_storage_connection_string)
+        blob_client = client.get_blob_client(
+            container=settings.azure_storage_container, blob=blob_name
+        )
+        blob_client.delete_blob()
+        return
+    local_dir = Path(__file__).resolve().parent.parent / "uploads"
+    (local_dir / blob_name).unlink(missing_ok=True)
+
+
 def get_download_url(blob_name: str, expiry_hours: int = 24) -> str:
     if _use_azure():
         from azure.storage.blob import BlobServiceClient, BlobSasPermissions, generate_blob_sas
@@ -0,0 +1,31 @@
+"""Token counting with the chat model's tokenizer (tiktoken).
+
+document_chunks.token_count is stored under this encoding at ingest time so the context packer in
+rag_service can fill settings.context_material_token_budget exactly. GPT-4o and
+text-embedding-3-small use different encodings (o200k_base vs cl100k_base); counts here are for the
+prompt, which is what the budget limits. Chunks sized at a few hundred o200k tokens are well inside
+the embedding model's 8191-token input limit under either encoding.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+from services.openai_client import CHAT_MODEL
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(CHAT_MODEL)
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode_ordinary(text))
+
+
+def encode(text: str) -> list[int]:
+    return _encoding().encode_ordinary(text)
+
+
+def decode(tokens: list[int]) -> str:
+    return _encoding().decode(tokens)
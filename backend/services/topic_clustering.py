@@ -0,0 +1,117 @@
+"""Topic clustering for session reports, done locally on question embeddings.
+
+Spherical k-means (k-means++ seeding, fixed seed so reports are stable between rebuilds) over
+L2-normalised embeddings, with k picked automatically by silhouette score over k = 2..MAX_TOPICS.
+The LLM is only asked to name the clusters from a few representative questions each, so its cost
+no longer grows with the size of the session.
+
+Between full reclusters, assign() puts new questions in the nearest existing cluster and drift()
+measures how far the clusters have moved from the centroids they were named for.
+"""
+
+import numpy as np
+
+MAX_TOPICS = 6
+MIN_QUESTIONS_TO_SPLIT = 6   # below this, one topic
+SILHOUETTE_SAMPLE = 1000     # silhouette is O(n²); score on a fixed sample
+REPRESENTATIVES = 5          # questions per cluster shown to the LLM for naming
+_ITERATIONS = 50
+
+
+def normalise(embeddings: np.ndarray) -> np.ndarray:
+    x = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def _kmeans(x: np.ndarray, k: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means on unit vectors. Returns (labels, unit centroids)."""
+    n = len(x)
+    # k-means++ seeding on cosine distance
+    centroids = [x[rng.integers(n)]]
+    closest = 1 - x @ centroids[0]
+    for _ in range(1, k):
+        weights = np.maximum(closest, 0)
+        total = weights.sum()
+        idx = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids.append(x[idx])
+        closest = np.minimum(closest, 1 - x @ x[idx])
+    c = np.stack(centroids)
+
+    labels = np.full(n, -1)
+    for _ in range(_ITERATIONS):
+        new_labels = (x @ c.T).argmax(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(c)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=k)
+        for j in np.flatnonzero(counts == 0):
+            # Re-seed an empty cluster with the point furthest from its centroid
+            far = int(np.argmin((x * c[labels]).sum(axis=1)))
+            sums[j] = x[far]
+        c = normalise(sums)
+    return labels, c
+
+
+def _silhouette(x: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """Mean silhouette with cosine distance, vectorised over a precomputed distance matrix."""
+    dist = 1 - x @ x.T
+    onehot = np.eye(k, dtype=np.float32)[labels]            # (n, k)
+    counts = onehot.sum(axis=0)                              # (k,)
+    mean_dist = (dist @ onehot) / np.maximum(counts, 1)      # (n, k) mean distance to each cluster
+    own = counts[labels]
+    # a: mean distance to the rest of the own cluster (exclude self, distance 0)
+    a = mean_dist[np.arange(len(x)), labels] * own / np.maximum(own - 1, 1)
+    mean_dist[np.arange(len(x)), labels] = np.inf
+    b = mean_dist.min(axis=1)
+    s = (b - a) / np.maximum(np.maximum(a, b), 1e-9)
+    s[own <= 1] = 0
+    return float(s.mean())
+
+
+def cluster(embeddings: np.ndarray, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster question embeddings with automatic k. Returns (labels, unit centroids)."""
+    x = normalise(embeddings)
+    n = len(x)
+    rng = np.random.default_rng(seed)
+    if n < MIN_QUESTIONS_TO_SPLIT:
+        return np.zeros(n, dtype=int), normalise(x.mean(axis=0, keepdims=True))
+
+    sample = rng.choice(n, size=min(n, SILHOUETTE_SAMPLE), replace=False)
+    best: tuple[float, np.ndarray, np.ndarray] | None = None
+    for k in range(2, min(MAX_TOPICS, n - 1) + 1):
+        labels, centroids = _kmeans(x, k, np.random.default_rng(seed + k))
+        sample_labels = np.unique(labels[sample], return_inverse=True)[1]
+        score = _silhouette(x[sample], sample_labels, int(sample_labels.max()) + 1)
+        if best is None or score > best[0]:
+            best = (score, labels, centroids)
+    return best[1], best[2]
+
+
+def representatives(embeddings: np.ndarray, labels: np.ndarray, centroids: np.ndarray) -> list[list[int]]:
+    """Per cluster, indices of the REPRESENTATIVES questions closest to the centroid."""
+    x = normalise(embeddings)
+    sims = (x * centroids[labels]).sum(axis=1)
+    result = []
+    for j in range(len(centroids)):
+        members = np.flatnonzero(labels == j)
+        result.append(members[np.argsort(-sims[members])][:REPRESENTATIVES].tolist())
+    return result
+
+
+def assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (cosine) for each embedding."""
+    return (normalise(embeddings) @ centroids.T).argmax(axis=1)
+
+
+def drift(embeddings: np.ndarray, members: list[list[int]], centroids: np.ndarray) -> float:
+    """Largest cosine distance between a cluster's current member mean and its original centroid."""
+    x = normalise(embeddings)
+    shifts = [
+        1 - float(normalise(x[m].mean(axis=0, keepdims=True))[0] @ centroids[j])
+        for j, m in enumerate(members)
+        if m
+    ]
+    return max(shifts, default=0.0)
@@ -0,0 +1,169 @@
+"""In-memory exact vector index over each active session's document chunks.
+
+A live session usually grounds answers in a few hundred chunks, so instead of a filtered query
+against the global HNSW index (which over-scans or loses recall under a document_id filter), each
+session's chunk embeddings are held as one contiguous, L2-normalised float32 matrix and searched
+exactly with a single matrix-vector product. Only ids and vectors are kept; the text of the top-k
+chunks is fetched by primary key.
+
+An index is keyed by its session and stamped with the set of ready documents it was built from
+(document id + processed_at). Every search re-reads that set, so toggling session_documents or
+re-processing a document rebuilds the index on the next question, in every worker, without any
+invalidation message. Idle sessions are evicted LRU once the matrices exceed
+settings.vector_index_memory_mb; sessions with more than settings.vector_index_max_chunks chunks
+use the SQL path instead.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import settings
+
+
+@dataclass
+class _SessionIndex:
+    signature: frozenset            # {(document_id, processed_at)} of the ready documents indexed
+    chunk_ids: list | None          # row order of matrix; None when the session is too large to hold
+    matrix: np.ndarray | None       # (n, dims) float32, C-contiguous, unit rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes if self.matrix is not None else 0
+
+
+_indexes: OrderedDict[str, _SessionIndex] = OrderedDict()
+_indexes_bytes = 0
+# One build per session at a time; later callers wait and reuse it. A lock is dropped once no
+# caller holds or waits on it, so only sessions with a build in progress have one.
+_build_locks: dict[str, asyncio.Lock] = {}
+_build_lock_users: dict[str, int] = {}
+
+_stats = {"hits": 0, "builds": 0, "sql_fallbacks": 0, "evictions": 0}
+
+
+def stats() -> dict:
+    """Build/hit counters and memory use, for the /health/caches endpoint."""
+    return {**_stats, "sessions": len(_indexes), "memory_bytes": _indexes_bytes}
+
+
+def _remember(session_id: str, index: _SessionIndex) -> None:
+    global _indexes_bytes
+    old = _indexes.pop(session_id, None)
+    if old is not None:
+        _indexes_bytes -= old.nbytes
+    _indexes[session_id] = index
+    _indexes_bytes += index.nbytes
+    limit = settings.vector_index_memory_mb * 1024 * 1024
+    while _indexes_bytes > limit and len(_indexes) > 1:
+        _, evicted = _indexes.popitem(last=False)
+        _indexes_bytes -= evicted.nbytes
+        _stats["evictions"] += 1
+
+
+async def _signature(db, document_ids: list[str]) -> frozenset:
+    rows = await db.fetch(
+        "SELECT id, processed_at FROM documents WHERE id = ANY($1::uuid[]) AND processing_status = 'ready'",
+        document_ids,
+    )
+    return frozenset((str(r["id"]), r["processed_at"]) for r in rows)
+
+
+async def _build(db, signature: frozenset) -> _SessionIndex:
+    document_ids = [doc_id for doc_id, _ in signature]
+    count = await db.fetchval(
+        "SELECT COUNT(*) FROM document_chunks WHERE document_id = ANY($1::uuid[]) AND embedding IS NOT NULL",
+        document_ids,
+    )
+    if count > settings.vector_index_max_chunks:
+        return _SessionIndex(signature=signature, chunk_ids=None, matrix=None)
+
+    rows = await db.fetch(
+        """
+        SELECT id, embedding FROM document_chunks
+        WHERE document_id = ANY($1::uuid[]) AND embedding IS NOT NULL
+        ORDER BY document_id, chunk_index
+        """,
+        document_ids,
+    )
+    if not rows:
+        return _SessionIndex(signature=signature, chunk_ids=[], matrix=np.empty((0, 0), dtype=np.float32))
+    matrix = np.ascontiguousarray(np.stack([r["embedding"] for r in rows]), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    return _SessionIndex(signature=signature, chunk_ids=[r["id"] for r in rows], matrix=matrix)
+
+
+async def _get_index(db, session_id: str, document_ids: list[str]) -> _SessionIndex:
+    signature = await _signature(db, document_ids)
+    index = _indexes.get(session_id)
+    if index is not None and index.signature == signature:
+        _indexes.move_to_end(session_id)
+        _stats["hits"] += 1
+        return index
+
+    lock = _build_locks.setdefault(session_id, asyncio.Lock())
+    _build_lock_users[session_id] = _build_lock_users.get(session_id, 0) + 1
+    try:
+        async with lock:
+            index = _indexes.get(session_id)
+            if index is not None and index.signature == signature:
+                _stats["hits"] += 1
+                return index
+            index = await _build(db, signature)
+            _remember(session_id, index)
+            _stats["builds"] += 1
+            return index
+    finally:
+        _build_lock_users[session_id] -= 1
+        if not _build_lock_users[session_id]:
+            del _build_lock_users[session_id]
+            del _build_locks[session_id]
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-k rows of a unit-row matrix by cosine similarity: (row indices, similarities), best first."""
+    q = np.asarray(query, dtype=np.float32)
+    norm = float(np.linalg.norm(q))
+    sims = matrix @ (q / norm if norm else q)
+    if k < len(sims):
+        idx = np.argpartition(-sims, k - 1)[:k]
+    else:
+        idx = np.arange(len(sims))
+    idx = idx[np.argsort(-sims[idx], kind="stable")]
+    return idx, sims[idx]
+
+
+async def search(db, session_id: str, document_ids: list[str], query_embedding, k: int) -> list[dict] | None:
+    """Top-k chunks of the session's ready documents, as dicts with the columns of the SQL retrieval
+    (id, content, page_number, token_count, document_id, filename, cosine_similarity), best first.
+
+    Returns None when the session is too large for the in-memory index; the caller queries SQL.
+    """
+    index = await _get_index(db, session_id, document_ids)
+    if index.matrix is None:
+        _stats["sql_fallbacks"] += 1
+        return None
+    if not index.chunk_ids:
+        return []
+
+    idx, sims = top_k(index.matrix, query_embedding, k)
+    ids = [index.chunk_ids[i] for i in idx.tolist()]
+    rows = await db.fetch(
+        """
+        SELECT dc.id, dc.content, dc.page_number, dc.token_count, d.id AS document_id, d.filename
+        FROM document_chunks dc
+        JOIN documents d ON d.id = dc.document_id
+        WHERE dc.id = ANY($1::uuid[])
+        """,
+        ids,
+    )
+    by_id = {r["id"]: r for r in rows}
+    # A chunk deleted since the build (document re-processing mid-search) is skipped
+    return [
+        dict(by_id[chunk_id]) | {"cosine_similarity": float(sim)}
+        for chunk_id, sim in zip(ids, sims.tolist())
+        if chunk_id in by_id
+    ]
@@ -0,0 +1,52 @@
+"""chunk_pages must never yield a chunk over CHUNK_TOKENS, overlap included.
+
+Run from backend/:  python -m pytest tests
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import tokenizer
+from services.document_service import CHUNK_TOKENS, chunk_pages
+
+_WORDS = ["gradient", "descent", "eigenvalue", "matrix", "the", "of", "a", "theorem", "proof", "lemma",
+          "∂x/∂t", "O(n log n)", "naïve", "Schrödinger", "—", "1,024", "e^{iπ}"]
+
+
+def _chunks(pages: list[tuple[int | None, str]]) -> list[tuple[str, int | None, int]]:
+    async def stream():
+        for page in pages:
+            yield page
+
+    async def collect():
+        return [chunk async for chunk in chunk_pages(stream())]
+
+    return asyncio.run(collect())
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def test_long_pages_stay_within_chunk_tokens():
+    rng = random.Random(0)
+    pages = [
+        (n, "\n\n".join(_paragraph(rng, rng.choice([5, 120, 300, 390, 2000])) for _ in range(8)))
+        for n in range(1, 11)
+    ]
+    chunks = _chunks(pages)
+    assert chunks
+    for text, _, count in chunks:
+        assert count == tokenizer.count_tokens(text)
+        assert tokenizer.count_tokens(text) <= CHUNK_TOKENS
+
+
+def test_single_unbroken_paragraph_stays_within_chunk_tokens():
+    rng = random.Random(1)
+    chunks = _chunks([(None, _paragraph(rng, 5000))])
+    assert len(chunks) > 1
+    assert all(tokenizer.count_tokens(text) <= CHUNK_TOKENS for text, _, _ in chunks)
@@ -0,0 +1,6 @@
+-- Migration 010: mark answers served from the per-session semantic answer cache
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/010_answer_cache.sql
+
+ALTER TABLE answers
+    ADD COLUMN IF NOT EXISTS cache_hit   BOOLEAN NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS cached_from UUID    REFERENCES answers(id) ON DELETE SET NULL;
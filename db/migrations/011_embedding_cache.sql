@@ -0,0 +1,12 @@
+-- Migration 011: persistent embedding cache shared by ingestion and the question path
+-- Key: sha256 of whitespace-normalised text + embedding model name.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/011_embedding_cache.sql
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    content_hash TEXT        NOT NULL,
+    model        TEXT        NOT NULL,
+    embedding    vector(1536) NOT NULL,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    PRIMARY KEY (content_hash, model)
+);
@@ -0,0 +1,19 @@
+-- Migration 012: background ingestion queue on documents.processing_status
+-- Workers claim rows with SELECT … FOR UPDATE SKIP LOCKED: uploaded → processing → ready | failed.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/012_ingestion_queue.sql
+
+ALTER TABLE documents
+    ADD COLUMN IF NOT EXISTS source_path     TEXT,                               -- raw upload awaiting extraction
+    ADD COLUMN IF NOT EXISTS attempts        INT         NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),  -- retry backoff
+    ADD COLUMN IF NOT EXISTS locked_at       TIMESTAMPTZ;                        -- claim time, for stale-claim recovery
+
+-- Documents created before the queue were processed inline; never hand them to a worker.
+UPDATE documents
+   SET processing_status = 'ready', processed_at = COALESCE(processed_at, now())
+ WHERE processing_status IN ('uploaded', 'processing');
+
+-- Partial index: only pending rows — scanned by every worker poll
+CREATE INDEX IF NOT EXISTS idx_documents_ingestion_queue
+    ON documents (next_attempt_at)
+    WHERE processing_status IN ('uploaded', 'processing');
@@ -0,0 +1,14 @@
+-- Migration 013: background question classification
+-- questions with category IS NULL are the queue; workers claim micro-batches with FOR UPDATE SKIP LOCKED.
+-- Existing NULL categories are picked up by the workers as a backfill — no data change here.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/013_classification_queue.sql
+
+ALTER TABLE questions
+    ADD COLUMN IF NOT EXISTS classify_attempts        INT         NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS classify_next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),  -- retry backoff
+    ADD COLUMN IF NOT EXISTS classify_locked_at       TIMESTAMPTZ;                        -- claim time
+
+-- Partial index: only unclassified questions — scanned by every worker poll
+CREATE INDEX IF NOT EXISTS idx_questions_unclassified
+    ON questions (asked_at)
+    WHERE category IS NULL;
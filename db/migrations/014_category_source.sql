@@ -0,0 +1,9 @@
+-- Migration 014: record who labelled each question's category
+-- 'llm' labels are the training set for the local embedding classifier; 'local' and 'fallback'
+-- labels are never trained on, so the classifier cannot reinforce its own mistakes.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/014_category_source.sql
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS category_source TEXT;  -- 'llm' | 'local' | 'fallback'
+
+-- Every category so far came from gpt-4o-mini
+UPDATE questions SET category_source = 'llm' WHERE category IS NOT NULL AND category_source IS NULL;
@@ -0,0 +1,13 @@
+-- Migration 015: persist question embeddings
+-- Written by the same INSERT that saves the question; historical rows are filled by
+-- backend/scripts/backfill_question_embeddings.py. Lets clustering, duplicate detection and
+-- search run on stored vectors instead of re-embedding.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/015_question_embeddings.sql
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS embedding vector(1536);  -- text-embedding-3-small
+
+-- HNSW index for nearest-question search (same parameters as document_chunks)
+CREATE INDEX IF NOT EXISTS idx_questions_embedding_hnsw
+    ON questions
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,15 @@
+-- Migration 016: shared session report cache
+-- One row per (session, report variant); read by every API worker and kept across deploys.
+-- Invalidation deletes the rows and sends NOTIFY report_cache_invalidate so workers drop their
+-- in-process copies (backend/services/report_cache.py).
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/016_report_cache.sql
+
+CREATE TABLE IF NOT EXISTS report_cache (
+    session_id     UUID        NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    variant        TEXT        NOT NULL,   -- 'student' | 'review'
+    report         JSONB       NOT NULL,   -- SessionReportResponse
+    question_count INT         NOT NULL,
+    built_at       TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    PRIMARY KEY (session_id, variant)
+);
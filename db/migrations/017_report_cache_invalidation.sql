@@ -0,0 +1,5 @@
+-- Migration 017: invalidate cached session reports by marking them stale instead of deleting them
+-- A report whose invalidated_at is after its built_at is still served while a rebuild runs.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/017_report_cache_invalidation.sql
+
+ALTER TABLE report_cache ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMPTZ;
@@ -0,0 +1,9 @@
+-- Migration 018: keep the topic clustering behind each cached report
+-- Lets the next build assign new questions to existing topics instead of reclustering the session.
+-- topic_state:     {"topics": [{"topic_name", "question_ids"}], "clustered_count": int}
+-- topic_centroids: float32 (k × 1536) unit centroids from the last full clustering, row-major
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/018_report_topic_state.sql
+
+ALTER TABLE report_cache
+    ADD COLUMN IF NOT EXISTS topic_state     JSONB,
+    ADD COLUMN IF NOT EXISTS topic_centroids BYTEA;
@@ -0,0 +1,59 @@
+-- Migration 019: per-course vector indexes for document chunks
+-- document_chunks.course_id is denormalised from documents. A trigger fills it, so COPY and the
+-- seed scripts need no change. Each course with at least VECTOR_COURSE_INDEX_MIN_CHUNKS chunks gets
+-- its own partial HNSW index, which replaces the global one. backend/services/chunk_search.py
+-- creates these indexes after ingestion and routes queries to them.
+-- Declarative partitioning by course was ruled out: answer_citations.chunk_id references
+-- document_chunks(id), and a partitioned table's unique keys must include the partition key.
+-- On a large table, run the DO block's statements by hand as CREATE INDEX CONCURRENTLY
+-- (that cannot run inside the DO block's transaction).
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/019_chunk_course_indexes.sql
+
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS course_id UUID;
+
+UPDATE document_chunks dc
+SET course_id = d.course_id
+FROM documents d
+WHERE d.id = dc.document_id AND dc.course_id IS NULL;
+
+ALTER TABLE document_chunks ALTER COLUMN course_id SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION document_chunks_set_course_id() RETURNS trigger AS $$
+BEGIN
+    IF NEW.course_id IS NULL THEN
+        SELECT course_id INTO NEW.course_id FROM documents WHERE id = NEW.document_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_document_chunks_course_id ON document_chunks;
+CREATE TRIGGER trg_document_chunks_course_id
+    BEFORE INSERT ON document_chunks
+    FOR EACH ROW EXECUTE FUNCTION document_chunks_set_course_id();
+
+CREATE INDEX IF NOT EXISTS idx_chunks_course ON document_chunks (course_id);
+
+-- Courses already above the default threshold (10000 chunks) get their index now; later ones are
+-- indexed by the ingestion worker once they cross it. Name: idx_chunks_hnsw_course_<uuid hex>.
+DO $$
+DECLARE
+    c RECORD;
+BEGIN
+    FOR c IN
+        SELECT course_id FROM document_chunks
+        WHERE embedding IS NOT NULL
+        GROUP BY course_id
+        HAVING COUNT(*) >= 10000
+    LOOP
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON document_chunks '
+            'USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) '
+            'WHERE course_id = %L::uuid',
+            'idx_chunks_hnsw_course_' || replace(c.course_id::text, '-', ''),
+            c.course_id
+        );
+    END LOOP;
+END $$;
+
+DROP INDEX IF EXISTS idx_chunks_embedding_hnsw;
@@ -0,0 +1,13 @@
+-- Migration 020: binary-quantized chunk embeddings for two-stage retrieval
+-- embedding_bits is one sign bit per dimension (192 bytes per chunk), kept in the heap row, while
+-- the 6 KB float32 embedding is TOASTed. With VECTOR_QUANTIZED_FIRST_STAGE on, backend/services/chunk_search.py
+-- ranks the candidate chunks by Hamming distance over these bits. Only the nearest
+-- VECTOR_RERANK_CANDIDATES then have their full vectors read for the exact cosine rerank.
+-- It is a generated column, so ingestion, COPY and the re-embedding scripts need no change.
+-- Adding a stored generated column rewrites document_chunks; on a large table apply it in a quiet window.
+-- Requires pgvector >= 0.7 (binary_quantize, <~>).
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/020_chunk_embedding_bits.sql
+
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS embedding_bits bit(1536)
+    GENERATED ALWAYS AS (binary_quantize(embedding)::bit(1536)) STORED;
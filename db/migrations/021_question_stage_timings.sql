@@ -0,0 +1,8 @@
+-- Migration 021: per-stage latency of the question pipeline
+-- backend/services/rag_service.py writes it with the answer, as {"stage": milliseconds}. Stages:
+-- embed, active_docs, history, insert, retrieve, pack, prepare (wall time up to the prompt),
+-- generate. Stages that run concurrently overlap, so they do not sum to prepare. Only stages that
+-- completed are recorded: an answer-cache hit has no history, retrieve, pack or generate.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/021_question_stage_timings.sql
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS stage_timings JSONB;
@@ -0,0 +1,12 @@
+-- Migration 022: cross-worker leases for session report builds
+-- One row while a worker builds a report variant. The build itself holds no connection. A row
+-- whose lease_until has passed belongs to a worker that died mid-build and can be taken over.
+-- Apply: make db-shell → \i /docker-entrypoint-initdb.d/022_report_build_leases.sql
+
+CREATE TABLE IF NOT EXISTS report_build_leases (
+    session_id  UUID        NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    variant     TEXT        NOT NULL,
+    owner       UUID        NOT NULL,
+    lease_until TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (session_id, variant)
+);
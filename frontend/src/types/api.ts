@@ -27,6 +27,16 @@ export interface DocumentOut {
   url: string
   page_count: number | null
   content?: string | null  // For inline text documents
+  processing_status?: 'uploaded' | 'processing' | 'ready' | 'failed' | null
+}
+
+export interface DocumentStatusOut {
+  id: string
+  processing_status: 'uploaded' | 'processing' | 'ready' | 'failed'
+  attempts: number
+  error_message: string | null
+  page_count: number | null
+  processed_at: string | null
 }
 
 export interface TokenResponse {
@@ -75,6 +85,7 @@ export interface AnswerOut {
   model_used: string
   generation_latency_ms: number | null
   citations: CitationOut[]
+  cache_hit?: boolean
 }
 
 export interface QuestionOut {
@@ -185,6 +196,9 @@ export interface SessionReportResponse {
   session_summary?: string | null
   repeating_questions?: RepeatingQuestionGroup[]
   hot_topics?: string[]
+  generated_at?: string | null
+  age_seconds?: number
+  is_stale?: boolean
 }
 
 export type Personality = 'supportive' | 'normal' | 'funny'